@@ -0,0 +1,130 @@
+"""
+대량 질문 일괄 처리 (오프라인 평가, FAQ 답변 사전 생성)
+
+질문을 배치 단위로 묶어 쿼리 변환/임베딩/벡터 검색을 한꺼번에 하고,
+답변 생성은 동시 실행 수를 제한해 chain.batch로 호출합니다.
+결과는 배치가 끝날 때마다 JSONL로 바로 기록합니다.
+
+사용법:
+    python batch_runner.py questions.txt -o answers.jsonl
+    python batch_runner.py questions.jsonl -o retrieval.jsonl --retrieval-only
+"""
+import argparse
+import json
+import time
+from itertools import islice
+
+from rag_system import OptimizedConditionalRAGSystem
+from document_formatter import format_docs_optimized
+from chat_chain import create_answer_chain
+from config import CONTEXT_TOKEN_BUDGET, BATCH_QUERY_SIZE, BATCH_LLM_CONCURRENCY
+
+
+def read_questions(path):
+    """질문 파일 순회 - .jsonl은 {"question": ...} (선택: "id"), 그 외는 한 줄에 질문 하나"""
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            if path.endswith(".jsonl"):
+                record = json.loads(line)
+                yield {"id": record.get("id", line_no), "question": record["question"]}
+            else:
+                yield {"id": line_no, "question": line}
+
+
+def _doc_summary(doc):
+    meta = doc.metadata or {}
+    return {
+        "id": getattr(doc, "id", None),
+        "citation": meta.get("citation") or "",
+        "doc_class": meta.get("doc_class") or "",
+    }
+
+
+def process_batch(records, rag_system, answer_chain=None, max_concurrency=BATCH_LLM_CONCURRENCY):
+    """질문 배치 하나 처리 - 질문별 결과 dict 목록
+
+    answer_chain이 없으면 검색/컨텍스트까지만 계산합니다.
+    """
+    retrievals = rag_system.batch_retrieve([record["question"] for record in records])["results"]
+    contexts = []
+    results = []
+    for record, retrieval in zip(records, retrievals):
+        stats = {}
+        context = format_docs_optimized(
+            retrieval["docs"], retrieval["search_type"], token_budget=CONTEXT_TOKEN_BUDGET,
+            relevance=retrieval["relevance"], stats=stats,
+        )
+        contexts.append(context)
+        results.append({
+            "id": record["id"],
+            "question": record["question"],
+            "search_query": retrieval["search_query"],
+            "conversion_method": retrieval["conversion_method"],
+            "search_type": retrieval["search_type"],
+            "sources": [_doc_summary(doc) for doc in retrieval["docs"]],
+            "context_tokens": stats.get("context_tokens"),
+        })
+
+    if answer_chain is not None:
+        inputs = [
+            {"question": record["question"], "context": context, "chat_history": []}
+            for record, context in zip(records, contexts)
+        ]
+        answers = answer_chain.batch(inputs, config={"max_concurrency": max_concurrency}, return_exceptions=True)
+        for result, answer in zip(results, answers):
+            if isinstance(answer, Exception):
+                result["error"] = str(answer)
+            else:
+                result["answer"] = answer
+    return results
+
+
+def run_batch(questions, rag_system, output_path, answer_chain=None,
+              batch_size=BATCH_QUERY_SIZE, max_concurrency=BATCH_LLM_CONCURRENCY):
+    """질문 전체를 배치 단위로 처리하며 JSONL에 순서대로 기록 - 처리한 질문 수 반환"""
+    questions = iter(questions)
+    started = time.perf_counter()
+    done = 0
+    with open(output_path, "w", encoding="utf-8") as out:
+        while True:
+            records = list(islice(questions, batch_size))
+            if not records:
+                break
+            for result in process_batch(records, rag_system, answer_chain, max_concurrency):
+                out.write(json.dumps(result, ensure_ascii=False) + "\n")
+            out.flush()
+            done += len(records)
+            elapsed = time.perf_counter() - started
+            print(f"✅ {done}건 처리 ({done / elapsed:.1f}건/s)")
+    return done
+
+
+def main(argv=None):
+    from database_utils import initialize_embeddings_and_databases
+
+    parser = argparse.ArgumentParser(description="대량 질문 일괄 검색/답변")
+    parser.add_argument("questions", help="질문 파일 (.txt 한 줄에 하나 또는 .jsonl)")
+    parser.add_argument("-o", "--output", default="batch_results.jsonl")
+    parser.add_argument("--batch-size", type=int, default=BATCH_QUERY_SIZE)
+    parser.add_argument("--concurrency", type=int, default=BATCH_LLM_CONCURRENCY, help="LLM 동시 호출 수")
+    parser.add_argument("--retrieval-only", action="store_true", help="답변 생성 없이 검색 결과만 기록")
+    args = parser.parse_args(argv)
+
+    embedding_model, legal_db, news_db, system_ready = initialize_embeddings_and_databases()
+    if not system_ready:
+        raise SystemExit("❌ 벡터 DB 초기화 실패")
+
+    rag_system = OptimizedConditionalRAGSystem(legal_db, news_db, embedding_model)
+    answer_chain = None if args.retrieval_only else create_answer_chain()
+    done = run_batch(
+        read_questions(args.questions), rag_system, args.output, answer_chain,
+        batch_size=args.batch_size, max_concurrency=args.concurrency,
+    )
+    print(f"🎉 {done}건 완료: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,37 +3,70 @@
 """
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.output_parsers import StrOutputParser
-from langchain_core.runnables import RunnableLambda
+from langchain_core.runnables import RunnableLambda, RunnableGenerator, RunnableParallel
 from langchain_core.runnables.history import RunnableWithMessageHistory
-from langchain_community.chat_message_histories import ChatMessageHistory
-from langchain_openai import ChatOpenAI
+from llm_gateway import get_chat_model
 from rag_system import optimized_retrieve_and_format
-from config import OPENAI_MODEL, OPENAI_TEMPERATURE, MAX_TOKENS
+from semantic_cache import SemanticAnswerCache
+from session_store import SessionHistoryStore
+from conversation_memory import ConversationSummarizer, clip_to_budget
+from prompt_cache import PromptCacheMonitor
+from config import (
+    OPENAI_MODEL, OPENAI_TEMPERATURE, MAX_TOKENS, LEGAL_DB_DIR, NEWS_DB_DIR,
+    SEMANTIC_CACHE_ENABLED, SEMANTIC_CACHE_THRESHOLD,
+    SEMANTIC_CACHE_MAX_ENTRIES, SEMANTIC_CACHE_TTL_SECONDS,
+    SESSION_STORE_BACKEND, SESSION_STORE_PATH, SESSION_REDIS_URL,
+    SESSION_MAX_SESSIONS, SESSION_IDLE_TTL_SECONDS, SESSION_MAX_MESSAGES,
+    CHAT_MEMORY_MODE, CHAT_HISTORY_TOKEN_BUDGET, CHAT_HISTORY_KEEP_TOKENS,
+    CHAT_SUMMARY_MODEL, CHAT_SUMMARY_MAX_TOKENS
+)
 
 
-# 메모리 관리
-store = {}
+# 메모리 관리 - 유휴 TTL/최대 세션 수로 제거되며, sqlite/redis 백엔드는 워커 프로세스 간 공유
+store = SessionHistoryStore(
+    backend=SESSION_STORE_BACKEND,
+    max_sessions=SESSION_MAX_SESSIONS,
+    idle_ttl_seconds=SESSION_IDLE_TTL_SECONDS,
+    max_messages=SESSION_MAX_MESSAGES,
+    sqlite_path=SESSION_STORE_PATH,
+    redis_url=SESSION_REDIS_URL,
+)
+
+
+# 대화 요약기 - create_chat_chain_with_memory에서 생성 (summary 모드)
+summarizer = None
 
 
 def get_session_history(session_id):
-    """세션 기록 관리"""
-    if session_id not in store:
-        store[session_id] = ChatMessageHistory()
-    history = store[session_id]
-    if len(history.messages) > 20:
-        history.messages = history.messages[-20:]
+    """세션 기록 관리 - 토큰 예산을 넘으면 백그라운드 요약 예약"""
+    history = store.get(session_id)
+    if summarizer is not None:
+        summarizer.maybe_schedule(session_id, history)
     return history
 
 
-def create_user_friendly_chat_chain(rag_system):
-    """사용자 친화적 채팅 체인 생성"""
-    llm = ChatOpenAI(
-        model=OPENAI_MODEL,
-        temperature=OPENAI_TEMPERATURE,
-        max_tokens=MAX_TOKENS,
+def _fit_chat_history(messages):
+    """요청에 넘길 대화 기록 - summary 모드에서는 요약 + 토큰 예산 안의 최근 메시지"""
+    if CHAT_MEMORY_MODE != "summary":
+        return messages
+    return clip_to_budget(messages, CHAT_HISTORY_TOKEN_BUDGET)
+
+
+def create_semantic_cache():
+    """설정값 기반 시맨틱 답변 캐시 생성"""
+    if not SEMANTIC_CACHE_ENABLED:
+        return None
+    return SemanticAnswerCache(
+        threshold=SEMANTIC_CACHE_THRESHOLD,
+        max_entries=SEMANTIC_CACHE_MAX_ENTRIES,
+        ttl_seconds=SEMANTIC_CACHE_TTL_SECONDS,
+        db_directories=(LEGAL_DB_DIR, NEWS_DB_DIR),
     )
 
-    system_message = """
+
+# 고정 지시문 - 모든 요청의 맨 앞에 같은 바이트로 들어가야 프롬프트 캐시가 적중하므로
+# 요청별 값(날짜, 세션 정보 등)을 넣지 말 것
+SYSTEM_PROMPT = """
     당신은 부동산 임대차, 전세사기, 법령해석, 생활법령 Q&A, 뉴스 기사 등 다양한 법률 데이터를 바탕으로 청년을 돕는 법률 전문가 AI 챗봇입니다.  
     특히 전세사기 피해 등 부동산 문제로 어려움을 겪는 사람들에게 쉽고 실질적인 도움을 제공하는 역할을 합니다.
 
@@ -104,43 +137,126 @@ def create_user_friendly_chat_chain(rag_system):
     → 출처 표기: **[참고: 판례]**
     """
 
+# 프롬프트 캐시 적중 집계 (모든 답변 체인 공유)
+prompt_cache_monitor = PromptCacheMonitor()
+
+
+def create_answer_chain():
+    """답변 생성 체인 - {question, context, chat_history} → 답변 문자열
+
+    고정 지시문 → 대화 기록 → 참고자료 → 질문 순서로 보내 앞부분을 프롬프트 캐시로 재사용합니다.
+    """
+    llm = get_chat_model(
+        OPENAI_MODEL,
+        temperature=OPENAI_TEMPERATURE,
+        max_tokens=MAX_TOKENS,
+        stream_usage=True,
+        callbacks=[prompt_cache_monitor],
+    )
     
     prompt = ChatPromptTemplate.from_messages([
-        ("system", system_message),
+        ("system", SYSTEM_PROMPT),
         MessagesPlaceholder(variable_name="chat_history"),
+        ("system", "참고자료:\n{context}"),
         ("human", "{question}"),
-        ("system", "참고자료:\n{context}")
     ])
-    
-    def user_friendly_retrieve_and_format(query):
+    return prompt | llm | StrOutputParser()
+
+
+def create_user_friendly_chat_chain(rag_system, semantic_cache=None):
+    """사용자 친화적 채팅 체인 생성 - 출력은 {"answer": 답변, "context": 참고자료} (답변은 토큰 단위 스트리밍)"""
+    def user_friendly_retrieve_and_format(query, prepared=None):
         """사용자 친화적 검색 및 포맷팅 - 전처리 포함"""
         try:
-            formatted_result = optimized_retrieve_and_format(query, rag_system)
-            return formatted_result
+            return optimized_retrieve_and_format(query, rag_system, prepared)
         except Exception as e:
             print(f"❌ 검색 오류: {e}")
-            return "검색 중 오류가 발생했습니다."
+            return {"context": "검색 중 오류가 발생했습니다.", "complete": False}
+    
+    def with_context(context, answer):
+        """참고자료와 답변을 함께 내보내는 러너블"""
+        return RunnableParallel(context=RunnableLambda(lambda _: context), answer=answer)
     
-    chain = (
-        {
-            "context": RunnableLambda(lambda x: user_friendly_retrieve_and_format(x["question"])),
-            "question": RunnableLambda(lambda x: x["question"]),
-            "chat_history": RunnableLambda(lambda x: x.get("chat_history", [])),
+    answer_chain = create_answer_chain()
+    
+    def answer_with_retrieval(x, prepared=None):
+        """검색 후 답변 생성"""
+        context = user_friendly_retrieve_and_format(x["question"], prepared)["context"]
+        inputs = {
+            "question": x["question"],
+            "context": context,
+            "chat_history": _fit_chat_history(x.get("chat_history", [])),
         }
-        | prompt
-        | llm
-        | StrOutputParser()
-    )
-    return chain
+        return with_context(context, RunnableLambda(lambda _: inputs) | answer_chain)
+    
+    chain = RunnableLambda(answer_with_retrieval)
+    
+    if semantic_cache is None:
+        return chain
+    
+    def answer_with_semantic_cache(x):
+        """시맨틱 캐시 조회 후 적중 시 저장된 답변과 참고자료, 미스 시 검색+생성 후 저장
+
+        캐시 키는 검색 쿼리 임베딩이며, 미스일 때 같은 변환 결과와 임베딩으로 검색합니다.
+        """
+        # 대화 맥락에 의존하는 질문은 캐시 우회
+        if x.get("chat_history"):
+            return chain
+        
+        question = x["question"]
+        try:
+            prepared = rag_system.prepare_query(question)
+        except Exception as e:
+            print(f"⚠️ 쿼리 준비 실패, 캐시 우회: {e}")
+            return chain
+        embedding = prepared["embedding"]
+        if embedding is None:
+            return answer_with_retrieval(x, prepared)
+        
+        cached = semantic_cache.lookup(embedding)
+        if cached is not None:
+            print(f"💾 시맨틱 캐시 적중 (유사도 {cached['similarity']:.3f}): {cached['question']}")
+            return with_context(cached["context"], RunnableLambda(lambda _: cached["answer"]))
+        
+        retrieval = user_friendly_retrieve_and_format(question, prepared)
+        context = retrieval["context"]
+        
+        def store_answer(chunks):
+            parts = []
+            for chunk in chunks:
+                parts.append(chunk)
+                yield chunk
+            # 검색 오류/시간 초과로 자료가 빠졌거나 찾은 문서가 없는 답변은 저장하지 않음
+            if retrieval["complete"]:
+                semantic_cache.add(question, embedding, "".join(parts), context)
+        
+        return with_context(
+            context,
+            RunnableLambda(lambda _: {"question": question, "context": context, "chat_history": []})
+            | answer_chain
+            | RunnableGenerator(store_answer),
+        )
+    
+    return RunnableLambda(answer_with_semantic_cache)
 
 
 def create_chat_chain_with_memory(rag_system):
     """메모리 기능이 있는 채팅 체인"""
-    base_chain = create_user_friendly_chat_chain(rag_system)
+    global summarizer
+    if CHAT_MEMORY_MODE == "summary" and summarizer is None:
+        summarizer = ConversationSummarizer(
+            get_chat_model(CHAT_SUMMARY_MODEL, temperature=0, max_tokens=CHAT_SUMMARY_MAX_TOKENS),
+            token_budget=CHAT_HISTORY_TOKEN_BUDGET,
+            keep_tokens=CHAT_HISTORY_KEEP_TOKENS,
+            max_messages=SESSION_MAX_MESSAGES,
+        )
+    
+    base_chain = create_user_friendly_chat_chain(rag_system, create_semantic_cache())
     chain_with_history = RunnableWithMessageHistory(
         base_chain,
         get_session_history,
         input_messages_key="question",
         history_messages_key="chat_history",
+        output_messages_key="answer",
     )
     return chain_with_history
@@ -0,0 +1,111 @@
+"""
+토큰 예산 기반 대화 메모리 (오래된 대화 요약)
+
+대화 기록이 토큰 예산을 넘으면 오래된 메시지를 백그라운드에서 요약 메시지 하나로
+압축하고, 요청 경로에서는 요약 + 예산 안에 드는 최근 메시지만 chat_history로 넘깁니다.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_core.messages import SystemMessage
+from document_formatter import count_tokens
+
+
+SUMMARY_PREFIX = "[이전 대화 요약]\n"
+
+
+def is_summary(message) -> bool:
+    return isinstance(message, SystemMessage) and str(message.content).startswith(SUMMARY_PREFIX)
+
+
+def message_tokens(message) -> int:
+    """메시지 하나의 토큰 수 (역할/구분자 몫 4토큰 포함)"""
+    return count_tokens(str(message.content)) + 4
+
+
+def clip_to_budget(messages, token_budget):
+    """요약 메시지 + 예산 안에 드는 최근 메시지 (순서 유지)"""
+    summary = messages[0] if messages and is_summary(messages[0]) else None
+    used = message_tokens(summary) if summary is not None else 0
+    start = len(messages)
+    for i in range(len(messages) - 1, 0 if summary is not None else -1, -1):
+        used += message_tokens(messages[i])
+        if used > token_budget:
+            break
+        start = i
+    recent = messages[start:]
+    return [summary] + recent if summary is not None else recent
+
+
+class ConversationSummarizer:
+    """세션별 대화 기록을 토큰 예산 안으로 유지
+
+    예산(또는 메시지 수 한도)에 가까워지면 최근 keep_tokens 만큼만 남기고
+    나머지(기존 요약 포함)를 LLM으로 요약해 history.compact()로 교체합니다.
+    요약하는 동안 앞부분이 바뀌었으면(창 크기 제한, 다른 워커의 요약) 교체를 건너뜁니다.
+    요약은 단일 워커 스레드에서 실행되어 응답 지연에 영향을 주지 않습니다.
+    """
+
+    def __init__(self, llm, token_budget=1500, keep_tokens=600, max_messages=20):
+        self.llm = llm
+        self.token_budget = token_budget
+        self.keep_tokens = keep_tokens
+        self.max_messages = max_messages
+        self.summaries = 0
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="chat-summary")
+
+    def _split_point(self, messages):
+        """요약할 앞부분 메시지 수 - 최근 keep_tokens 만큼은 원문 유지"""
+        used = 0
+        split = len(messages)
+        for i in range(len(messages) - 1, -1, -1):
+            used += message_tokens(messages[i])
+            if used > self.keep_tokens or len(messages) - i > self.max_messages // 2:
+                break
+            split = i
+        # 사용자 질문부터 원문이 시작되도록 맞춤
+        while split < len(messages) and messages[split].type != "human":
+            split += 1
+        return split
+
+    def maybe_schedule(self, session_id, history):
+        """예산을 넘은 세션의 요약 작업 예약 - 세션당 동시에 하나만"""
+        messages = history.messages
+        total = sum(message_tokens(message) for message in messages)
+        if total <= self.token_budget and len(messages) < self.max_messages - 2:
+            return False
+        with self._lock:
+            if session_id in self._pending:
+                return False
+            self._pending.add(session_id)
+        self._executor.submit(self._compact, session_id, history)
+        return True
+
+    def _compact(self, session_id, history):
+        try:
+            messages = history.messages
+            split = self._split_point(messages)
+            if split < 2:
+                return
+            transcript = "\n".join(
+                f"{'요약' if is_summary(m) else ('사용자' if m.type == 'human' else '상담봇')}: {m.content}"
+                for m in messages[:split]
+            )
+            prompt = (
+                "다음은 부동산 법률 상담 대화의 앞부분입니다. 이후 대화에 필요한 사실관계"
+                "(계약 종류, 금액, 날짜, 당사자, 이미 안내한 판례/조치)를 빠짐없이 5문장 이내로 요약하세요.\n\n"
+                f"{transcript}\n\n요약:"
+            )
+            summary = self.llm.invoke([{"role": "user", "content": prompt}]).content.strip()
+            if not history.compact(messages[:split], SystemMessage(content=SUMMARY_PREFIX + summary)):
+                print(f"⏭️ 요약 중 대화 앞부분이 바뀌어 교체 생략: {session_id}")
+                return
+            self.summaries += 1
+            print(f"🗜️ 대화 요약 완료: {session_id} ({split}개 메시지 → 1개)")
+        except Exception as e:
+            print(f"⚠️ 대화 요약 실패 (최근 메시지만 사용): {e}")
+        finally:
+            with self._lock:
+                self._pending.discard(session_id)
@@ -1,118 +1,264 @@
 """
 문서 포맷팅 유틸리티
 """
+import re
+import threading
+import time
+import tiktoken
+from config import OPENAI_MODEL, CONTEXT_MIN_DOC_TOKENS
 
 
-def format_docs_optimized(docs, search_type):
-    """최적화된 문서 포맷팅 - 출처별 명확한 구분"""
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?。])\s+|\n+")
+
+# 토크나이저는 처음 쓸 때 로드 (BPE 파일을 내려받아야 할 수 있어 import 시점에 하지 않음)
+_ENCODING_RETRY_SECONDS = 300
+_encoding = None
+_encoding_failed_at = None
+_encoding_lock = threading.Lock()
+
+
+def _get_encoding():
+    """tiktoken 인코더 - 로드에 실패하면 None (일정 시간 뒤 다시 시도)"""
+    global _encoding, _encoding_failed_at
+    if _encoding is not None:
+        return _encoding
+    if _encoding_failed_at is not None and time.time() - _encoding_failed_at < _ENCODING_RETRY_SECONDS:
+        return None
+    with _encoding_lock:
+        if _encoding is None:
+            try:
+                try:
+                    _encoding = tiktoken.encoding_for_model(OPENAI_MODEL)
+                except KeyError:
+                    _encoding = tiktoken.get_encoding("o200k_base")
+                _encoding_failed_at = None
+            except Exception as e:
+                print(f"⚠️ 토크나이저 로드 실패, 글자 수 기반 추정 사용: {e}")
+                _encoding_failed_at = time.time()
+        return _encoding
+
+
+def _char_tokens(char) -> float:
+    """글자 하나의 추정 토큰 수 - 한글 등 비ASCII는 1, ASCII는 1/3 (넉넉하게 잡은 값)"""
+    return 1.0 if ord(char) > 127 else 1.0 / 3
+
+
+def _estimate_tokens(text: str) -> int:
+    return int(sum(_char_tokens(char) for char in text) + 0.999)
+
+
+def count_tokens(text: str) -> int:
+    """설정된 OpenAI 모델 기준 토큰 수 (토크나이저를 못 쓰면 글자 수 기반 추정)"""
+    encoding = _get_encoding()
+    if encoding is None:
+        return _estimate_tokens(text)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """토큰 예산 안에서 문장 단위로 자르기 - 첫 문장이 예산을 넘으면 토큰 단위로 자름"""
+    if max_tokens <= 0:
+        return ""
+    if count_tokens(text) <= max_tokens:
+        return text
+    
+    parts = []
+    used = 0
+    for sentence in _SENTENCE_BOUNDARY.split(text):
+        if not sentence:
+            continue
+        tokens = count_tokens(sentence) + (1 if parts else 0)
+        if used + tokens > max_tokens:
+            break
+        parts.append(sentence)
+        used += tokens
+    
+    if parts:
+        return " ".join(parts)
+    encoding = _get_encoding()
+    if encoding is not None:
+        return encoding.decode(encoding.encode(text, disallowed_special=())[:max_tokens])
+    used = 0.0
+    for end, char in enumerate(text):
+        used += _char_tokens(char)
+        if used > max_tokens:
+            return text[:end]
+    return text
+
+
+def allocate_token_budget(lengths, weights, budget, min_tokens=0):
+    """관련도 가중치에 비례해 문서별 토큰 예산 분배
+
+    필요한 양보다 많이 배정된 문서의 남는 예산은 나머지 문서에 다시 나눕니다.
+    """
+    allocation = [0] * len(lengths)
+    remaining = set(i for i, length in enumerate(lengths) if length > 0)
+    left = budget
+    while remaining and left > 0:
+        total_weight = sum(weights[i] for i in remaining)
+        shares = {i: max(min_tokens, int(left * weights[i] / total_weight)) for i in remaining}
+        satisfied = [i for i in remaining if lengths[i] - allocation[i] <= shares[i]]
+        if not satisfied:
+            for i in sorted(remaining, key=lambda i: weights[i], reverse=True):
+                share = min(shares[i], left)
+                allocation[i] += share
+                left -= share
+            break
+        for i in satisfied:
+            need = min(lengths[i] - allocation[i], left)
+            allocation[i] += need
+            left -= need
+            remaining.discard(i)
+    return allocation
+
+
+DOC_CLASS_NEWS = "news"
+DOC_CLASS_PRECEDENT = "precedent"
+DOC_CLASS_INTERPRETATION = "interpretation"
+DOC_CLASS_QA = "qa"
+DOC_CLASS_OTHER = "other"
+
+# (doc_type 키워드 정규식, 메타데이터 키) - 위에서부터 순서대로 판정
+_CLASS_RULES = [
+    (DOC_CLASS_PRECEDENT, re.compile("판례|판결|대법원|고등법원|지방법원"),
+     frozenset(["판결요지", "판시사항", "case_id", "court"])),
+    (DOC_CLASS_INTERPRETATION, re.compile("법령해석|해석례|유권해석|행정해석"),
+     frozenset(["해석내용", "법령명", "interpretation_id"])),
+    (DOC_CLASS_QA, re.compile("백문백답|생활법령|qa|질의응답|faq"),
+     frozenset(["질문", "답변", "question", "answer", "qa_id"])),
+]
+
+
+def classify_document(meta) -> str:
+    """메타데이터로 문서 유형 판정 (뉴스/판례/법령해석례/백문백답/기타)"""
+    if "title" in meta and ("url" in meta or "date" in meta):
+        return DOC_CLASS_NEWS
+    doc_type = str(meta.get("doc_type", "")).lower()
+    for doc_class, keyword_pattern, meta_keys in _CLASS_RULES:
+        if keyword_pattern.search(doc_type) or not meta_keys.isdisjoint(meta):
+            return doc_class
+    return DOC_CLASS_OTHER
+
+
+def _label(meta, prefix, id_key, counts, counter):
+    """인용 라벨 - 정규화된 citation 또는 식별자가 있으면 그대로, 없으면 유형별 순번"""
+    citation = meta.get("citation")
+    if citation:
+        return citation
+    identifier = str(meta.get(id_key, "")).strip() if id_key else ""
+    if identifier:
+        return f"{prefix}-{identifier}"
+    counts[counter] += 1
+    return f"{prefix}-{counts[counter]}"
+
+
+def _format_news(meta, content, counts, counter):
+    counts[counter] += 1
+    title = meta.get("display_title") or str(meta.get("title", "제목없음"))[:80]
+    return (
+        f"[뉴스-{counts[counter]}] 📰 뉴스\n"
+        f"제목: {title}\n"
+        f"출처: {meta.get('source', '뉴스')} | 날짜: {meta.get('date', '날짜미상')}\n"
+        f"내용: {content}...\n"
+    )
+
+
+def _format_precedent(meta, content, counts, counter):
+    return f"[{_label(meta, '판례', 'case_id', counts, counter)}] 🏛️ 판례\n내용: {content}...\n"
+
+
+def _format_interpretation(meta, content, counts, counter):
+    return f"[{_label(meta, '법령해석례', 'interpretation_id', counts, counter)}] ⚖️ 법령해석례\n내용: {content}...\n"
+
+
+def _format_qa(meta, content, counts, counter):
+    return f"[{_label(meta, '백문백답', 'qa_id', counts, counter)}] 💡 생활법령 Q&A\n내용: {content}...\n"
+
+
+def _format_other(meta, content, counts, counter):
+    source = meta.get("source_label") or meta.get("doc_type", "법률자료")
+    return f"[{_label(meta, '법률', None, counts, counter)}] 📋 {source}\n내용: {content}...\n"
+
+
+# 문서 유형 → (포맷 함수, 순번 카운터) - 기타 자료는 판례 순번을 함께 사용
+_FORMATTERS = {
+    DOC_CLASS_NEWS: (_format_news, DOC_CLASS_NEWS),
+    DOC_CLASS_PRECEDENT: (_format_precedent, DOC_CLASS_PRECEDENT),
+    DOC_CLASS_INTERPRETATION: (_format_interpretation, DOC_CLASS_INTERPRETATION),
+    DOC_CLASS_QA: (_format_qa, DOC_CLASS_QA),
+    DOC_CLASS_OTHER: (_format_other, DOC_CLASS_PRECEDENT),
+}
+
+_HEADER_ORDER = [DOC_CLASS_PRECEDENT, DOC_CLASS_INTERPRETATION, DOC_CLASS_QA, DOC_CLASS_NEWS]
+_HEADER_LABELS = {
+    DOC_CLASS_PRECEDENT: "판례",
+    DOC_CLASS_INTERPRETATION: "법령해석례",
+    DOC_CLASS_QA: "생활법령Q&A",
+    DOC_CLASS_NEWS: "뉴스",
+}
+_HEADER_GUIDES = {
+    DOC_CLASS_PRECEDENT: "• 판례 자료: [판례-번호] 🏛️ 판례 형태로 표시됨\n",
+    DOC_CLASS_INTERPRETATION: "• 법령해석례 자료: [법령해석례-번호] ⚖️ 법령해석례 형태로 표시됨\n",
+    DOC_CLASS_QA: "• 생활법령 자료: [백문백답-번호] 💡 생활법령 Q&A 형태로 표시됨\n",
+    DOC_CLASS_NEWS: "• 뉴스 자료: [뉴스-번호] 📰 뉴스 형태로 표시됨\n",
+}
+_RULE = "=" * 60
+
+
+def format_docs_optimized(docs, search_type, token_budget=None, relevance=None, stats=None):
+    """최적화된 문서 포맷팅 - 출처별 명확한 구분
+
+    token_budget이 주어지면 문서 본문을 관련도(없으면 검색 순위) 비율로 예산을 나눠
+    문장 단위로 자르고, 최종 컨텍스트 토큰 수를 stats["context_tokens"]에 기록합니다.
+    """
     if not docs:
         return "관련 자료를 찾을 수 없습니다."
     
+    metas = [doc.metadata or {} for doc in docs]
+    contents = [str(doc.page_content) if doc.page_content else "" for doc in docs]
+    if token_budget is None:
+        # 오프라인 정규화(ingest.py)된 문서는 미리 잘라 둔 스니펫 사용
+        contents = [meta.get("snippet") or content[:1000] for meta, content in zip(metas, contents)]
+    else:
+        if relevance:
+            # 관련도(코사인 유사도)가 0 이하인 문서도 최소 몫은 받도록 하한 적용
+            weights = [max(score, 0.01) for score in relevance]
+        else:
+            weights = [1.0 / (rank + 1) for rank in range(len(docs))]
+        lengths = [meta.get("token_length") or count_tokens(content) for meta, content in zip(metas, contents)]
+        # 머리말/문서별 제목 줄 몫을 제외한 나머지를 본문에 배분
+        body_budget = max(0, token_budget - 200 - 30 * len(docs))
+        allocation = allocate_token_budget(lengths, weights, body_budget, CONTEXT_MIN_DOC_TOKENS)
+        contents = [
+            content if tokens >= length else truncate_to_tokens(content, tokens)
+            for content, length, tokens in zip(contents, lengths, allocation)
+        ]
+    
+    counts = dict.fromkeys(_HEADER_ORDER, 0)
     formatted_docs = []
-    news_count = 0
-    precedent_count = 0
-    interpretation_count = 0
-    qa_count = 0
     
     for i, doc in enumerate(docs):
         try:
-            meta = doc.metadata if doc.metadata else {}
-            content = str(doc.page_content)[:1000] if doc.page_content else ""
-            
-            is_news = ('url' in meta and 'title' in meta) or ('date' in meta and 'title' in meta)
-            
-            if is_news:
-                news_count += 1
-                title = str(meta.get("title", "제목없음"))[:80]
-                date = str(meta.get("date", "날짜미상"))
-                source = str(meta.get("source", "뉴스"))
-                
-                formatted = f"[뉴스-{news_count}] 📰 뉴스\n"
-                formatted += f"제목: {title}\n"
-                formatted += f"출처: {source} | 날짜: {date}\n"
-                formatted += f"내용: {content}...\n"
-                
-            else:
-                doc_type = str(meta.get("doc_type", "")).lower()
-                
-                if any(keyword in doc_type for keyword in ["판례", "판결", "대법원", "고등법원", "지방법원"]) or \
-                   any(key in meta for key in ["판결요지", "판시사항", "case_id", "court"]):
-                    
-                    case_id = str(meta.get("case_id", ""))
-                    if case_id and case_id.strip() != "":
-                        formatted = f"[판례-{case_id}] 🏛️ 판례\n"
-                    else:
-                        precedent_count += 1
-                        formatted = f"[판례-{precedent_count}] 🏛️ 판례\n"
-                    
-                    formatted += f"내용: {content}...\n"
-                    
-                elif any(keyword in doc_type for keyword in ["법령해석", "해석례", "유권해석", "행정해석"]) or \
-                     any(key in meta for key in ["해석내용", "법령명", "interpretation_id"]):
-                    
-                    interpretation_id = str(meta.get("interpretation_id", ""))
-                    if interpretation_id and interpretation_id.strip() != "":
-                        formatted = f"[법령해석례-{interpretation_id}] ⚖️ 법령해석례\n"
-                    else:
-                        interpretation_count += 1
-                        formatted = f"[법령해석례-{interpretation_count}] ⚖️ 법령해석례\n"
-                    
-                    formatted += f"내용: {content}...\n"
-                    
-                elif any(keyword in doc_type for keyword in ["백문백답", "생활법령", "qa", "질의응답", "faq"]) or \
-                     any(key in meta for key in ["질문", "답변", "question", "answer", "qa_id"]):
-                    
-                    qa_id = str(meta.get("qa_id", ""))
-                    if qa_id and qa_id.strip() != "":
-                        formatted = f"[백문백답-{qa_id}] 💡 생활법령 Q&A\n"
-                    else:
-                        qa_count += 1
-                        formatted = f"[백문백답-{qa_count}] 💡 생활법령 Q&A\n"
-                    
-                    formatted += f"내용: {content}...\n"
-                    
-                else:
-                    precedent_count += 1
-                    source = str(meta.get("doc_type", "법률자료"))
-                    formatted = f"[법률-{precedent_count}] 📋 {source}\n"
-                    formatted += f"내용: {content}...\n"
-            
-            formatted_docs.append(formatted)
-            
+            meta = metas[i]
+            doc_class = meta.get("doc_class") or classify_document(meta)
+            formatter, counter = _FORMATTERS.get(doc_class, _FORMATTERS[DOC_CLASS_OTHER])
+            formatted_docs.append(formatter(meta, contents[i], counts, counter))
         except Exception as e:
             print(f"⚠️ 문서 포맷팅 오류: {e}")
-            try:
-                content = str(doc.page_content)[:1000] if doc.page_content else "내용 없음"
-                formatted_docs.append(f"[문서-{i+1}] {content}...")
-            except:
-                continue
+            formatted_docs.append(f"[문서-{i+1}] {contents[i] or '내용 없음'}...")
     
     # 결과 조합 - 유형별 개수 표시
-    header_parts = []
-    if precedent_count > 0:
-        header_parts.append(f"판례 {precedent_count}개")
-    if interpretation_count > 0:
-        header_parts.append(f"법령해석례 {interpretation_count}개")
-    if qa_count > 0:
-        header_parts.append(f"생활법령Q&A {qa_count}개")
-    if news_count > 0:
-        header_parts.append(f"뉴스 {news_count}개")
-    
-    header = f"📋 검색결과: {', '.join(header_parts)}\n"
-    header += "="*60 + "\n"
-    header += "⚠️ AI가 아래 자료 유형을 정확히 확인하고 답변하세요:\n"
-    
-    if precedent_count > 0:
-        header += f"• 판례 자료: [판례-번호] 🏛️ 판례 형태로 표시됨\n"
-    if interpretation_count > 0:
-        header += f"• 법령해석례 자료: [법령해석례-번호] ⚖️ 법령해석례 형태로 표시됨\n"
-    if qa_count > 0:
-        header += f"• 생활법령 자료: [백문백답-번호] 💡 생활법령 Q&A 형태로 표시됨\n"
-    if news_count > 0:
-        header += f"• 뉴스 자료: [뉴스-번호] 📰 뉴스 형태로 표시됨\n"
-    
-    header += "="*60 + "\n\n"
+    present = [doc_class for doc_class in _HEADER_ORDER if counts[doc_class] > 0]
+    result = "".join([
+        "📋 검색결과: ", ", ".join(f"{_HEADER_LABELS[c]} {counts[c]}개" for c in present), "\n",
+        _RULE, "\n",
+        "⚠️ AI가 아래 자료 유형을 정확히 확인하고 답변하세요:\n",
+        *(_HEADER_GUIDES[c] for c in present),
+        _RULE, "\n\n",
+        "\n\n".join(formatted_docs),
+    ])
     
-    result = header + "\n\n".join(formatted_docs)
+    if stats is not None:
+        stats["context_tokens"] = count_tokens(result)
     
     return result
@@ -0,0 +1,541 @@
+"""
+벡터 DB 어휘(BM25) 검색용 디스크 역색인
+
+컬렉션별 디렉터리에 세그먼트 단위로 저장하며, 조회는 메모리 매핑한 파일에서
+직접 수행하므로 시작 시 인덱스 전체를 메모리에 올리지 않습니다.
+
+세그먼트 파일 구성:
+    lexicon.bin   용어 정렬 순서의 고정 길이 항목 (용어/포스팅 위치, 문서 빈도)
+    terms.bin     용어 UTF-8 바이트
+    postings.bin  (문서 번호 차이, 빈도) varint 압축 포스팅
+    doclens.bin   문서별 토큰 수 (uint32)
+    ids.bin       Chroma 문서 id UTF-8 바이트
+    idoffs.bin    문서 id 시작 위치 (uint64, 문서 수 + 1개)
+"""
+import hashlib
+import json
+import math
+import mmap
+import os
+import re
+import shutil
+import struct
+import threading
+import time
+import unicodedata
+import uuid
+from array import array
+from collections import Counter, defaultdict
+from langchain_core.documents import Document
+
+
+_TOKEN_PATTERN = re.compile(r"[0-9a-z가-힣]+")
+_HANGUL_PATTERN = re.compile(r"[가-힣]")
+
+# 긴 조사부터 제거 (예: "에서" → "에")
+_JOSA_SUFFIXES = sorted([
+    "은", "는", "이", "가", "을", "를", "에", "의", "도", "만", "와", "과", "로", "으로",
+    "에서", "에게", "한테", "까지", "부터", "이나", "나", "이랑", "랑", "께서", "보다",
+], key=len, reverse=True)
+
+_LEXICON_ENTRY = struct.Struct("<QIQII")
+_MANIFEST_NAME = "manifest.json"
+_LOCK_NAME = "build.lock"
+_STALE_LOCK_SECONDS = 3600
+_LOCK_POLL_SECONDS = 5.0
+# 교체된 세그먼트는 다른 프로세스가 이전 manifest로 열 수 있도록 이 시간이 지난 뒤 삭제
+_RETIRED_SEGMENT_SECONDS = 3600
+_MAX_SEGMENTS = 16
+
+
+def _strip_josa(token: str) -> str:
+    for suffix in _JOSA_SUFFIXES:
+        if len(token) > len(suffix) + 1 and token.endswith(suffix):
+            return token[:-len(suffix)]
+    return token
+
+
+def korean_tokenize(text: str) -> list:
+    """한국어 검색용 토큰화 - 조사를 뗀 어절 + 음절 바이그램
+
+    사건번호("2019다12345")나 법령명처럼 붙여 쓰는 용어는 어절 그대로,
+    "임차권등기명령"처럼 띄어쓰기가 흔들리는 복합어는 바이그램으로 매칭됩니다.
+    """
+    normalized = unicodedata.normalize("NFKC", text).lower()
+    tokens = []
+    for word in _TOKEN_PATTERN.findall(normalized):
+        if not _HANGUL_PATTERN.search(word):
+            tokens.append(word)
+            continue
+        stem = _strip_josa(word)
+        tokens.append(stem)
+        if len(stem) > 2:
+            tokens.extend(stem[i:i + 2] for i in range(len(stem) - 1))
+    return tokens
+
+
+def _encode_varint(value, out: bytearray):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _decode_postings(buffer, start, end):
+    """varint 포스팅 디코딩 - (문서 번호, 빈도) 순회"""
+    position = start
+    doc_idx = 0
+    values = []
+    while position < end:
+        value = 0
+        shift = 0
+        while True:
+            byte = buffer[position]
+            position += 1
+            value |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                break
+            shift += 7
+        values.append(value)
+        if len(values) == 2:
+            doc_idx += values[0]
+            yield doc_idx, values[1]
+            values.clear()
+
+
+def _mmap_file(path):
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b""
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def write_segment(directory, documents):
+    """(id, 본문) 목록으로 세그먼트 파일 작성 - (문서 수, 총 토큰 수) 반환"""
+    os.makedirs(directory, exist_ok=True)
+    postings = defaultdict(list)
+    doc_lengths = array("I")
+    id_bytes = bytearray()
+    id_offsets = array("Q", [0])
+
+    for doc_idx, (doc_id, text) in enumerate(documents):
+        tokens = korean_tokenize(text or "")
+        doc_lengths.append(len(tokens))
+        id_bytes += doc_id.encode("utf-8")
+        id_offsets.append(len(id_bytes))
+        for term, tf in Counter(tokens).items():
+            postings[term].append((doc_idx, tf))
+
+    terms = bytearray()
+    encoded = bytearray()
+    lexicon = bytearray()
+    for term_bytes, term in sorted((term.encode("utf-8"), term) for term in postings):
+        term_offset = len(terms)
+        terms += term_bytes
+        postings_offset = len(encoded)
+        previous = 0
+        for doc_idx, tf in postings[term]:
+            _encode_varint(doc_idx - previous, encoded)
+            _encode_varint(tf, encoded)
+            previous = doc_idx
+        lexicon += _LEXICON_ENTRY.pack(
+            term_offset, len(term_bytes), postings_offset, len(encoded) - postings_offset, len(postings[term])
+        )
+
+    for name, data in (
+        ("lexicon.bin", lexicon), ("terms.bin", terms), ("postings.bin", encoded),
+        ("doclens.bin", doc_lengths.tobytes()), ("ids.bin", id_bytes), ("idoffs.bin", id_offsets.tobytes()),
+    ):
+        with open(os.path.join(directory, name), "wb") as f:
+            f.write(data)
+
+    return len(doc_lengths), sum(doc_lengths)
+
+
+class _Segment:
+    """메모리 매핑된 세그먼트 (읽기 전용)"""
+
+    def __init__(self, directory):
+        self._lexicon = _mmap_file(os.path.join(directory, "lexicon.bin"))
+        self._terms = _mmap_file(os.path.join(directory, "terms.bin"))
+        self._postings = _mmap_file(os.path.join(directory, "postings.bin"))
+        self._ids = _mmap_file(os.path.join(directory, "ids.bin"))
+        self.doc_lengths = memoryview(_mmap_file(os.path.join(directory, "doclens.bin"))).cast("B").cast("I")
+        self._id_offsets = memoryview(_mmap_file(os.path.join(directory, "idoffs.bin"))).cast("B").cast("Q")
+        self.n_terms = len(self._lexicon) // _LEXICON_ENTRY.size
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    def _entry(self, position):
+        return _LEXICON_ENTRY.unpack_from(self._lexicon, position * _LEXICON_ENTRY.size)
+
+    def lookup(self, term_bytes):
+        """용어 이진 탐색 - (포스팅 시작, 끝, 문서 빈도) 또는 None"""
+        low, high = 0, self.n_terms
+        while low < high:
+            middle = (low + high) // 2
+            term_offset, term_len, postings_offset, postings_len, df = self._entry(middle)
+            candidate = self._terms[term_offset:term_offset + term_len]
+            if candidate < term_bytes:
+                low = middle + 1
+            elif candidate > term_bytes:
+                high = middle
+            else:
+                return postings_offset, postings_offset + postings_len, df
+        return None
+
+    def postings(self, entry):
+        start, end, _ = entry
+        return _decode_postings(self._postings, start, end)
+
+    def doc_id(self, doc_idx):
+        return bytes(self._ids[self._id_offsets[doc_idx]:self._id_offsets[doc_idx + 1]]).decode("utf-8")
+
+    def iter_doc_ids(self):
+        for doc_idx in range(len(self)):
+            yield self.doc_id(doc_idx)
+
+
+class InvertedIndex:
+    """세그먼트 기반 BM25 역색인
+
+    새 문서는 새 세그먼트로 추가하고 manifest.json을 원자적으로 교체하므로,
+    생성 중에도 다른 프로세스는 이전 manifest 기준으로 계속 검색할 수 있습니다.
+    """
+
+    def __init__(self, directory, k1=1.5, b=0.75):
+        self.directory = directory
+        self.k1 = k1
+        self.b = b
+        self.segments = []
+        self.manifest = {
+            "segments": [], "n_docs": 0, "total_length": 0, "id_digest": None, "source": None, "retired": [],
+        }
+        self.open()
+
+    def open(self, attempts=3):
+        """manifest 기준으로 세그먼트 메모리 매핑
+
+        manifest를 읽은 직후 다른 프로세스가 교체해 세그먼트가 사라졌으면 manifest를 다시 읽습니다.
+        """
+        path = os.path.join(self.directory, _MANIFEST_NAME)
+        for attempt in range(attempts):
+            if not os.path.exists(path):
+                return
+            with open(path, encoding="utf-8") as f:
+                manifest = json.load(f)
+            try:
+                self.segments = [_Segment(os.path.join(self.directory, s["name"])) for s in manifest["segments"]]
+            except FileNotFoundError:
+                if attempt == attempts - 1:
+                    raise
+                continue
+            self.manifest = manifest
+            return
+
+    def __len__(self):
+        return self.manifest["n_docs"]
+
+    @property
+    def id_digest(self):
+        return self.manifest.get("id_digest")
+
+    @property
+    def source(self):
+        """색인 당시 컬렉션 지문 (source_fingerprint)"""
+        return self.manifest.get("source")
+
+    def indexed_ids(self) -> set:
+        return {doc_id for segment in self.segments for doc_id in segment.iter_doc_ids()}
+
+    def _write_manifest(self, manifest):
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, _MANIFEST_NAME)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def add_documents(self, documents, id_digest=None, source=None, segment_max_docs=50000, reset=False,
+                      on_segment=None):
+        """(id, 본문) 목록을 새 세그먼트로 추가 - reset이면 기존 세그먼트를 대체
+
+        on_segment는 세그먼트를 하나 쓸 때마다, 그리고 manifest 교체 직전에 호출됩니다 (색인 잠금 갱신용).
+        """
+        now = time.time()
+        retired = [r for r in self.manifest.get("retired", []) if now - r["retired_at"] < _RETIRED_SEGMENT_SECONDS]
+        expired = {r["name"] for r in self.manifest.get("retired", [])} - {r["name"] for r in retired}
+        if reset:
+            retired += [{"name": s["name"], "retired_at": now} for s in self.manifest["segments"]]
+        manifest = {
+            "segments": [] if reset else list(self.manifest["segments"]),
+            "n_docs": 0 if reset else self.manifest["n_docs"],
+            "total_length": 0 if reset else self.manifest["total_length"],
+            "id_digest": id_digest,
+            "source": source,
+            "retired": retired,
+        }
+
+        batch = []
+
+        def flush():
+            name = f"seg-{int(time.time() * 1000)}-{os.getpid()}-{len(manifest['segments'])}"
+            n_docs, total_length = write_segment(os.path.join(self.directory, name), batch)
+            manifest["segments"].append({"name": name, "n_docs": n_docs, "total_length": total_length})
+            manifest["n_docs"] += n_docs
+            manifest["total_length"] += total_length
+            batch.clear()
+            if on_segment is not None:
+                on_segment()
+
+        for document in documents:
+            batch.append(document)
+            if len(batch) >= segment_max_docs:
+                flush()
+        if batch:
+            flush()
+
+        if on_segment is not None:
+            on_segment()
+        self._write_manifest(manifest)
+        self.open()
+
+        # 교체된 세그먼트는 바로 지우지 않고 manifest의 retired에 남겨 두었다가 유예 시간이 지나면 삭제
+        # (다른 프로세스가 이전 manifest를 읽은 뒤 세그먼트를 여는 중일 수 있음)
+        for name in expired:
+            shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+
+    def search(self, query: str, k=10) -> list:
+        """BM25 점수 상위 k개 - [(문서 id, 점수)]"""
+        n_docs = self.manifest["n_docs"]
+        if not n_docs:
+            return []
+        avg_length = self.manifest["total_length"] / n_docs
+
+        scores = defaultdict(float)
+        for term in set(korean_tokenize(query)):
+            term_bytes = term.encode("utf-8")
+            entries = [(i, segment.lookup(term_bytes)) for i, segment in enumerate(self.segments)]
+            entries = [(i, entry) for i, entry in entries if entry is not None]
+            if not entries:
+                continue
+            df = sum(entry[2] for _, entry in entries)
+            idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            for i, entry in entries:
+                doc_lengths = self.segments[i].doc_lengths
+                for doc_idx, tf in self.segments[i].postings(entry):
+                    norm = self.k1 * (1 - self.b + self.b * doc_lengths[doc_idx] / avg_length)
+                    scores[i, doc_idx] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [(self.segments[i].doc_id(doc_idx), score) for (i, doc_idx), score in ranked]
+
+
+def iter_collection_ids(db, batch_size=5000):
+    """Chroma 컬렉션 전체 문서 id 순회"""
+    offset = 0
+    while True:
+        ids = db.get(limit=batch_size, offset=offset, include=[]).get("ids") or []
+        if not ids:
+            return
+        yield from ids
+        offset += len(ids)
+
+
+def iter_documents(db, ids, batch_size=1000):
+    """id 목록의 (id, 본문) 순회"""
+    for start in range(0, len(ids), batch_size):
+        batch = db.get(ids=ids[start:start + batch_size], include=["documents"])
+        yield from zip(batch["ids"], batch["documents"])
+
+
+def count_documents(db) -> int:
+    """벡터 스토어 문서 수 - Chroma는 컬렉션, 스냅샷은 count()"""
+    collection = getattr(db, "_collection", None)
+    return (collection if collection is not None else db).count()
+
+
+def source_fingerprint(db) -> list:
+    """컬렉션 변경 여부를 싸게 확인하는 지문 - [문서 수, DB 파일 수정 시각]
+
+    Chroma는 chroma.sqlite3, 스냅샷은 manifest.json의 수정 시각을 쓰며, 찾지 못하면 수정 시각은 None입니다.
+    """
+    directory = getattr(db, "_persist_directory", None) or getattr(db, "snapshot_dir", None)
+    mtime = None
+    for name in ("chroma.sqlite3", "manifest.json"):
+        try:
+            mtime = os.stat(os.path.join(directory, name)).st_mtime_ns
+            break
+        except (OSError, TypeError):
+            continue
+    return [count_documents(db), mtime]
+
+
+def ids_digest(ids) -> str:
+    """문서 id 집합의 해시 (순서 무관) - 같은 수만큼 삭제/추가된 경우도 구분"""
+    digest = hashlib.sha256()
+    for doc_id in sorted(ids):
+        digest.update(doc_id.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _lock_age(lock_path):
+    """잠금 파일의 마지막 갱신 후 경과 시간 - 없으면 None"""
+    try:
+        return time.time() - os.path.getmtime(lock_path)
+    except OSError:
+        return None
+
+
+def _read_lock_token(lock_path):
+    try:
+        with open(lock_path, encoding="utf-8") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def _acquire_build_lock(lock_path):
+    """프로세스 간 색인 잠금 - 잡으면 소유 토큰, 다른 프로세스가 잡고 있으면 None
+
+    잠금 파일에는 토큰(pid:uuid)을 쓰고, 색인 중에는 세그먼트마다 수정 시각을 갱신합니다.
+    _STALE_LOCK_SECONDS 동안 갱신되지 않은 잠금만 비정상 종료로 보고 가져옵니다.
+    """
+    age = _lock_age(lock_path)
+    if age is not None and age > _STALE_LOCK_SECONDS:
+        try:
+            os.remove(lock_path)
+        except OSError:
+            pass
+    try:
+        fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        return None
+    token = f"{os.getpid()}:{uuid.uuid4().hex}"
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(token)
+    return token
+
+
+def _refresh_build_lock(lock_path, token):
+    """색인 진행 중 잠금 갱신 - 다른 프로세스에 잠금을 빼앗겼으면 RuntimeError"""
+    if _read_lock_token(lock_path) != token:
+        raise RuntimeError(f"어휘 인덱스 잠금을 잃었습니다: {lock_path}")
+    os.utime(lock_path)
+
+
+def _release_build_lock(lock_path, token):
+    """자신의 토큰이 남아 있을 때만 잠금 파일 삭제"""
+    if _read_lock_token(lock_path) == token:
+        try:
+            os.remove(lock_path)
+        except OSError:
+            pass
+
+
+_build_lock = threading.Lock()
+
+
+def open_or_update_index(db, directory, segment_max_docs=50000) -> InvertedIndex:
+    """디스크 인덱스가 컬렉션과 같은지 확인하고 새로 추가된 문서만 증분 색인
+
+    먼저 문서 수/DB 파일 수정 시각(source_fingerprint)을 색인 당시와 비교해 같으면 바로 반환하고,
+    다르거나 수정 시각을 알 수 없을 때만 전체 문서 id 해시를 계산합니다. 삭제된 문서가 있거나 세그먼트가 너무 많아지면 전체를 다시 색인합니다.
+    다른 프로세스가 색인 중이면 끝날 때까지 기다린 뒤 다시 엽니다.
+    요청 경로에서는 InvertedIndex(directory)로 기존 인덱스를 바로 열어 쓰고, 이 함수는 백그라운드 스레드에서 호출합니다.
+    """
+    with _build_lock:
+        os.makedirs(directory, exist_ok=True)
+        lock_path = os.path.join(directory, _LOCK_NAME)
+        # id를 읽기 전에 지문을 떠야 그 사이 추가된 문서가 다음 확인에서 잡힘
+        source = source_fingerprint(db)
+        index = InvertedIndex(directory)
+        # 수정 시각을 알 수 없으면 문서 수만으로는 판단하지 않음 (같은 수만큼 삭제/추가)
+        if source[1] is not None and index.source == source:
+            return index
+
+        current_ids = set(iter_collection_ids(db))
+        id_digest = ids_digest(current_ids)
+
+        while True:
+            index = InvertedIndex(directory)
+            if index.id_digest == id_digest and index.source == source:
+                return index
+
+            token = _acquire_build_lock(lock_path)
+            if token is None:
+                print(f"⏳ 다른 프로세스가 어휘 인덱스 생성 중 - 완료 후 다시 열기: {directory}")
+                while True:
+                    age = _lock_age(lock_path)
+                    if age is None or age > _STALE_LOCK_SECONDS:
+                        break
+                    time.sleep(_LOCK_POLL_SECONDS)
+                continue
+
+            try:
+                index.open()
+                if index.id_digest == id_digest and index.source == source:
+                    return index
+                known_ids = index.indexed_ids()
+                reset = bool(known_ids - current_ids) or len(index.segments) >= _MAX_SEGMENTS
+                if reset:
+                    known_ids = set()
+                new_ids = [doc_id for doc_id in current_ids if doc_id not in known_ids]
+                # 문서 id가 같으면 지문만 갱신 (새 세그먼트 없이 manifest만 교체)
+                if new_ids or reset:
+                    print(f"🔨 어휘 인덱스 {'재생성' if reset else '증분 색인'}: {len(new_ids)}개 문서 ({directory})")
+                index.add_documents(
+                    iter_documents(db, new_ids), id_digest=id_digest, source=source,
+                    segment_max_docs=segment_max_docs, reset=reset,
+                    on_segment=lambda: _refresh_build_lock(lock_path, token),
+                )
+                print(f"✅ 어휘 인덱스 준비 완료: {len(index)}개 문서")
+                return index
+            finally:
+                _release_build_lock(lock_path, token)
+
+
+class LexicalRetriever:
+    """어휘 인덱스 검색 결과를 Chroma 문서로 반환하는 리트리버
+
+    search()는 search_legal_db/search_news_db와 같은 (쿼리, 쿼리 임베딩) 인자를 받습니다.
+    """
+
+    def __init__(self, db, index: InvertedIndex, k=5):
+        self.db = db
+        self.index = index
+        self.k = k
+
+    def search_ids(self, query, k=None) -> list:
+        return self.index.search(query, k=k or self.k)
+
+    def fetch(self, ids) -> list:
+        """id 순서대로 Chroma 문서 조회"""
+        if not ids:
+            return []
+        fetched = self.db.get(ids=list(ids), include=["documents", "metadatas"])
+        docs = {
+            doc_id: Document(page_content=text or "", metadata=meta or {}, id=doc_id)
+            for doc_id, text, meta in zip(fetched["ids"], fetched["documents"], fetched["metadatas"])
+        }
+        return [docs[doc_id] for doc_id in ids if doc_id in docs]
+
+    def search(self, query, query_embedding=None, k=None):
+        """어휘 검색 - (문서, 최고 BM25 점수)"""
+        hits = self.search_ids(query, k)
+        return self.fetch([doc_id for doc_id, _ in hits]), (hits[0][1] if hits else 0.0)
+
+    def invoke(self, query):
+        return self.search(query)[0]
+
+
+def reciprocal_rank_fusion(result_lists, k=60, limit=None) -> list:
+    """여러 순위 목록을 RRF 점수로 결합 - [(키, 점수)]"""
+    scores = defaultdict(float)
+    for results in result_lists:
+        for rank, key in enumerate(results):
+            scores[key] += 1.0 / (k + rank + 1)
+    fused = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    return fused[:limit] if limit else fused
@@ -0,0 +1,332 @@
+"""
+프로세스 공용 OpenAI LLM 게이트웨이
+
+모든 ChatOpenAI 호출(쿼리 변환, 답변 생성, 대화 요약)이 이 모듈을 거칩니다.
+- 공유 httpx 클라이언트 (keep-alive 연결 풀, 비동기 연결 풀은 이벤트 루프별)
+- 동기/비동기 호출이 함께 쓰는 프로세스 공용 동시 호출 수 제한
+- 429/5xx/연결 오류 시 지터가 있는 지수 백오프 재시도 (Retry-After 우선)
+- 모델별 호출 지연 시간/토큰 집계
+
+OPENAI_BASE_URL(또는 같은 이름의 환경변수)로 로컬 OpenAI 호환 모의 서버에 붙여 시험할 수 있습니다.
+(mock_llm_server.py - 동시 호출 한도와 재시도 확인용)
+"""
+import asyncio
+import os
+import random
+import threading
+import time
+import weakref
+from collections import defaultdict, deque
+
+import httpx
+import openai
+from langchain_openai import ChatOpenAI
+from config import (
+    OPENAI_MODEL, OPENAI_BASE_URL, LLM_TIMEOUT, LLM_MAX_CONCURRENCY, LLM_MAX_RETRIES,
+    LLM_BACKOFF_BASE, LLM_BACKOFF_MAX, LLM_POOL_CONNECTIONS, LLM_POOL_KEEPALIVE
+)
+
+
+_RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+def is_retryable(error) -> bool:
+    """재시도할 오류인지 - 연결/타임아웃, 429, 5xx"""
+    if isinstance(error, (openai.APIConnectionError, httpx.TransportError)):
+        return True
+    status = getattr(error, "status_code", None)
+    return status in _RETRYABLE_STATUS or (status is not None and status >= 500)
+
+
+def backoff_delay(attempt, error=None, base=LLM_BACKOFF_BASE, cap=LLM_BACKOFF_MAX) -> float:
+    """재시도 대기 시간 - Retry-After 헤더가 있으면 따르고, 없으면 full jitter 지수 백오프"""
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            return min(cap, float(retry_after))
+        except ValueError:
+            pass
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class LLMMetrics:
+    """모델별 호출 수, 오류/재시도 수, 지연 시간(p50/p95), 토큰 사용량"""
+
+    def __init__(self, window=1000):
+        self._lock = threading.Lock()
+        self._calls = defaultdict(int)
+        self._errors = defaultdict(int)
+        self._retries = defaultdict(int)
+        self._input_tokens = defaultdict(int)
+        self._output_tokens = defaultdict(int)
+        self._latencies = defaultdict(lambda: deque(maxlen=window))
+
+    def record(self, model, latency, usage=None, error=False):
+        with self._lock:
+            self._calls[model] += 1
+            self._latencies[model].append(latency)
+            if error:
+                self._errors[model] += 1
+            if usage:
+                self._input_tokens[model] += usage.get("input_tokens", 0)
+                self._output_tokens[model] += usage.get("output_tokens", 0)
+
+    def record_retry(self, model):
+        with self._lock:
+            self._retries[model] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            report = {}
+            for model, calls in self._calls.items():
+                latencies = sorted(self._latencies[model])
+                report[model] = {
+                    "calls": calls,
+                    "errors": self._errors[model],
+                    "retries": self._retries[model],
+                    "input_tokens": self._input_tokens[model],
+                    "output_tokens": self._output_tokens[model],
+                    "p50_ms": latencies[len(latencies) // 2] * 1000 if latencies else 0.0,
+                    "p95_ms": latencies[int(len(latencies) * 0.95)] * 1000 if latencies else 0.0,
+                }
+            return report
+
+
+metrics = LLMMetrics()
+
+
+def _wake(waiter):
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+class ConcurrencyLimiter:
+    """동기 호출(with)과 비동기 호출(async with)이 함께 쓰는 동시 실행 한도
+
+    스레드와 여러 이벤트 루프의 호출을 하나의 카운터로 세므로 합계가 limit을 넘지 않습니다.
+    비동기 대기는 스레드를 막지 않고, 슬롯이 반납되면 대기 중인 루프에 깨움 신호를 보냅니다.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.active = 0
+        self.peak = 0
+        self._cond = threading.Condition()
+        self._async_waiters = deque()
+
+    def _try_acquire(self):
+        if self.active >= self.limit:
+            return False
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        return True
+
+    def _wake_async_waiter(self):
+        while self._async_waiters:
+            loop, waiter = self._async_waiters.popleft()
+            if not waiter.done():
+                loop.call_soon_threadsafe(_wake, waiter)
+                return
+
+    def acquire(self):
+        with self._cond:
+            while not self._try_acquire():
+                self._cond.wait()
+
+    async def acquire_async(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._cond:
+                if self._try_acquire():
+                    return
+                waiter = loop.create_future()
+                self._async_waiters.append((loop, waiter))
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                with self._cond:
+                    # 깨움 신호를 받은 뒤 취소되었으면 다음 대기자에게 넘김
+                    if waiter.done() and not waiter.cancelled():
+                        self._wake_async_waiter()
+                raise
+
+    def release(self):
+        with self._cond:
+            self.active -= 1
+            # 스레드와 루프 대기자를 하나씩 깨우고, 슬롯을 못 얻은 쪽은 다시 대기
+            self._cond.notify()
+            self._wake_async_waiter()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+    async def __aenter__(self):
+        await self.acquire_async()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.release()
+
+
+_lock = threading.Lock()
+_http_client = None
+_async_http_client = None
+_models = {}
+slots = ConcurrencyLimiter(LLM_MAX_CONCURRENCY)
+
+
+def _limits():
+    return httpx.Limits(max_connections=LLM_POOL_CONNECTIONS, max_keepalive_connections=LLM_POOL_KEEPALIVE)
+
+
+class LoopLocalAsyncTransport(httpx.AsyncBaseTransport):
+    """실행 중인 이벤트 루프마다 따로 연결 풀을 두는 비동기 전송 계층
+
+    비동기 연결은 자신을 연 루프에 묶여 있어, 캐시된 모델 하나를 asyncio.run을 여러 번(또는 여러 스레드의 루프에서)
+    쓰면 앞선 루프의 연결을 재사용하다 실패합니다. 닫힌 루프의 연결 풀은 다음 요청 때 버려집니다.
+    """
+
+    def __init__(self):
+        self._transports = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def _transport(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            # 연결이 루프를 참조해 약한 참조만으로는 풀리지 않으므로 닫힌 루프의 풀은 여기서 버림
+            for closed in [other for other in self._transports if other.is_closed()]:
+                del self._transports[closed]
+            transport = self._transports.get(loop)
+            if transport is None:
+                transport = self._transports[loop] = httpx.AsyncHTTPTransport(limits=_limits())
+            return transport
+
+    async def handle_async_request(self, request):
+        return await self._transport().handle_async_request(request)
+
+    async def aclose(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            transport = self._transports.pop(loop, None)
+        if transport is not None:
+            await transport.aclose()
+
+
+def get_http_clients():
+    """공유 (동기, 비동기) httpx 클라이언트 - 프로세스당 하나 (비동기 연결 풀은 이벤트 루프별)"""
+    global _http_client, _async_http_client
+    with _lock:
+        if _http_client is None:
+            _http_client = httpx.Client(limits=_limits(), timeout=LLM_TIMEOUT)
+            _async_http_client = httpx.AsyncClient(transport=LoopLocalAsyncTransport(), timeout=LLM_TIMEOUT)
+        return _http_client, _async_http_client
+
+
+def _usage(message):
+    return getattr(message, "usage_metadata", None) or {}
+
+
+class GatewayChatOpenAI(ChatOpenAI):
+    """동시 호출 제한 + 재시도 + 지표 집계를 거치는 ChatOpenAI
+
+    스트리밍은 첫 청크를 받기 전까지만 재시도합니다 (이미 보낸 응답을 중복 전송하지 않음).
+    """
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            started = time.perf_counter()
+            try:
+                with slots:
+                    result = super()._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+                metrics.record(self.model_name, time.perf_counter() - started, _usage(result.generations[0].message))
+                return result
+            except Exception as e:
+                metrics.record(self.model_name, time.perf_counter() - started, error=True)
+                if attempt >= LLM_MAX_RETRIES or not is_retryable(e):
+                    raise
+                metrics.record_retry(self.model_name)
+                time.sleep(backoff_delay(attempt, e))
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            started = time.perf_counter()
+            try:
+                async with slots:
+                    result = await super()._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+                metrics.record(self.model_name, time.perf_counter() - started, _usage(result.generations[0].message))
+                return result
+            except Exception as e:
+                metrics.record(self.model_name, time.perf_counter() - started, error=True)
+                if attempt >= LLM_MAX_RETRIES or not is_retryable(e):
+                    raise
+                metrics.record_retry(self.model_name)
+                await asyncio.sleep(backoff_delay(attempt, e))
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            started = time.perf_counter()
+            usage = {}
+            yielded = False
+            try:
+                with slots:
+                    for chunk in super()._stream(messages, stop=stop, run_manager=run_manager, **kwargs):
+                        usage = _usage(chunk.message) or usage
+                        yielded = True
+                        yield chunk
+                metrics.record(self.model_name, time.perf_counter() - started, usage)
+                return
+            except Exception as e:
+                metrics.record(self.model_name, time.perf_counter() - started, error=True)
+                if yielded or attempt >= LLM_MAX_RETRIES or not is_retryable(e):
+                    raise
+                metrics.record_retry(self.model_name)
+                time.sleep(backoff_delay(attempt, e))
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            started = time.perf_counter()
+            usage = {}
+            yielded = False
+            try:
+                async with slots:
+                    async for chunk in super()._astream(messages, stop=stop, run_manager=run_manager, **kwargs):
+                        usage = _usage(chunk.message) or usage
+                        yielded = True
+                        yield chunk
+                metrics.record(self.model_name, time.perf_counter() - started, usage)
+                return
+            except Exception as e:
+                metrics.record(self.model_name, time.perf_counter() - started, error=True)
+                if yielded or attempt >= LLM_MAX_RETRIES or not is_retryable(e):
+                    raise
+                metrics.record_retry(self.model_name)
+                await asyncio.sleep(backoff_delay(attempt, e))
+
+
+def get_chat_model(model=OPENAI_MODEL, temperature=0.0, max_tokens=None, **kwargs) -> ChatOpenAI:
+    """공유 연결 풀을 쓰는 ChatOpenAI - 같은 설정이면 프로세스 내에서 같은 인스턴스 반환"""
+    key = (model, temperature, max_tokens, repr(sorted(kwargs.items())))
+    with _lock:
+        if key in _models:
+            return _models[key]
+
+    http_client, async_http_client = get_http_clients()
+    base_url = OPENAI_BASE_URL or os.environ.get("OPENAI_BASE_URL")
+    llm = GatewayChatOpenAI(
+        model=model,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        max_retries=0,  # 재시도는 게이트웨이에서 처리
+        timeout=LLM_TIMEOUT,
+        http_client=http_client,
+        http_async_client=async_http_client,
+        **({"base_url": base_url} if base_url else {}),
+        **kwargs,
+    )
+    with _lock:
+        return _models.setdefault(key, llm)
@@ -0,0 +1,182 @@
+"""
+OpenAI 호환 모의 LLM 서버 + 게이트웨이 동시 호출 점검 (실제 API 호출 없이 llm_gateway.py 시험)
+
+/v1/chat/completions만 흉내 내며(일반/스트리밍), 지연 시간과 429/503 오류 비율을 조절할 수 있고
+서버가 동시에 처리 중인 요청 수의 최댓값을 기록합니다.
+
+사용법:
+    python mock_llm_server.py --port 8765          # 서버만 실행 (OPENAI_BASE_URL=http://127.0.0.1:8765/v1)
+    python mock_llm_server.py --check              # 동기/비동기/스트리밍 호출을 섞어 동시 호출 한도 점검
+    python mock_llm_server.py --check --limit 4 --error-rate 0.2
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class MockState:
+    """요청 수, 동시 처리 수 최댓값, 주입한 오류 수"""
+
+    def __init__(self, latency=0.05, error_rate=0.0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.requests = 0
+        self.errors = 0
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def enter(self):
+        with self._lock:
+            self.requests += 1
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+            fail = random.random() < self.error_rate
+            if fail:
+                self.errors += 1
+            return fail
+
+    def leave(self):
+        with self._lock:
+            self.active -= 1
+
+
+_USAGE = {"prompt_tokens": 100, "completion_tokens": 2, "total_tokens": 102, "prompt_tokens_details": {"cached_tokens": 64}}
+
+
+def _make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _send_json(self, status, payload, headers=()):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("content-type", "application/json")
+            self.send_header("content-length", str(len(body)))
+            for name, value in headers:
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _send_chunk(self, payload):
+            data = f"data: {payload}\n\n".encode("utf-8")
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers["content-length"])))
+            model = request.get("model", "mock")
+            fail = state.enter()
+            try:
+                time.sleep(state.latency)
+                if fail:
+                    status = random.choice([429, 503])
+                    headers = [("retry-after", "0.05")] if status == 429 else []
+                    self._send_json(status, {"error": {"message": "mock overload", "type": "mock"}}, headers)
+                    return
+                if not request.get("stream"):
+                    self._send_json(200, {
+                        "id": "mock", "object": "chat.completion", "created": 0, "model": model,
+                        "choices": [{"index": 0, "message": {"role": "assistant", "content": "모의 응답"},
+                                     "finish_reason": "stop"}],
+                        "usage": _USAGE,
+                    })
+                    return
+                self.send_response(200)
+                self.send_header("content-type", "text/event-stream")
+                self.send_header("transfer-encoding", "chunked")
+                self.end_headers()
+                chunk = {"id": "mock", "object": "chat.completion.chunk", "created": 0, "model": model}
+                for token in ["모의", " 응답"]:
+                    self._send_chunk(json.dumps({**chunk, "choices": [
+                        {"index": 0, "delta": {"content": token}, "finish_reason": None}]}))
+                self._send_chunk(json.dumps({**chunk, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}))
+                self._send_chunk(json.dumps({**chunk, "choices": [], "usage": _USAGE}))
+                self._send_chunk("[DONE]")
+                self.wfile.write(b"0\r\n\r\n")
+            finally:
+                state.leave()
+
+    return Handler
+
+
+def start_server(port=0, latency=0.05, error_rate=0.0):
+    """백그라운드 스레드로 모의 서버 시작 - (서버, 상태, base_url)"""
+    state = MockState(latency, error_rate)
+    server = ThreadingHTTPServer(("127.0.0.1", port), _make_handler(state))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+
+def run_check(base_url, state, limit=None, sync_calls=40, async_calls=40):
+    """동기(invoke/stream)와 비동기(ainvoke) 호출을 동시에 보내 서버 측 최대 동시 처리 수가 한도 이내인지 확인"""
+    os.environ["OPENAI_BASE_URL"] = base_url
+    os.environ.setdefault("OPENAI_API_KEY", "mock")
+    import llm_gateway
+    from config import LLM_MAX_CONCURRENCY
+
+    limit = limit or LLM_MAX_CONCURRENCY
+    llm_gateway.slots = llm_gateway.ConcurrencyLimiter(limit)
+    llm = llm_gateway.get_chat_model()
+    messages = [{"role": "user", "content": "안녕하세요"}]
+
+    def sync_call(i):
+        if i % 2:
+            return "".join(chunk.content for chunk in llm.stream(messages))
+        return llm.invoke(messages).content
+
+    async def async_calls_main():
+        return await asyncio.gather(*(llm.ainvoke(messages) for _ in range(async_calls)), return_exceptions=True)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=sync_calls) as executor:
+        sync_results = executor.map(sync_call, range(sync_calls))
+        async_results = asyncio.run(async_calls_main())
+        sync_results = list(sync_results)
+    elapsed = time.perf_counter() - started
+
+    failures = [result for result in async_results if isinstance(result, Exception)]
+    print(f"📊 호출 {sync_calls + async_calls}건 ({elapsed:.2f}s), 서버 요청 {state.requests}건, 주입 오류 {state.errors}건")
+    print(f"📊 동시 처리 최대: 서버 {state.peak} / 게이트웨이 {llm_gateway.slots.peak} (한도 {limit})")
+    print(f"📊 모델별 지표: {json.dumps(llm_gateway.metrics.stats(), ensure_ascii=False)}")
+    if failures:
+        print(f"⚠️ 비동기 호출 실패 {len(failures)}건: {failures[0]}")
+    ok = state.peak <= limit and not failures and len(sync_results) == sync_calls
+    print("✅ 동시 호출 한도 유지" if ok else "❌ 동시 호출 한도 초과 또는 호출 실패")
+    return ok
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="OpenAI 호환 모의 LLM 서버")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.05, help="요청당 지연 시간(초)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="429/503 응답 비율")
+    parser.add_argument("--check", action="store_true", help="게이트웨이 동시 호출 한도 점검 후 종료")
+    parser.add_argument("--limit", type=int, default=None, help="점검 시 동시 호출 한도 (기본 LLM_MAX_CONCURRENCY)")
+    parser.add_argument("--calls", type=int, default=40, help="점검 시 동기/비동기 각각의 호출 수")
+    args = parser.parse_args(argv)
+
+    server, state, base_url = start_server(0 if args.check else args.port, args.latency, args.error_rate)
+    if args.check:
+        ok = run_check(base_url, state, args.limit, args.calls, args.calls)
+        server.shutdown()
+        raise SystemExit(0 if ok else 1)
+
+    print(f"🧪 모의 LLM 서버 실행 중: OPENAI_BASE_URL={base_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+프롬프트 캐시 모니터링 (OpenAI 자동 프롬프트 캐싱)
+
+OpenAI는 이전 요청과 앞부분이 바이트 단위로 같은 프롬프트(1024토큰 이상)를 캐시합니다.
+고정 지시문 → 대화 기록 → 참고자료 → 질문 순서로 보내 앞부분을 최대한 재사용하고,
+요청마다 앞부분 해시와 응답 usage의 캐시 적중 토큰 수를 기록합니다.
+"""
+import hashlib
+import json
+import threading
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+
+def prefix_hash(messages) -> str:
+    """메시지 목록의 해시 (역할 + 본문 기준, 앞 12자리)"""
+    digest = hashlib.sha256()
+    for message in messages:
+        digest.update(message.type.encode("utf-8"))
+        digest.update(b"\0")
+        content = message.content if isinstance(message.content, str) else json.dumps(message.content, ensure_ascii=False)
+        digest.update(content.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()[:12]
+
+
+class PromptCacheMonitor(BaseCallbackHandler):
+    """요청별 앞부분 해시와 입력/캐시 적중 토큰 수 집계
+
+    volatile_tail: 매 요청 바뀌는 뒤쪽 메시지 수 (참고자료 + 질문)
+    """
+
+    def __init__(self, volatile_tail=2):
+        self.volatile_tail = volatile_tail
+        self.calls = 0
+        self.input_tokens = 0
+        self.cached_tokens = 0
+        self.static_hashes = set()
+        self._lock = threading.Lock()
+        self._run_prefixes = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        prompt = messages[0]
+        static = prompt[:1]
+        with self._lock:
+            if static:
+                self.static_hashes.add(prefix_hash(static))
+            self._run_prefixes[run_id] = (prefix_hash(static), prefix_hash(prompt[:-self.volatile_tail]))
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        usage = {}
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                usage = getattr(message, "usage_metadata", None) or usage
+        static_hash, history_hash = self._run_prefixes.pop(run_id, ("-", "-"))
+        if not usage:
+            return
+
+        input_tokens = usage.get("input_tokens", 0)
+        cached = (usage.get("input_token_details") or {}).get("cache_read", 0) or 0
+        with self._lock:
+            self.calls += 1
+            self.input_tokens += input_tokens
+            self.cached_tokens += cached
+        print(f"🧊 프롬프트 캐시: {cached}/{input_tokens} 입력 토큰 적중 "
+              f"(고정 {static_hash}, 기록 포함 {history_hash}, 누적 적중률 {self.hit_ratio():.0%})")
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._run_prefixes.pop(run_id, None)
+
+    def hit_ratio(self) -> float:
+        return self.cached_tokens / self.input_tokens if self.input_tokens else 0.0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "input_tokens": self.input_tokens,
+                "cached_tokens": self.cached_tokens,
+                "uncached_tokens": self.input_tokens - self.cached_tokens,
+                "hit_ratio": self.hit_ratio(),
+                # 1개가 아니면 고정 지시문이 요청마다 달라지고 있다는 뜻
+                "static_prefix_variants": len(self.static_hashes),
+            }
@@ -0,0 +1,155 @@
+"""
+쿼리 변환 결과 영구 캐시 (SQLite)
+"""
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+
+
+_PUNCTUATION_PATTERN = re.compile(r"[\s\W_]+", re.UNICODE)
+
+
+def normalize_query(query: str) -> str:
+    """캐시 키 정규화 - 공백/문장부호/띄어쓰기 차이 제거"""
+    normalized = unicodedata.normalize("NFKC", query).lower()
+    return _PUNCTUATION_PATTERN.sub("", normalized)
+
+
+class QueryConversionCache:
+    """크기/TTL 제한이 있는 쿼리 변환 캐시
+
+    여러 세션과 워커 프로세스가 같은 SQLite 파일을 공유하며 재시작 후에도 유지됩니다.
+    """
+
+    def __init__(self, path, max_entries=1000, ttl_seconds=7 * 24 * 3600):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, timeout=5.0, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS query_conversion (
+                key TEXT PRIMARY KEY,
+                converted TEXT NOT NULL,
+                method TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_query_conversion_accessed ON query_conversion (accessed_at)"
+        )
+        # 룰 기반 변환에 실패해 GPT로 넘어간 쿼리 집계 (사전 확장용)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS gpt_fallthrough (
+                key TEXT PRIMARY KEY,
+                query TEXT NOT NULL,
+                count INTEGER NOT NULL,
+                last_seen REAL NOT NULL
+            )
+        """)
+        self._conn.commit()
+
+    def get(self, query: str):
+        """캐시 조회 - (변환 쿼리, 변환 방식) 또는 None"""
+        key = normalize_query(query)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT converted, method, created_at FROM query_conversion WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None or (self.ttl_seconds and now - row[2] > self.ttl_seconds):
+                if row is not None:
+                    self._conn.execute("DELETE FROM query_conversion WHERE key = ?", (key,))
+                    self._conn.commit()
+                self.misses += 1
+                return None
+
+            self._conn.execute("UPDATE query_conversion SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0], row[1]
+
+    def set(self, query: str, converted: str, method: str):
+        """캐시 저장 후 최대 개수를 넘으면 오래 쓰지 않은 항목부터 제거"""
+        key = normalize_query(query)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO query_conversion (key, converted, method, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, converted, method, now, now),
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now):
+        """만료 항목 및 초과 항목 제거 (LRU)"""
+        if self.ttl_seconds:
+            self._conn.execute(
+                "DELETE FROM query_conversion WHERE created_at < ?", (now - self.ttl_seconds,)
+            )
+        count = self._conn.execute("SELECT COUNT(*) FROM query_conversion").fetchone()[0]
+        if count > self.max_entries:
+            self._conn.execute(
+                "DELETE FROM query_conversion WHERE key IN ("
+                "SELECT key FROM query_conversion ORDER BY accessed_at ASC LIMIT ?)",
+                (count - self.max_entries,),
+            )
+
+    def clear(self, method=None):
+        """캐시 삭제 - method를 지정하면 해당 변환 방식 항목만 삭제"""
+        with self._lock:
+            if method is not None:
+                self._conn.execute("DELETE FROM query_conversion WHERE method = ?", (method,))
+                self._conn.commit()
+                return
+            self._conn.execute("DELETE FROM query_conversion")
+            self._conn.commit()
+            self.hits = 0
+            self.misses = 0
+
+    def record_fallthrough(self, query: str):
+        """GPT 변환으로 넘어간 쿼리 카운트 증가"""
+        key = normalize_query(query)
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO gpt_fallthrough (key, query, count, last_seen) VALUES (?, ?, 1, ?) "
+                "ON CONFLICT(key) DO UPDATE SET count = count + 1, query = excluded.query, "
+                "last_seen = excluded.last_seen",
+                (key, query, time.time()),
+            )
+            self._conn.commit()
+
+    def top_fallthroughs(self, limit=50) -> list:
+        """GPT 변환이 많았던 쿼리 목록 - [(쿼리, 횟수)]"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT query, count FROM gpt_fallthrough ORDER BY count DESC, last_seen DESC LIMIT ?",
+                (limit,),
+            ).fetchall()
+
+    def stats(self) -> dict:
+        """캐시 적중/미스 통계"""
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM query_conversion").fetchone()[0]
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "size": size,
+            "max_entries": self.max_entries,
+        }
@@ -1,37 +1,95 @@
 """
 법률 쿼리 전처리 클래스
 """
-import functools
-from langchain_openai import ChatOpenAI
-from config import TERM_MAPPING, LEGAL_INDICATORS, OPENAI_MODEL
+import threading
+from llm_gateway import get_chat_model
+from query_cache import QueryConversionCache
+from term_dictionary import LegalTermDictionary
+from query_rewriter import EmbeddingQueryRewriter, load_phrase_file
+from config import (
+    TERM_MAPPING, LEGAL_INDICATORS, OPENAI_MODEL, EMBEDDING_MODEL_NAME,
+    QUERY_CACHE_PATH, QUERY_CACHE_MAX_ENTRIES, QUERY_CACHE_TTL_SECONDS,
+    LEGAL_TERMS_PATH, LEGAL_TERMS_RELOAD_INTERVAL,
+    QUERY_REWRITE_ENABLED, QUERY_REWRITE_PHRASES_PATH, QUERY_REWRITE_THRESHOLD,
+    QUERY_REWRITE_TOP_K, QUERY_REWRITE_CACHE_DIR, QUERY_GPT_FALLBACK
+)
 
 
 class LegalQueryPreprocessor:
     """일상어를 법률 용어로 변환하는 전처리기"""
     
-    def __init__(self):
-        self.llm = ChatOpenAI(
-            model=OPENAI_MODEL,
-            temperature=0.1,
-            max_tokens=200,
+    def __init__(self, query_cache=None, term_dictionary=None, embedding_model=None):
+        # GPT 변환은 선택 사항 (QUERY_GPT_FALLBACK) - 기본은 로컬 임베딩 확장까지만
+        self.llm = get_chat_model(OPENAI_MODEL, temperature=0.1, max_tokens=200) if QUERY_GPT_FALLBACK else None
+        
+        # 정규화된 쿼리 기준 영구 캐시 (세션/프로세스/재시작 간 공유)
+        self.query_cache = query_cache or QueryConversionCache(
+            QUERY_CACHE_PATH,
+            max_entries=QUERY_CACHE_MAX_ENTRIES,
+            ttl_seconds=QUERY_CACHE_TTL_SECONDS,
+        )
+        
+        # 외부 용어 사전 - 파일이 없으면 config 기본 매핑 사용, 변경 시 자동 재로드
+        self.term_dictionary = term_dictionary or LegalTermDictionary(
+            LEGAL_TERMS_PATH,
+            default_mapping=TERM_MAPPING,
+            default_indicators=LEGAL_INDICATORS,
+            reload_interval=LEGAL_TERMS_RELOAD_INTERVAL,
         )
+        self._dictionary_version = self.term_dictionary.version
+        
+        # GPT 변환 횟수 (프로세스 기준)
+        self.gpt_fallthrough_count = 0
+        
+        # 임베딩 기반 쿼리 확장 - 표현 표는 백그라운드에서 준비, 준비 전에는 건너뜀
+        self.query_rewriter = None
+        if QUERY_REWRITE_ENABLED and embedding_model is not None:
+            self.query_rewriter = EmbeddingQueryRewriter(
+                embedding_model,
+                model_name=EMBEDDING_MODEL_NAME,
+                threshold=QUERY_REWRITE_THRESHOLD,
+                top_k=QUERY_REWRITE_TOP_K,
+                cache_dir=QUERY_REWRITE_CACHE_DIR,
+            )
+            self._phrase_mapping = load_phrase_file(QUERY_REWRITE_PHRASES_PATH)
+            self._build_rewrite_table_async()
+    
+    def _build_rewrite_table_async(self):
+        """용어 사전 + 표현 사전으로 확장 표 재계산 (백그라운드)"""
+        pairs = {**self.term_mapping, **self._phrase_mapping}
+        
+        def build():
+            try:
+                self.query_rewriter.build(pairs)
+            except Exception as e:
+                print(f"⚠️ 쿼리 확장 표 준비 실패: {e}")
         
-        self._query_cache = {}
-        self.term_mapping = TERM_MAPPING
+        threading.Thread(target=build, name="query-rewrite-table", daemon=True).start()
+    
+    @property
+    def term_mapping(self):
+        return self.term_dictionary.term_mapping
+    
+    @property
+    def term_matcher(self):
+        """현재 용어 매처 - 사전이 재로드되면 룰 기반/임베딩 확장 캐시 항목 무효화"""
+        matcher = self.term_dictionary.matcher
+        if self.term_dictionary.version != self._dictionary_version:
+            self._dictionary_version = self.term_dictionary.version
+            self.query_cache.clear(method="rule_based")
+            if self.query_rewriter is not None:
+                self.query_cache.clear(method="embedding_expanded")
+                self._build_rewrite_table_async()
+        return matcher
     
     def _apply_rule_based_conversion(self, query: str) -> str:
         """룰 기반 용어 변환"""
-        converted_query = query
-        for common_term, legal_term in self.term_mapping.items():
-            if common_term in converted_query:
-                converted_query = converted_query.replace(common_term, legal_term)
-        return converted_query
+        return self.term_matcher.convert(query)
     
     def _is_already_legal_query(self, query: str) -> bool:
         """이미 법률 용어인지 확인"""
-        return any(term in query for term in LEGAL_INDICATORS)
+        return self.term_matcher.contains_indicator(query)
     
-    @functools.lru_cache(maxsize=100)
     def _gpt_convert_to_legal_terms(self, user_query: str) -> str:
         """GPT를 이용한 법률 용어 변환"""
         try:
@@ -60,22 +118,37 @@ class LegalQueryPreprocessor:
     def convert_query(self, user_query: str) -> tuple[str, str]:
         """쿼리 변환 메인 함수"""
         try:
-            if self._is_already_legal_query(user_query):
+            # 지표어 확인과 룰 기반 변환을 한 번의 스캔으로 처리
+            rule_converted, is_legal_query = self.term_matcher.scan(user_query)
+            if is_legal_query:
                 return user_query, "no_conversion"
             
-            if user_query in self._query_cache:
-                return self._query_cache[user_query], "cached"
+            cached = self.query_cache.get(user_query)
+            if cached is not None:
+                return cached[0], "cached"
             
-            rule_converted = self._apply_rule_based_conversion(user_query)
-            
-            if len(rule_converted) != len(user_query) or rule_converted != user_query:
-                self._query_cache[user_query] = rule_converted
+            if rule_converted != user_query:
+                self.query_cache.set(user_query, rule_converted, "rule_based")
                 return rule_converted, "rule_based"
             
+            # 룰에 없는 표현은 사전 확장용으로 집계
+            self.query_cache.record_fallthrough(user_query)
+            
+            if self.query_rewriter is not None:
+                expanded = self.query_rewriter.rewrite(user_query)
+                if expanded != user_query:
+                    self.query_cache.set(user_query, expanded, "embedding_expanded")
+                    return expanded, "embedding_expanded"
+            
+            if self.llm is None:
+                return user_query, "no_conversion"
+            
             print("🔄 정교한 법률 용어 변환 중...")
+            self.gpt_fallthrough_count += 1
             gpt_converted = self._gpt_convert_to_legal_terms(user_query)
             
-            self._query_cache[user_query] = gpt_converted
+            if gpt_converted != user_query:
+                self.query_cache.set(user_query, gpt_converted, "gpt_converted")
             return gpt_converted, "gpt_converted"
             
         except Exception as e:
@@ -0,0 +1,108 @@
+"""
+임베딩 기반 로컬 쿼리 확장 (GPT 변환 대체)
+
+일상어 표현 → 법률 용어 쌍의 임베딩 표를 미리 계산해 두고, 질문(및 어절 1~3-gram)의
+임베딩과 가장 가까운 표현의 법률 용어를 질문 뒤에 덧붙입니다. 네트워크 호출 없이 CPU에서 동작합니다.
+"""
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+
+
+def load_phrase_file(path) -> dict:
+    """표현 사전 로드 - {"phrase_mapping": {"일상어 표현": "법률 용어"}}"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            return dict(json.load(f).get("phrase_mapping", {}))
+    except (OSError, ValueError) as e:
+        print(f"⚠️ 표현 사전 로드 실패 ({path}): {e}")
+        return {}
+
+
+def query_spans(query, max_ngram=3):
+    """질문 전체 + 어절 1~max_ngram-gram 중 질문보다 짧은 것 (짧은 용어와도 맞도록)"""
+    words = query.split()
+    spans = [query]
+    for n in range(1, max_ngram + 1):
+        if n >= len(words):
+            break
+        spans.extend(" ".join(words[i:i + n]) for i in range(len(words) - n + 1))
+    return list(dict.fromkeys(spans))
+
+
+class EmbeddingQueryRewriter:
+    """일상어→법률 용어 쌍에 대한 최근접 이웃 검색으로 질문 확장
+
+    표현 임베딩은 (모델, 표현 목록) 해시로 cache_dir에 저장해 재시작 시 다시 계산하지 않습니다.
+    표는 (해시, 표현, 법률 용어, 행렬) 튜플 하나로 교체하므로 match()는 잠금 없이 항상 같은 판의 표를 읽습니다.
+    """
+
+    def __init__(self, embedding_model, model_name="", threshold=0.6, top_k=3, cache_dir=None):
+        self.embedding_model = embedding_model
+        self.model_name = model_name
+        self.threshold = threshold
+        self.top_k = top_k
+        self.cache_dir = cache_dir
+        self._lock = threading.Lock()
+        # (해시, 표현 목록, 법률 용어 목록, 정규화된 임베딩 행렬)
+        self._table = None
+
+    def _encode(self, texts):
+        if hasattr(self.embedding_model, "embed_documents"):
+            vectors = np.asarray(self.embedding_model.embed_documents(texts), dtype=np.float32)
+        else:
+            vectors = np.asarray(self.embedding_model.encode(texts, batch_size=64), dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def build(self, pairs):
+        """표현 표 준비 - 내용이 바뀌었을 때만 다시 계산 (캐시 파일 우선)"""
+        phrases = sorted(pairs)
+        digest = hashlib.sha256(
+            json.dumps([self.model_name, [(p, pairs[p]) for p in phrases]], ensure_ascii=False).encode("utf-8")
+        ).hexdigest()[:16]
+        if self._table is not None and self._table[0] == digest:
+            return
+
+        with self._lock:
+            if self._table is not None and self._table[0] == digest:
+                return
+            cache_path = os.path.join(self.cache_dir, f"phrases-{digest}.npy") if self.cache_dir else None
+            matrix = None
+            if cache_path and os.path.exists(cache_path):
+                matrix = np.load(cache_path)
+                if len(matrix) != len(phrases):
+                    matrix = None
+            if matrix is None:
+                matrix = self._encode(phrases) if phrases else np.empty((0, 0), np.float32)
+                if cache_path:
+                    os.makedirs(self.cache_dir, exist_ok=True)
+                    np.save(cache_path, matrix)
+            self._table = (digest, phrases, [pairs[p] for p in phrases], matrix)
+            print(f"✅ 쿼리 확장 표 준비: {len(phrases)}개 표현")
+
+    def match(self, query):
+        """임계값 이상인 표현 [(표현, 법률 용어, 유사도)] - 유사도 내림차순, 최대 top_k개"""
+        table = self._table
+        if table is None or not len(table[1]):
+            return []
+        _, phrases, legal_terms, matrix = table
+        similarity = (self._encode(query_spans(query)) @ matrix.T).max(axis=0)
+        ranked = np.argsort(-similarity)[:self.top_k]
+        return [
+            (phrases[i], legal_terms[i], float(similarity[i]))
+            for i in ranked if similarity[i] >= self.threshold
+        ]
+
+    def rewrite(self, query):
+        """질문 + 일치한 법률 용어 (새 용어가 없으면 원문 그대로)"""
+        terms = []
+        for _, legal_term, _ in self.match(query):
+            for term in legal_term.split():
+                if term not in query and term not in terms:
+                    terms.append(term)
+        return f"{query} {' '.join(terms)}" if terms else query
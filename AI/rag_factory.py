@@ -0,0 +1,88 @@
+"""
+RAG 시스템 및 채팅 체인 프로세스 단위 캐시
+"""
+import threading
+import config
+from rag_system import OptimizedConditionalRAGSystem
+from chat_chain import create_chat_chain_with_memory
+
+
+_lock = threading.RLock()
+# 현재 사용 중인 (키, RAG 시스템, 채팅 체인) - 설정이나 DB가 바뀌면 교체하고 이전 시스템은 종료
+_current = None
+
+
+def _db_path(db, default_dir):
+    """DB 위치 - 스냅샷으로 열린 DB는 스냅샷 디렉터리, 그 외에는 설정된 DB 디렉터리"""
+    if db is None:
+        return None
+    return getattr(db, "snapshot_dir", None) or default_dir
+
+
+def rag_config_key(legal_db, news_db, embedding_model=None):
+    """RAG 시스템 캐시 키 - DB 경로, 임베딩 모델 이름과 검색/생성 설정값 기준"""
+    return (
+        _db_path(legal_db, config.LEGAL_DB_DIR), _db_path(news_db, config.NEWS_DB_DIR),
+        config.EMBEDDING_MODEL_NAME, config.VECTOR_BACKEND,
+        config.OPENAI_MODEL, config.OPENAI_TEMPERATURE, config.MAX_TOKENS,
+        config.LEGAL_SEARCH_K, config.NEWS_SEARCH_K,
+        config.MAX_LEGAL_DOCS, config.MAX_NEWS_DOCS,
+        config.HYBRID_RETRIEVAL, config.RERANK_ENABLED, config.RERANK_MODEL_NAME,
+    )
+
+
+def _is_current(key, legal_db, news_db, embedding_model):
+    """캐시된 시스템을 그대로 쓸 수 있는지 - 키가 같고 같은 DB 객체를 쓰고 있어야 함"""
+    if _current is None or _current[0] != key:
+        return False
+    rag_system = _current[1]
+    return (
+        rag_system.legal_db is legal_db and rag_system.news_db is news_db
+        and (embedding_model is None or rag_system.embedding_model is embedding_model)
+    )
+
+
+def get_rag_system(legal_db=None, news_db=None, embedding_model=None):
+    """RAG 시스템 반환 - 같은 설정이면 프로세스 내에서 재사용
+
+    인자 없이 호출하면 마지막으로 생성된 시스템을 반환합니다.
+    """
+    global _current
+
+    with _lock:
+        if legal_db is None and news_db is None:
+            if _current is None:
+                raise RuntimeError("RAG 시스템이 아직 초기화되지 않았습니다.")
+            return _current[1]
+
+        key = rag_config_key(legal_db, news_db, embedding_model)
+        if not _is_current(key, legal_db, news_db, embedding_model):
+            replaced = _current
+            _current = (key, OptimizedConditionalRAGSystem(legal_db, news_db, embedding_model), None)
+            if replaced is not None:
+                print("♻️ 설정/DB 변경 감지 - RAG 시스템 교체")
+                replaced[1].close()
+        return _current[1]
+
+
+def get_chat_chain(legal_db=None, news_db=None, embedding_model=None):
+    """메모리 기능이 있는 채팅 체인 반환 - RAG 시스템과 함께 캐시"""
+    global _current
+
+    with _lock:
+        rag_system = get_rag_system(legal_db, news_db, embedding_model)
+        key, _, chain = _current
+        if chain is None:
+            chain = create_chat_chain_with_memory(rag_system)
+            _current = (key, rag_system, chain)
+        return chain
+
+
+def clear_rag_cache():
+    """캐시된 RAG 시스템과 체인 제거 - 다음 호출 시 새로 생성"""
+    global _current
+
+    with _lock:
+        if _current is not None:
+            _current[1].close()
+        _current = None
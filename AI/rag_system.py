@@ -1,23 +1,69 @@
 """
 RAG 시스템 구현
 """
+import os
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+import numpy as np
+from langchain_core.documents import Document
 from query_preprocessor import LegalQueryPreprocessor
 from document_formatter import format_docs_optimized
-from config import LEGAL_SEARCH_K, NEWS_SEARCH_K, MAX_LEGAL_DOCS, MAX_NEWS_DOCS
+from reranker import CrossEncoderReranker
+from lexical_index import InvertedIndex, open_or_update_index, reciprocal_rank_fusion, LexicalRetriever
+from config import (
+    LEGAL_SEARCH_K, NEWS_SEARCH_K, MAX_LEGAL_DOCS, MAX_NEWS_DOCS,
+    CONCURRENT_RETRIEVAL, LEGAL_SEARCH_TIMEOUT, NEWS_SEARCH_TIMEOUT,
+    HYBRID_RETRIEVAL, HYBRID_CANDIDATE_K, RRF_K,
+    LEXICAL_INDEX_DIR, LEXICAL_SEGMENT_MAX_DOCS,
+    CONTEXT_TOKEN_BUDGET, LEGAL_MIN_RELEVANCE, NEWS_MIN_RELEVANCE, NEWS_SKIP_BELOW, RELEVANCE_CUTOFF_MARGIN,
+    RERANK_ENABLED, RERANK_MODEL_NAME, RERANK_CANDIDATE_K, RERANK_LEGAL_TOP_N, RERANK_NEWS_TOP_N,
+    RERANK_LATENCY_BUDGET, RERANK_BATCH_SIZE, RERANK_MAX_LENGTH
+)
 
 
 class OptimizedConditionalRAGSystem:
     """최적화된 조건부 RAG 시스템"""
     
-    def __init__(self, legal_db, news_db):
+    def __init__(self, legal_db, news_db, embedding_model=None):
         print("🚀 RAG 시스템 초기화 중...")
         
         # 데이터베이스 연결
         self.legal_db = legal_db
         self.news_db = news_db
         
+        # 임베딩 모델 - 두 DB가 같은 모델을 쓰므로 쿼리 벡터를 한 번만 계산해 공유
+        if embedding_model is None:
+            for db in (legal_db, news_db):
+                if db is not None and getattr(db, "embeddings", None) is not None:
+                    embedding_model = db.embeddings
+                    break
+        self.embedding_model = embedding_model
+        self._embedding_memo = OrderedDict()
+        self._embedding_memo_lock = threading.Lock()
+        
+        # 법률/뉴스 병렬 검색용 스레드 풀
+        self.concurrent_retrieval = CONCURRENT_RETRIEVAL
+        self._search_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="rag-search")
+        
+        # 크로스 인코더 재정렬 - 사용 시 후보를 넉넉히 가져온 뒤 상위 N개만 유지
+        if RERANK_ENABLED:
+            self.reranker = CrossEncoderReranker(
+                RERANK_MODEL_NAME,
+                latency_budget=RERANK_LATENCY_BUDGET,
+                batch_size=RERANK_BATCH_SIZE,
+                max_length=RERANK_MAX_LENGTH,
+            )
+            self.legal_fetch_k = max(RERANK_CANDIDATE_K, LEGAL_SEARCH_K)
+            self.news_fetch_k = max(RERANK_CANDIDATE_K, NEWS_SEARCH_K)
+        else:
+            self.reranker = None
+            self.legal_fetch_k = LEGAL_SEARCH_K
+            self.news_fetch_k = NEWS_SEARCH_K
+        
         # 쿼리 전처리기 초기화
-        self.query_preprocessor = LegalQueryPreprocessor()
+        self.query_preprocessor = LegalQueryPreprocessor(embedding_model=self.embedding_model)
         print("✅ 법률 용어 전처리기 준비 완료")
         
         # 리트리버 초기화
@@ -36,80 +82,509 @@ class OptimizedConditionalRAGSystem:
             )
         else:
             self.news_vector_retriever = None
+        
+        # 법률/뉴스 DB 어휘 인덱스 - 백그라운드에서 열기/증분 색인, 준비 전에는 벡터 검색만 사용
+        self.hybrid_retrieval = HYBRID_RETRIEVAL
+        self.lexical_retrievers = {}
+        if self.hybrid_retrieval:
+            for source, db, k in (("legal", self.legal_db, LEGAL_SEARCH_K), ("news", self.news_db, NEWS_SEARCH_K)):
+                if db is not None:
+                    threading.Thread(
+                        target=self._load_lexical_index, args=(source, db, k),
+                        name=f"{source}-lexical-index", daemon=True,
+                    ).start()
+    
+    def close(self):
+        """스레드 풀 종료 - 캐시에서 교체된 시스템 정리용 (진행 중인 검색은 마저 끝남)"""
+        self._search_executor.shutdown(wait=False)
+        if self.reranker is not None:
+            self.reranker.close()
+    
+    def _load_lexical_index(self, source, db, k):
+        """DB별 어휘 인덱스 준비 - 기존 디스크 인덱스를 바로 열어 쓰고, 이후 변경 확인/증분 색인 결과로 교체"""
+        directory = os.path.join(LEXICAL_INDEX_DIR, source)
+        try:
+            index = InvertedIndex(directory)
+            if len(index):
+                self.lexical_retrievers[source] = LexicalRetriever(db, index, k=k)
+            index = open_or_update_index(db, directory, segment_max_docs=LEXICAL_SEGMENT_MAX_DOCS)
+            self.lexical_retrievers[source] = LexicalRetriever(db, index, k=k)
+        except Exception as e:
+            print(f"⚠️ {source} 어휘 인덱스 준비 실패, 벡터 검색만 사용: {e}")
+    
+    def embed_query(self, query):
+        """쿼리 임베딩 - 최근 쿼리는 메모에서 재사용"""
+        if self.embedding_model is None:
+            return None
+        
+        with self._embedding_memo_lock:
+            if query in self._embedding_memo:
+                self._embedding_memo.move_to_end(query)
+                return self._embedding_memo[query]
+        
+        try:
+            if hasattr(self.embedding_model, "embed_query"):
+                embedding = list(self.embedding_model.embed_query(query))
+            else:
+                embedding = self.embedding_model.encode(query).tolist()
+            
+            self._remember_embeddings({query: embedding})
+            return embedding
+        except Exception as e:
+            print(f"⚠️ 쿼리 임베딩 실패, 리트리버 검색 사용: {e}")
+            return None
+    
+    def _remember_embeddings(self, embeddings):
+        """쿼리 임베딩 메모에 {쿼리: 벡터} 저장 - 최근 256개만 유지"""
+        with self._embedding_memo_lock:
+            for query, embedding in embeddings.items():
+                self._embedding_memo[query] = embedding
+                self._embedding_memo.move_to_end(query)
+            while len(self._embedding_memo) > 256:
+                self._embedding_memo.popitem(last=False)
+    
+    def embed_queries(self, queries, timings=None):
+        """여러 쿼리를 한 번의 모델 호출로 임베딩 - 실패하면 모두 None
+
+        메모에 없는 쿼리만 계산해 메모에 저장하며, timings가 주어지면
+        성공한 모델 호출 수(embed_calls)와 메모 적중 수(embed_memo_hits)를 기록합니다.
+        """
+        if timings is not None:
+            timings["embed_calls"] = 0
+            timings["embed_memo_hits"] = 0
+        if self.embedding_model is None:
+            return [None] * len(queries)
+        
+        with self._embedding_memo_lock:
+            embeddings = [self._embedding_memo.get(query) for query in queries]
+        missing = list(dict.fromkeys(query for query, embedding in zip(queries, embeddings) if embedding is None))
+        if timings is not None:
+            timings["embed_memo_hits"] = len(queries) - sum(1 for embedding in embeddings if embedding is None)
+        if not missing:
+            return embeddings
+        
+        try:
+            if hasattr(self.embedding_model, "embed_documents"):
+                computed = [list(vector) for vector in self.embedding_model.embed_documents(missing)]
+            else:
+                computed = self.embedding_model.encode(missing, batch_size=64).tolist()
+        except Exception as e:
+            print(f"⚠️ 일괄 임베딩 실패, 리트리버 검색 사용: {e}")
+            if timings is not None:
+                timings["embed_error"] = True
+            return [None] * len(queries)
+        
+        if timings is not None:
+            timings["embed_calls"] = 1
+        computed = dict(zip(missing, computed))
+        self._remember_embeddings(computed)
+        return [embedding if embedding is not None else computed[query] for query, embedding in zip(queries, embeddings)]
+    
+    @staticmethod
+    def _doc_key(doc):
+        """문서 식별 키 - Chroma id, 없으면 본문"""
+        return getattr(doc, "id", None) or doc.page_content
+    
+    @staticmethod
+    def _chroma_cosine_search(collection, query_embeddings, k):
+        """Chroma 컬렉션 검색 - 쿼리별 [(문서, 코사인 유사도)] 유사도 내림차순
+
+        컬렉션은 기본 l2 공간이고 저장된 임베딩이 정규화되어 있지 않아 거리로는 0~1 관련도를
+        만들 수 없으므로, 후보의 임베딩을 함께 받아 코사인 유사도를 직접 계산합니다.
+        (스냅샷/NumPy 스토어의 1 - 코사인 거리와 같은 척도)
+        """
+        results = collection.query(
+            query_embeddings=query_embeddings, n_results=k,
+            include=["documents", "metadatas", "embeddings"],
+        )
+        scored = []
+        for query_embedding, ids, texts, metas, vectors in zip(
+            query_embeddings, results["ids"], results["documents"], results["metadatas"], results["embeddings"]
+        ):
+            if not ids:
+                scored.append([])
+                continue
+            query_vector = np.asarray(query_embedding, dtype=np.float32)
+            vectors = np.asarray(vectors, dtype=np.float32)
+            norms = np.linalg.norm(vectors, axis=1) * (np.linalg.norm(query_vector) or 1.0)
+            norms[norms == 0] = 1.0
+            similarities = (vectors @ query_vector) / norms
+            scored.append(sorted(
+                (
+                    (Document(page_content=text or "", metadata=meta or {}, id=doc_id), float(similarity))
+                    for doc_id, text, meta, similarity in zip(ids, texts, metas, similarities)
+                ),
+                key=lambda item: item[1], reverse=True,
+            ))
+        return scored
+    
+    @classmethod
+    def _dense_search_with_scores(cls, db, query, query_embedding, k):
+        """벡터 검색 - [(문서, 관련도 = 코사인 유사도)] 유사도 내림차순"""
+        if query_embedding is None:
+            # 쿼리 임베딩 실패 시에만 쓰는 경로 - 점수가 DB 거리 함수 기준이라 0 미만일 수 있음
+            return [(doc, max(0.0, score)) for doc, score in db.similarity_search_with_relevance_scores(query, k=k)]
+        
+        collection = getattr(db, "_collection", None)
+        if collection is not None:
+            return cls._chroma_cosine_search(collection, [query_embedding], k)[0]
+        
+        # 스냅샷/NumPy 스토어는 코사인 거리를 반환하므로 1 - 거리가 곧 코사인 유사도
+        results = db.similarity_search_by_vector_with_relevance_scores(query_embedding, k=k)
+        try:
+            relevance_fn = db._select_relevance_score_fn()
+        except (NotImplementedError, ValueError):
+            relevance_fn = lambda distance: 1.0 / (1.0 + distance)
+        return [(doc, relevance_fn(distance)) for doc, distance in results]
+    
+    def _dense_search_many(self, db, queries, query_embeddings, k, executor):
+        """여러 쿼리 벡터 검색 - NumPy 스토어는 행렬 곱 한 번, Chroma는 query 한 번으로 처리"""
+        if hasattr(db, "batch_similarity_search_by_vector") and all(e is not None for e in query_embeddings):
+            relevance_fn = db._select_relevance_score_fn()
+            return [
+                [(doc, relevance_fn(distance)) for doc, distance in results]
+                for results in db.batch_similarity_search_by_vector(query_embeddings, k=k)
+            ]
+        if getattr(db, "_collection", None) is not None and all(e is not None for e in query_embeddings):
+            # Chroma 컬렉션은 여러 쿼리 벡터를 한 번의 query 호출로 검색
+            return self._chroma_cosine_search(db._collection, query_embeddings, k)
+        return list(executor.map(
+            lambda args: self._dense_search_with_scores(db, args[0], args[1], k), zip(queries, query_embeddings)
+        ))
+    
+    @staticmethod
+    def _apply_relevance_cutoff(scored_docs, min_relevance):
+        """적응형 관련도 컷오프 - 최소 점수 이상이면서 최고 점수와의 차이가 MARGIN 이내인 문서만 유지"""
+        if not scored_docs:
+            return []
+        best = scored_docs[0][1]
+        cutoff = max(min_relevance, best - RELEVANCE_CUTOFF_MARGIN)
+        return [(doc, score) for doc, score in scored_docs if score >= cutoff]
+    
+    def _hybrid_fuse(self, scored_docs, lexical_retriever, query, k, min_relevance):
+        """벡터 검색 + 어휘 검색 결과를 RRF로 결합 - [(문서, 관련도)]
+
+        어휘 검색에서만 나온 문서는 벡터 관련도가 없으므로 컷오프를 통과한 최저 관련도를 씁니다.
+        """
+        lexical_hits = lexical_retriever.search_ids(query, k=HYBRID_CANDIDATE_K)
+        
+        docs_by_key = {self._doc_key(doc): doc for doc, _ in scored_docs}
+        relevance_by_key = {self._doc_key(doc): score for doc, score in scored_docs}
+        fused = reciprocal_rank_fusion(
+            [[self._doc_key(doc) for doc, _ in scored_docs], [doc_id for doc_id, _ in lexical_hits]],
+            k=RRF_K,
+            limit=k,
+        )
+        
+        # 어휘 검색에서만 나온 문서는 Chroma에서 본문/메타데이터 조회
+        for doc in lexical_retriever.fetch([key for key, _ in fused if key not in docs_by_key]):
+            docs_by_key[doc.id] = doc
+        
+        floor = min(relevance_by_key.values(), default=min_relevance)
+        return [(docs_by_key[key], relevance_by_key.get(key, floor)) for key, _ in fused if key in docs_by_key]
     
-    def search_legal_db(self, query):
+    def _fetch_k(self, source, k):
+        """벡터 검색 후보 수 - 어휘 인덱스가 준비됐으면 RRF용으로 넉넉히"""
+        return max(HYBRID_CANDIDATE_K, k) if self.lexical_retrievers.get(source) is not None else k
+    
+    def _search_collection(self, source, db, query, query_embedding, k, min_relevance, skip_below=None,
+                           scored_docs=None):
+        """DB 한 곳 검색 - ([(문서, 관련도)], 최고 관련도)
+
+        최고 관련도가 skip_below 미만이면 해당 DB 결과를 통째로 버립니다.
+        scored_docs가 주어지면 (일괄 검색 결과) 벡터 검색을 다시 하지 않습니다.
+        """
+        lexical_retriever = self.lexical_retrievers.get(source)
+        if scored_docs is None:
+            scored_docs = self._dense_search_with_scores(db, query, query_embedding, self._fetch_k(source, k))
+        best = scored_docs[0][1] if scored_docs else 0.0
+        
+        if skip_below is not None and best < skip_below:
+            print(f"⏭️ {source} 검색 생략 - 최고 관련도 {best:.2f} < {skip_below:.2f}")
+            return [], best
+        
+        kept = self._apply_relevance_cutoff(scored_docs, min_relevance)
+        if lexical_retriever is not None:
+            return self._hybrid_fuse(kept, lexical_retriever, query, k, min_relevance), best
+        return kept[:k], best
+    
+    def search_legal_db(self, query, query_embedding=None):
         """법률 DB 검색"""
         if self.legal_vector_retriever is None:
             return [], 0.0
         
         try:
-            legal_docs = self.legal_vector_retriever.invoke(query)
-            print(f"📄 법률 검색 결과: {len(legal_docs)}개 문서")
-            return legal_docs, 0.8
+            legal_docs, legal_score = self._search_collection(
+                "legal", self.legal_db, query, query_embedding, self.legal_fetch_k, LEGAL_MIN_RELEVANCE
+            )
+            print(f"📄 법률 검색 결과: {len(legal_docs)}개 문서 (최고 관련도 {legal_score:.2f})")
+            return legal_docs, legal_score
         except Exception as e:
             print(f"❌ 법률 DB 검색 오류: {e}")
             return [], 0.0
     
-    def search_news_db(self, query):
-        """뉴스 DB 검색"""
+    def search_news_db(self, query, query_embedding=None):
+        """뉴스 DB 검색 - 관련 뉴스가 없을 만한 질문은 통째로 생략"""
         if self.news_vector_retriever is None:
             return [], 0.0
         
         try:
-            news_docs = self.news_vector_retriever.invoke(query)
-            print(f"📰 뉴스 검색 결과: {len(news_docs)}개")
-            return news_docs, 0.7
+            news_docs, news_score = self._search_collection(
+                "news", self.news_db, query, query_embedding, self.news_fetch_k,
+                NEWS_MIN_RELEVANCE, skip_below=NEWS_SKIP_BELOW,
+            )
+            print(f"📰 뉴스 검색 결과: {len(news_docs)}개 (최고 관련도 {news_score:.2f})")
+            return news_docs, news_score
         except Exception as e:
             print(f"❌ 뉴스 DB 검색 오류: {e}")
             return [], 0.0
     
-    def conditional_retrieve(self, original_query):
-        """조건부 검색"""
+    def _timed_search(self, search_fn, query, query_embedding):
+        """검색 함수 실행 후 (문서, 점수, 소요 시간) 반환"""
+        started = time.perf_counter()
+        docs, score = search_fn(query, query_embedding)
+        return docs, score, time.perf_counter() - started
+    
+    def _retrieve_sequential(self, search_query, query_embedding, timings):
+        """법률 → 뉴스 순차 검색"""
+        legal_docs, legal_score, timings["legal_search"] = self._timed_search(
+            self.search_legal_db, search_query, query_embedding
+        )
+        news_docs, news_score, timings["news_search"] = self._timed_search(
+            self.search_news_db, search_query, query_embedding
+        )
+        return legal_docs, news_docs
+    
+    def _retrieve_concurrent(self, search_query, query_embedding, timings):
+        """법률/뉴스 병렬 검색 - 타임아웃을 넘긴 DB 결과는 버림"""
+        started = time.perf_counter()
+        futures = {
+            "legal": (
+                self._search_executor.submit(self._timed_search, self.search_legal_db, search_query, query_embedding),
+                started + LEGAL_SEARCH_TIMEOUT,
+            ),
+            "news": (
+                self._search_executor.submit(self._timed_search, self.search_news_db, search_query, query_embedding),
+                started + NEWS_SEARCH_TIMEOUT,
+            ),
+        }
+        
+        results = {}
+        for source, (future, deadline) in futures.items():
+            try:
+                docs, _, timings[f"{source}_search"] = future.result(timeout=max(0.0, deadline - time.perf_counter()))
+                results[source] = docs
+            except FutureTimeoutError:
+                future.cancel()
+                timings[f"{source}_search"] = time.perf_counter() - started
+                timings[f"{source}_timeout"] = True
+                print(f"⏰ {source} 검색 시간 초과 - 결과 제외")
+                results[source] = []
+        
+        timings["retrieval_wall"] = time.perf_counter() - started
+        return results["legal"], results["news"]
+    
+    def _rerank(self, query, legal_docs, news_docs, timings):
+        """법률+뉴스 후보 [(문서, 관련도)] 전체를 한 번에 재정렬해 DB별 상위 N개 유지
+
+        재정렬에 실패하거나 지연 예산을 넘기면 기존 검색 순서대로 자릅니다.
+        관련도는 벡터 검색 값을 그대로 유지합니다 (토큰 예산 분배용).
+        """
+        scores = self.reranker.score(query, [doc for doc, _ in legal_docs + news_docs], timings)
+        if scores is None:
+            return legal_docs[:RERANK_LEGAL_TOP_N], news_docs[:RERANK_NEWS_TOP_N]
+        
+        def top(scored_docs, doc_scores, n):
+            ranked = sorted(zip(scored_docs, doc_scores), key=lambda item: item[1], reverse=True)
+            return [scored for scored, _ in ranked[:n]]
+        
+        return (
+            top(legal_docs, scores[:len(legal_docs)], RERANK_LEGAL_TOP_N),
+            top(news_docs, scores[len(legal_docs):], RERANK_NEWS_TOP_N),
+        )
+    
+    def _combine(self, search_query, legal_docs, news_docs, timings):
+        """재정렬(선택) 후 법률/뉴스 [(문서, 관련도)] 결합 - (문서, 문서별 관련도, 검색 유형)"""
+        if self.reranker is not None:
+            legal_docs, news_docs = self._rerank(search_query, legal_docs, news_docs, timings)
+        
+        combined = []
+        if legal_docs:
+            combined.extend(legal_docs[:MAX_LEGAL_DOCS])
+        if news_docs:
+            combined.extend(news_docs[:MAX_NEWS_DOCS])
+        
+        search_type = "legal_and_news" if (legal_docs and news_docs) else ("legal_only" if legal_docs else "news_only")
+        return [doc for doc, _ in combined], [score for _, score in combined], search_type
+    
+    def prepare_query(self, original_query):
+        """쿼리 변환 + 검색 쿼리 임베딩 (요청당 1회)
+
+        Returns:
+            {"search_query", "conversion_method", "embedding", "timings"} - 임베딩은 법률/뉴스 DB 검색과
+            시맨틱 캐시 조회에 함께 사용합니다.
+        """
+        timings = {}
+        print(f"🔍 검색 쿼리: {original_query}")
+        
+        # 쿼리 전처리
+        started = time.perf_counter()
+        converted_query, conversion_method = self.query_preprocessor.convert_query(original_query)
+        timings["convert"] = time.perf_counter() - started
+        
+        if conversion_method != "no_conversion":
+            print(f"🔄 변환된 쿼리: {converted_query}")
+            search_query = converted_query
+        else:
+            search_query = original_query
+        
+        started = time.perf_counter()
+        embedding = self.embed_query(search_query)
+        timings["embed"] = time.perf_counter() - started
+        timings["embed_calls"] = 1 if embedding is not None else 0
+        return {
+            "search_query": search_query,
+            "conversion_method": conversion_method,
+            "embedding": embedding,
+            "timings": timings,
+        }
+    
+    def conditional_retrieve(self, original_query, prepared=None):
+        """조건부 검색 - {docs, relevance(문서별 관련도), search_type, timings}
+
+        prepared(prepare_query 결과)가 주어지면 쿼리 변환과 임베딩을 다시 하지 않습니다.
+        timings(단계별 소요 시간)는 요청마다 새로 만들어 반환하므로 세션 간에 공유되지 않습니다.
+        """
+        timings = {}
         try:
-            print(f"🔍 검색 쿼리: {original_query}")
-            
-            # 쿼리 전처리
-            converted_query, conversion_method = self.query_preprocessor.convert_query(original_query)
+            if prepared is None:
+                prepared = self.prepare_query(original_query)
+            timings.update(prepared["timings"])
+            search_query = prepared["search_query"]
+            query_embedding = prepared["embedding"]
             
-            if conversion_method != "no_conversion":
-                print(f"🔄 변환된 쿼리: {converted_query}")
-                search_query = converted_query
+            # 법률 DB + 뉴스 DB 검색
+            if self.concurrent_retrieval:
+                legal_docs, news_docs = self._retrieve_concurrent(search_query, query_embedding, timings)
             else:
-                search_query = original_query
-            
-            # 법률 DB 검색
-            legal_docs, legal_score = self.search_legal_db(search_query)
-            
-            # 뉴스 DB 검색
-            news_docs, news_score = self.search_news_db(search_query)
-            
-            # 결과 결합
-            combined_docs = []
-            if legal_docs:
-                combined_docs.extend(legal_docs[:MAX_LEGAL_DOCS])
-            if news_docs:
-                combined_docs.extend(news_docs[:MAX_NEWS_DOCS])
+                legal_docs, news_docs = self._retrieve_sequential(search_query, query_embedding, timings)
             
-            search_type = "legal_and_news" if (legal_docs and news_docs) else ("legal_only" if legal_docs else "news_only")
+            combined_docs, relevance, search_type = self._combine(search_query, legal_docs, news_docs, timings)
             
             print(f"🎯 최종 결과: {len(combined_docs)}개 문서 ({search_type})")
-            return combined_docs, search_type
+            print("⏱️ 단계별 소요 시간: " + ", ".join(
+                f"{stage}={elapsed * 1000:.1f}ms" for stage, elapsed in timings.items() if isinstance(elapsed, float)
+            ))
+            return {"docs": combined_docs, "relevance": relevance, "search_type": search_type, "timings": timings}
                 
         except Exception as e:
             print(f"❌ 검색 오류: {e}")
-            return [], "error"
+            return {"docs": [], "relevance": [], "search_type": "error", "timings": timings}
+
+    
+    def batch_retrieve(self, queries, max_workers=None):
+        """여러 질문 일괄 검색 - {"results": 질문별 결과 목록, "timings": 단계별 소요 시간}
+
+        질문별 결과는 {query, search_query, conversion_method, docs, relevance, search_type}이며,
+        쿼리 변환은 병렬로, 임베딩은 한 번의 배치 호출로, 벡터 검색은 DB별 일괄 검색으로 처리합니다.
+        일괄 검색이 실패한 DB는 질문별로 다시 검색하고, 그래도 실패한 질문만 search_type="error"가 됩니다.
+        """
+        timings = {}
+        with ThreadPoolExecutor(max_workers=max_workers or os.cpu_count(), thread_name_prefix="rag-batch") as executor:
+            started = time.perf_counter()
+            conversions = list(executor.map(self.query_preprocessor.convert_query, queries))
+            search_queries = [
+                query if method == "no_conversion" else converted
+                for query, (converted, method) in zip(queries, conversions)
+            ]
+            timings["convert"] = time.perf_counter() - started
+            
+            started = time.perf_counter()
+            embeddings = self.embed_queries(search_queries, timings)
+            timings["embed"] = time.perf_counter() - started
+            
+            def dense_search_many(source, db, fetch_k):
+                """DB별 일괄 벡터 검색 - 실패하면 질문별 검색(finish)으로 넘기도록 None 목록"""
+                if db is None:
+                    return [None] * len(queries)
+                try:
+                    return self._dense_search_many(
+                        db, search_queries, embeddings, self._fetch_k(source, fetch_k), executor
+                    )
+                except Exception as e:
+                    print(f"⚠️ {source} 일괄 벡터 검색 실패, 질문별 검색 사용: {e}")
+                    timings[f"{source}_batch_error"] = True
+                    return [None] * len(queries)
+            
+            started = time.perf_counter()
+            legal_scored = dense_search_many("legal", self.legal_db, self.legal_fetch_k)
+            news_scored = dense_search_many("news", self.news_db, self.news_fetch_k)
+            timings["vector_search"] = time.perf_counter() - started
+            
+            def finish(i):
+                legal_docs = news_docs = []
+                try:
+                    if self.legal_db is not None:
+                        legal_docs, _ = self._search_collection(
+                            "legal", self.legal_db, search_queries[i], embeddings[i], self.legal_fetch_k,
+                            LEGAL_MIN_RELEVANCE, scored_docs=legal_scored[i],
+                        )
+                    if self.news_db is not None:
+                        news_docs, _ = self._search_collection(
+                            "news", self.news_db, search_queries[i], embeddings[i], self.news_fetch_k,
+                            NEWS_MIN_RELEVANCE, skip_below=NEWS_SKIP_BELOW, scored_docs=news_scored[i],
+                        )
+                    docs, relevance, search_type = self._combine(search_queries[i], legal_docs, news_docs, {})
+                except Exception as e:
+                    print(f"❌ 일괄 검색 오류 ({queries[i]}): {e}")
+                    docs, relevance, search_type = [], [], "error"
+                return {
+                    "query": queries[i],
+                    "search_query": search_queries[i],
+                    "conversion_method": conversions[i][1],
+                    "docs": docs,
+                    "relevance": relevance,
+                    "search_type": search_type,
+                }
+            
+            started = time.perf_counter()
+            results = list(executor.map(finish, range(len(queries))))
+            timings["fuse_and_rerank"] = time.perf_counter() - started
+        
+        print(f"📦 일괄 검색 {len(queries)}건: " + ", ".join(
+            f"{stage}={elapsed * 1000:.1f}ms" for stage, elapsed in timings.items() if isinstance(elapsed, float)
+        ) + f", 임베딩 호출 {timings['embed_calls']}회 (메모 적중 {timings['embed_memo_hits']}건)")
+        return {"results": results, "timings": timings}
+
 
+def optimized_retrieve_and_format(query, rag_system, prepared=None):
+    """최적화된 검색 및 포맷팅 - 전처리 포함 (prepared: rag_system.prepare_query 결과)
 
-def optimized_retrieve_and_format(query, rag_system):
-    """최적화된 검색 및 포맷팅 - 전처리 포함"""
+    Returns:
+        {"context": 참고자료 문자열, "docs", "search_type", "timings",
+         "complete": 검색이 오류/시간 초과 없이 문서를 찾았는지 (답변 캐시 저장 여부 판단용)}
+    """
     try:
-        docs, search_type = rag_system.conditional_retrieve(query)
+        retrieval = rag_system.conditional_retrieve(query, prepared)
+        docs = retrieval["docs"]
         
         if not isinstance(docs, list):
-            return f"검색 결과 형식 오류: {type(docs)}"
+            return {**retrieval, "context": f"검색 결과 형식 오류: {type(docs)}", "complete": False}
         
-        return format_docs_optimized(docs, search_type)
+        context = format_docs_optimized(
+            docs, retrieval["search_type"], token_budget=CONTEXT_TOKEN_BUDGET,
+            relevance=retrieval["relevance"], stats=retrieval["timings"],
+        )
+        print(f"🧮 컨텍스트 토큰: {retrieval['timings'].get('context_tokens')} / {CONTEXT_TOKEN_BUDGET}")
+        complete = (
+            bool(docs) and retrieval["search_type"] != "error"
+            and not any(stage.endswith("_timeout") for stage in retrieval["timings"])
+        )
+        return {**retrieval, "context": context, "complete": complete}
         
     except Exception as e:
         print(f"❌ 검색 오류: {e}")
-        return f"검색 중 오류가 발생했습니다: {str(e)}"
+        return {
+            "docs": [], "relevance": [], "search_type": "error", "timings": {},
+            "context": f"검색 중 오류가 발생했습니다: {str(e)}", "complete": False,
+        }
@@ -0,0 +1,72 @@
+"""
+크로스 인코더 기반 검색 결과 재정렬
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from sentence_transformers import CrossEncoder
+
+
+class CrossEncoderReranker:
+    """(쿼리, 문서) 쌍을 한 번의 배치 호출로 점수화해 재정렬
+
+    모델은 백그라운드에서 CPU로 로드하며, 로드 전이거나 추론이 지연 예산을
+    넘기면 None을 반환해 호출 측이 기존 벡터 검색 순서를 사용하도록 합니다.
+    워커가 이전 추론(시간 초과로 포기한 것 포함)을 아직 실행 중이면 뒤에 줄 세우지 않고
+    바로 None을 반환합니다.
+    """
+
+    def __init__(self, model_name, latency_budget=1.5, batch_size=32, max_length=512, device="cpu"):
+        self.model_name = model_name
+        self.latency_budget = latency_budget
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.device = device
+        self.model = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rerank")
+        self._running = None
+        self._submit_lock = threading.Lock()
+        threading.Thread(target=self._load_model, name="rerank-model", daemon=True).start()
+
+    def _load_model(self):
+        try:
+            self.model = CrossEncoder(self.model_name, max_length=self.max_length, device=self.device)
+            print(f"✅ 재정렬 모델 로딩 완료: {self.model_name}")
+        except Exception as e:
+            print(f"⚠️ 재정렬 모델 로딩 실패, 벡터 검색 순서 사용: {e}")
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+    def _predict(self, query, docs):
+        pairs = [(query, doc.page_content or "") for doc in docs]
+        return self.model.predict(pairs, batch_size=self.batch_size, show_progress_bar=False)
+
+    def score(self, query, docs, timings=None):
+        """문서별 관련도 점수 - 모델 미준비/예산 초과/오류 시 None"""
+        if self.model is None or not docs:
+            return None
+
+        started = time.perf_counter()
+        with self._submit_lock:
+            if self._running is not None and not self._running.done():
+                print("⏭️ 이전 재정렬이 아직 실행 중 - 벡터 검색 순서 사용")
+                if timings is not None:
+                    timings["rerank_busy"] = True
+                return None
+            future = self._running = self._executor.submit(self._predict, query, docs)
+        try:
+            scores = future.result(timeout=self.latency_budget)
+        except FutureTimeoutError:
+            print(f"⏰ 재정렬 지연 예산({self.latency_budget:.1f}s) 초과 - 벡터 검색 순서 사용")
+            if timings is not None:
+                timings["rerank_timeout"] = True
+            return None
+        except Exception as e:
+            print(f"⚠️ 재정렬 오류, 벡터 검색 순서 사용: {e}")
+            return None
+        finally:
+            if timings is not None:
+                timings["rerank"] = time.perf_counter() - started
+
+        return [float(score) for score in scores]
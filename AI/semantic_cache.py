@@ -0,0 +1,147 @@
+"""
+질문 임베딩 기반 시맨틱 답변 캐시
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+def database_fingerprint(directories):
+    """벡터 DB 변경 감지용 지문 - 각 DB 파일의 크기/수정 시각"""
+    fingerprint = []
+    for directory in directories:
+        path = os.path.join(directory, "chroma.sqlite3")
+        try:
+            stat = os.stat(path)
+            fingerprint.append((directory, stat.st_size, stat.st_mtime_ns))
+        except OSError:
+            fingerprint.append((directory, None, None))
+    return tuple(fingerprint)
+
+
+class SemanticAnswerCache:
+    """유사 질문에 대해 이전 답변을 재사용하는 캐시
+
+    코사인 유사도가 임계값 이상인 질문이 있으면 저장된 답변과 참고자료를 반환합니다.
+    LRU + TTL로 제거하며, 벡터 DB가 바뀌면 전체 캐시를 비웁니다.
+    """
+
+    def __init__(self, threshold=0.93, max_entries=500, ttl_seconds=24 * 3600,
+                 db_directories=(), fingerprint_interval=30.0):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.db_directories = tuple(db_directories)
+        self.fingerprint_interval = fingerprint_interval
+        self.hits = 0
+        self.misses = 0
+
+        self._entries = OrderedDict()
+        self._matrix = None
+        self._matrix_keys = []
+        self._next_key = 0
+        self._lock = threading.Lock()
+        self._fingerprint = database_fingerprint(self.db_directories)
+        self._fingerprint_checked_at = time.time()
+
+    @staticmethod
+    def _normalize(embedding):
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def _check_databases(self, now):
+        """DB 지문이 바뀌었으면 캐시 무효화"""
+        if now - self._fingerprint_checked_at < self.fingerprint_interval:
+            return
+        self._fingerprint_checked_at = now
+        fingerprint = database_fingerprint(self.db_directories)
+        if fingerprint != self._fingerprint:
+            print("♻️ 벡터 DB 변경 감지 - 시맨틱 캐시 초기화")
+            self._fingerprint = fingerprint
+            self._entries.clear()
+            self._matrix = None
+
+    def _expire(self, now):
+        """TTL 만료 항목 제거 (가장 오래 쓰지 않은 항목부터 확인)"""
+        if not self.ttl_seconds:
+            return
+        expired = [key for key, entry in self._entries.items() if now - entry["created_at"] > self.ttl_seconds]
+        for key in expired:
+            del self._entries[key]
+        if expired:
+            self._matrix = None
+
+    def _ensure_matrix(self):
+        if self._matrix is None:
+            self._matrix_keys = list(self._entries.keys())
+            if self._matrix_keys:
+                self._matrix = np.vstack([self._entries[key]["embedding"] for key in self._matrix_keys])
+            else:
+                self._matrix = np.empty((0, 0), dtype=np.float32)
+
+    def lookup(self, embedding):
+        """유사 질문 조회 - {"question", "answer", "context", "similarity"} 또는 None"""
+        query = self._normalize(embedding)
+        now = time.time()
+        with self._lock:
+            self._check_databases(now)
+            self._expire(now)
+            self._ensure_matrix()
+
+            if not self._matrix_keys:
+                self.misses += 1
+                return None
+
+            similarities = self._matrix @ query
+            best = int(np.argmax(similarities))
+            similarity = float(similarities[best])
+            if similarity < self.threshold:
+                self.misses += 1
+                return None
+
+            key = self._matrix_keys[best]
+            entry = self._entries[key]
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return {
+                "question": entry["question"],
+                "answer": entry["answer"],
+                "context": entry["context"],
+                "similarity": similarity,
+            }
+
+    def add(self, question, embedding, answer, context):
+        """답변 저장 - 최대 개수를 넘으면 LRU 항목 제거"""
+        now = time.time()
+        with self._lock:
+            self._entries[self._next_key] = {
+                "question": question,
+                "embedding": self._normalize(embedding),
+                "answer": answer,
+                "context": context,
+                "created_at": now,
+            }
+            self._next_key += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._matrix = None
+
+    def invalidate(self):
+        """캐시 전체 삭제"""
+        with self._lock:
+            self._entries.clear()
+            self._matrix = None
+
+    def stats(self) -> dict:
+        """캐시 적중/미스 통계"""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "size": len(self._entries),
+        }
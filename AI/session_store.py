@@ -0,0 +1,388 @@
+"""
+세션별 대화 기록 저장소 (유휴 TTL + 최대 세션 수 LRU 제거)
+
+백엔드:
+    memory  프로세스 메모리 (OrderedDict LRU) - 단일 프로세스용
+    sqlite  공유 SQLite 파일 (WAL) - 같은 서버의 여러 워커 프로세스가 공유, 재시작 후에도 유지
+    redis   Redis 호환 서버 (Redis/Valkey/KeyDB 등) - 여러 서버의 워커가 공유, TTL은 서버가 처리
+            max_sessions는 적용되지 않으므로 서버에 maxmemory와 maxmemory-policy(volatile-lru 등)를
+            설정해 메모리 한도를 넘으면 오래된 세션 키가 제거되도록 해야 합니다.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from itertools import islice
+
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import messages_from_dict, message_to_dict
+
+
+def _same_messages(payloads, messages) -> bool:
+    """저장된 직렬화 메시지 목록이 messages와 같은지 - 요약 교체 전 앞부분이 그대로인지 확인"""
+    return len(payloads) == len(messages) and all(
+        json.loads(payload) == message_to_dict(message) for payload, message in zip(payloads, messages)
+    )
+
+
+def _message_bytes(message) -> int:
+    content = message.content if isinstance(message.content, str) else json.dumps(message.content, ensure_ascii=False)
+    return len(content.encode("utf-8"))
+
+
+class InMemoryChatHistory(BaseChatMessageHistory):
+    """최근 max_messages개만 유지하는 메모리 대화 기록"""
+
+    def __init__(self, max_messages=20):
+        self.max_messages = max_messages
+        self.messages = []
+        self.size_bytes = 0
+        self._lock = threading.Lock()
+
+    def add_messages(self, messages) -> None:
+        with self._lock:
+            self.messages.extend(messages)
+            self.size_bytes += sum(_message_bytes(message) for message in messages)
+            if len(self.messages) > self.max_messages:
+                # 리스트를 복사하지 않고 앞부분만 제자리에서 삭제
+                dropped = len(self.messages) - self.max_messages
+                self.size_bytes -= sum(_message_bytes(message) for message in self.messages[:dropped])
+                del self.messages[:dropped]
+
+    def compact(self, summarized, summary_message) -> bool:
+        """앞부분이 summarized와 같으면 그 메시지들을 요약 메시지 하나로 교체 - 교체 여부 반환
+
+        요약하는 동안 앞부분이 잘리거나 이미 교체되었으면 아무것도 지우지 않습니다.
+        """
+        count = len(summarized)
+        with self._lock:
+            if self.messages[:count] != list(summarized):
+                return False
+            self.size_bytes -= sum(_message_bytes(message) for message in self.messages[:count])
+            self.messages[:count] = [summary_message]
+            self.size_bytes += _message_bytes(summary_message)
+            return True
+
+    def clear(self) -> None:
+        with self._lock:
+            self.messages.clear()
+            self.size_bytes = 0
+
+
+class SQLiteChatHistory(BaseChatMessageHistory):
+    """공유 SQLite 파일에 저장되는 대화 기록 - 조회/추가 모두 세션 인덱스로 처리"""
+
+    def __init__(self, store, session_id):
+        self._store = store
+        self.session_id = session_id
+
+    @property
+    def messages(self):
+        with self._store._lock:
+            rows = self._store._conn.execute(
+                "SELECT message FROM session_messages WHERE session_id = ? ORDER BY seq", (self.session_id,)
+            ).fetchall()
+        return messages_from_dict([json.loads(row[0]) for row in rows])
+
+    def add_messages(self, messages) -> None:
+        now = time.time()
+        payloads = [json.dumps(message_to_dict(message), ensure_ascii=False) for message in messages]
+        with self._store._lock, self._store._conn:
+            conn = self._store._conn
+            conn.executemany(
+                "INSERT INTO session_messages (session_id, message, size) VALUES (?, ?, ?)",
+                [(self.session_id, payload, len(payload.encode("utf-8"))) for payload in payloads],
+            )
+            # 최근 max_messages개만 유지
+            conn.execute("""
+                DELETE FROM session_messages WHERE session_id = ? AND seq <= (
+                    SELECT seq FROM session_messages WHERE session_id = ?
+                    ORDER BY seq DESC LIMIT 1 OFFSET ?
+                )
+            """, (self.session_id, self.session_id, self._store.max_messages))
+            conn.execute("INSERT OR IGNORE INTO sessions (session_id, accessed_at) VALUES (?, ?)", (self.session_id, now))
+            conn.execute("""
+                UPDATE sessions SET accessed_at = ?,
+                    size = (SELECT COALESCE(SUM(size), 0) FROM session_messages WHERE session_id = ?)
+                WHERE session_id = ?
+            """, (now, self.session_id, self.session_id))
+
+    def compact(self, summarized, summary_message) -> bool:
+        """앞부분이 summarized와 같으면 마지막 요약 메시지 순번까지 요약 하나로 교체 - 교체 여부 반환
+
+        다른 워커가 먼저 요약했거나 창 크기 제한으로 앞부분이 잘렸으면 아무것도 지우지 않습니다.
+        요약은 가장 앞 순번을 재사용합니다.
+        """
+        if not summarized:
+            return False
+        payload = json.dumps(message_to_dict(summary_message), ensure_ascii=False)
+        with self._store._lock, self._store._conn:
+            conn = self._store._conn
+            # 확인과 교체 사이에 다른 프로세스가 쓰지 못하도록 쓰기 잠금부터 획득
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute(
+                "SELECT seq, message FROM session_messages WHERE session_id = ? ORDER BY seq LIMIT ?",
+                (self.session_id, len(summarized)),
+            ).fetchall()
+            if not _same_messages([row[1] for row in rows], summarized):
+                return False
+            conn.execute(
+                "DELETE FROM session_messages WHERE session_id = ? AND seq <= ?", (self.session_id, rows[-1][0])
+            )
+            conn.execute(
+                "INSERT INTO session_messages (seq, session_id, message, size) VALUES (?, ?, ?, ?)",
+                (rows[0][0], self.session_id, payload, len(payload.encode("utf-8"))),
+            )
+            conn.execute("""
+                UPDATE sessions SET size = (SELECT COALESCE(SUM(size), 0) FROM session_messages WHERE session_id = ?)
+                WHERE session_id = ?
+            """, (self.session_id, self.session_id))
+        return True
+
+    def clear(self) -> None:
+        with self._store._lock, self._store._conn:
+            self._store._conn.execute("DELETE FROM session_messages WHERE session_id = ?", (self.session_id,))
+            self._store._conn.execute("DELETE FROM sessions WHERE session_id = ?", (self.session_id,))
+
+
+class RedisChatHistory(BaseChatMessageHistory):
+    """Redis 리스트에 저장되는 대화 기록 - 추가할 때마다 최근 N개로 자르고 유휴 TTL 갱신"""
+
+    def __init__(self, client, session_id, max_messages=20, ttl_seconds=None, key_prefix="switchon:history:"):
+        self._client = client
+        self.session_id = session_id
+        self.key = f"{key_prefix}{session_id}"
+        self.max_messages = max_messages
+        self.ttl_seconds = ttl_seconds
+
+    @property
+    def messages(self):
+        items = self._client.lrange(self.key, 0, -1)
+        return messages_from_dict([json.loads(item) for item in items])
+
+    def add_messages(self, messages) -> None:
+        pipeline = self._client.pipeline()
+        pipeline.rpush(self.key, *[json.dumps(message_to_dict(message), ensure_ascii=False) for message in messages])
+        pipeline.ltrim(self.key, -self.max_messages, -1)
+        if self.ttl_seconds:
+            pipeline.expire(self.key, int(self.ttl_seconds))
+        pipeline.execute()
+
+    def compact(self, summarized, summary_message) -> bool:
+        """앞부분이 summarized와 같으면 요약 메시지 하나로 교체 - 교체 여부 반환
+
+        WATCH로 앞부분을 확인한 뒤 MULTI로 교체하므로, 그 사이 다른 워커가 쓰거나
+        앞부분이 잘렸으면 아무것도 지우지 않습니다.
+        """
+        from redis.exceptions import WatchError
+
+        count = len(summarized)
+        if not count:
+            return False
+        with self._client.pipeline(transaction=True) as pipeline:
+            try:
+                pipeline.watch(self.key)
+                if not _same_messages(pipeline.lrange(self.key, 0, count - 1), summarized):
+                    pipeline.unwatch()
+                    return False
+                pipeline.multi()
+                pipeline.ltrim(self.key, count, -1)
+                pipeline.lpush(self.key, json.dumps(message_to_dict(summary_message), ensure_ascii=False))
+                if self.ttl_seconds:
+                    pipeline.expire(self.key, int(self.ttl_seconds))
+                pipeline.execute()
+            except WatchError:
+                return False
+        return True
+
+    def clear(self) -> None:
+        self._client.delete(self.key)
+
+
+class SessionHistoryStore:
+    """세션 id → 대화 기록 저장소
+
+    get()은 O(1)이며, 유휴 TTL이 지난 세션과 max_sessions를 넘는 오래된 세션을 제거합니다.
+    (redis는 유휴 TTL만 키 만료로 적용하고, 세션 수 한도는 서버의 maxmemory-policy에 맡깁니다.)
+    """
+
+    def __init__(self, backend="memory", max_sessions=10000, idle_ttl_seconds=6 * 3600, max_messages=20,
+                 sqlite_path=None, redis_url=None, sweep_interval=60.0, redis_key_prefix="switchon:history:"):
+        self.backend = backend
+        self.max_sessions = max_sessions
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.max_messages = max_messages
+        self.sweep_interval = sweep_interval
+        self.redis_key_prefix = redis_key_prefix
+        # 이 프로세스에서 제거한 세션 수 (sqlite 전체 누적은 DB의 store_counters에 기록)
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._last_sweep = 0.0
+
+        if backend == "memory":
+            self._sessions = OrderedDict()
+        elif backend == "sqlite":
+            directory = os.path.dirname(sqlite_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(sqlite_path, timeout=5.0, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS sessions (
+                    session_id TEXT PRIMARY KEY,
+                    accessed_at REAL NOT NULL,
+                    size INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_accessed ON sessions (accessed_at)")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS session_messages (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    session_id TEXT NOT NULL,
+                    message TEXT NOT NULL,
+                    size INTEGER NOT NULL
+                )
+            """)
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_session_messages_session ON session_messages (session_id, seq)"
+            )
+            # 워커 프로세스가 공유하는 누적 카운터
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS store_counters (
+                    name TEXT PRIMARY KEY,
+                    value INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            self._conn.execute("INSERT OR IGNORE INTO store_counters (name, value) VALUES ('evictions', 0)")
+            self._conn.commit()
+        elif backend == "redis":
+            import redis
+            self._redis = redis.Redis.from_url(redis_url)
+        else:
+            raise ValueError(f"알 수 없는 세션 저장소 백엔드: {backend}")
+
+    def get(self, session_id) -> BaseChatMessageHistory:
+        """세션 대화 기록 반환 - 없으면 새로 생성"""
+        now = time.time()
+        if self.backend == "redis":
+            # 유휴 TTL과 메모리 한도(maxmemory-policy)는 서버가 처리
+            return RedisChatHistory(
+                self._redis, session_id, max_messages=self.max_messages, ttl_seconds=self.idle_ttl_seconds,
+                key_prefix=self.redis_key_prefix,
+            )
+        if self.backend == "sqlite":
+            with self._lock, self._conn:
+                self._conn.execute("""
+                    INSERT INTO sessions (session_id, accessed_at) VALUES (?, ?)
+                    ON CONFLICT(session_id) DO UPDATE SET accessed_at = excluded.accessed_at
+                """, (session_id, now))
+            if now - self._last_sweep >= self.sweep_interval:
+                self.sweep(now)
+            return SQLiteChatHistory(self, session_id)
+
+        with self._lock:
+            entry = self._sessions.pop(session_id, None)
+            history = entry[0] if entry is not None else InMemoryChatHistory(self.max_messages)
+            self._sessions[session_id] = (history, now)
+            # 가장 오래 사용하지 않은 세션부터 제거 (맨 앞만 확인하므로 분할 상환 O(1))
+            while self._sessions:
+                oldest_id, (_, accessed_at) = next(iter(self._sessions.items()))
+                if len(self._sessions) <= self.max_sessions and now - accessed_at <= self.idle_ttl_seconds:
+                    break
+                del self._sessions[oldest_id]
+                self.evictions += 1
+        return history
+
+    def sweep(self, now=None):
+        """SQLite 백엔드 정리 - 유휴 세션과 max_sessions 초과분 삭제"""
+        if self.backend != "sqlite":
+            return
+        now = now or time.time()
+        self._last_sweep = now
+        with self._lock, self._conn:
+            expired = self._conn.execute("""
+                SELECT session_id FROM sessions WHERE accessed_at < ?
+                UNION
+                SELECT session_id FROM (
+                    SELECT session_id FROM sessions ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                )
+            """, (now - self.idle_ttl_seconds, self.max_sessions)).fetchall()
+            self._conn.executemany("DELETE FROM session_messages WHERE session_id = ?", expired)
+            self._conn.executemany("DELETE FROM sessions WHERE session_id = ?", expired)
+            self._conn.execute(
+                "UPDATE store_counters SET value = value + ? WHERE name = 'evictions'", (len(expired),)
+            )
+            self.evictions += len(expired)
+
+    def _redis_stats(self, batch_size=500) -> dict:
+        """접두사 SCAN + LLEN/MEMORY USAGE로 세션/메시지 수와 대략적인 메모리 사용량 집계
+
+        키 수에 비례하는 비용이 드므로 모니터링 주기로만 호출합니다.
+        MEMORY USAGE를 지원하지 않는 서버면 bytes는 None입니다.
+        """
+        sessions = messages = size = 0
+        keys = self._redis.scan_iter(match=f"{self.redis_key_prefix}*", count=batch_size)
+        while True:
+            batch = list(islice(keys, batch_size))
+            if not batch:
+                break
+            pipeline = self._redis.pipeline(transaction=False)
+            for key in batch:
+                pipeline.llen(key)
+                pipeline.memory_usage(key)
+            results = pipeline.execute(raise_on_error=False)
+            for length, usage in zip(results[::2], results[1::2]):
+                # SCAN 이후 만료된 키는 길이 0
+                if isinstance(length, Exception) or not length:
+                    continue
+                sessions += 1
+                messages += length
+                if size is not None:
+                    size = None if isinstance(usage, Exception) else size + (usage or 0)
+        try:
+            server_evictions = self._redis.info("stats").get("evicted_keys")
+        except Exception:
+            server_evictions = None
+        return {
+            "backend": self.backend,
+            "sessions": sessions,
+            "messages": messages,
+            "bytes": size,
+            # 세션 제거는 서버(TTL 만료, maxmemory-policy)가 하므로 서버 전체 evicted_keys만 제공
+            "evictions": None,
+            "server_evicted_keys": server_evictions,
+        }
+
+    def stats(self) -> dict:
+        """세션 수, 메시지 수, 저장 크기(바이트), 제거 수
+
+        bytes는 memory는 본문, sqlite는 직렬화 기준, redis는 MEMORY USAGE 기준(키 오버헤드 포함)입니다.
+        evictions는 sqlite는 모든 워커의 누적값(DB 기록), memory는 이 프로세스의 누적값이며,
+        evictions_this_process는 백엔드와 관계없이 이 프로세스가 제거한 수입니다.
+        """
+        if self.backend == "redis":
+            return self._redis_stats()
+        if self.backend == "sqlite":
+            with self._lock:
+                sessions, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM sessions").fetchone()
+                messages = self._conn.execute("SELECT COUNT(*) FROM session_messages").fetchone()[0]
+                evictions = self._conn.execute(
+                    "SELECT value FROM store_counters WHERE name = 'evictions'"
+                ).fetchone()[0]
+        else:
+            with self._lock:
+                histories = [history for history, _ in self._sessions.values()]
+            sessions = len(histories)
+            messages = sum(len(history.messages) for history in histories)
+            size = sum(history.size_bytes for history in histories)
+            evictions = self.evictions
+        return {
+            "backend": self.backend,
+            "sessions": sessions,
+            "messages": messages,
+            "bytes": size,
+            "evictions": evictions,
+            "evictions_this_process": self.evictions,
+        }
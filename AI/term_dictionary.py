@@ -0,0 +1,107 @@
+"""
+외부 법률 용어 사전 로더 (변경 시 자동 재로드)
+"""
+import json
+import os
+import threading
+import time
+from term_matcher import LegalTermMatcher
+
+
+def load_term_file(path):
+    """용어 사전 파일 로드 - (용어 매핑, 법률 지표어)
+
+    JSON: {"term_mapping": {"일상어": "법률 용어"}, "legal_indicators": ["지표어"]}
+    TSV: 한 줄에 "일상어<TAB>법률 용어", 두 번째 칸이 비어 있으면 지표어
+    """
+    if path.endswith(".tsv"):
+        term_mapping = {}
+        legal_indicators = []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.rstrip("\n")
+                if not line.strip() or line.startswith("#"):
+                    continue
+                term, _, legal_term = line.partition("\t")
+                term, legal_term = term.strip(), legal_term.strip()
+                if legal_term:
+                    term_mapping[term] = legal_term
+                elif term:
+                    legal_indicators.append(term)
+        return term_mapping, legal_indicators
+
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    # 형식이 다른 JSON(최상위 리스트, 문자열이 아닌 값 등)은 ValueError로 처리해 기본 사전 유지
+    if not isinstance(data, dict):
+        raise ValueError(f"최상위는 객체여야 합니다 ({type(data).__name__})")
+    term_mapping = data.get("term_mapping", {})
+    legal_indicators = data.get("legal_indicators", [])
+    if not isinstance(term_mapping, dict) or not all(
+        isinstance(term, str) and isinstance(legal_term, str) for term, legal_term in term_mapping.items()
+    ):
+        raise ValueError("term_mapping은 {문자열: 문자열} 객체여야 합니다")
+    if not isinstance(legal_indicators, list) or not all(isinstance(term, str) for term in legal_indicators):
+        raise ValueError("legal_indicators는 문자열 리스트여야 합니다")
+    return dict(term_mapping), list(legal_indicators)
+
+
+class LegalTermDictionary:
+    """파일 기반 법률 용어 사전
+
+    파일이 바뀌면 새 매처를 컴파일한 뒤 참조만 교체하므로 검색 도중에도
+    항상 완성된 매처가 사용됩니다. 파일이 없거나 읽기에 실패하면
+    기본 매핑(또는 직전에 로드한 사전)을 그대로 사용합니다.
+    """
+
+    def __init__(self, path, default_mapping=None, default_indicators=None, reload_interval=10.0):
+        self.path = path
+        self.reload_interval = reload_interval
+        self.version = 0
+        self._default_mapping = dict(default_mapping or {})
+        self._default_indicators = list(default_indicators or [])
+        self._lock = threading.Lock()
+        self._file_state = None
+        self._checked_at = 0.0
+        self._matcher = LegalTermMatcher(self._default_mapping, self._default_indicators)
+        self.reload()
+
+    def _stat(self):
+        try:
+            stat = os.stat(self.path)
+            return stat.st_size, stat.st_mtime_ns
+        except OSError:
+            return None
+
+    def reload(self) -> bool:
+        """파일 변경 시 사전 재로드 - 교체 여부 반환"""
+        with self._lock:
+            self._checked_at = time.time()
+            file_state = self._stat()
+            if file_state is None or file_state == self._file_state:
+                return False
+
+            try:
+                term_mapping, legal_indicators = load_term_file(self.path)
+                matcher = LegalTermMatcher(term_mapping, legal_indicators)
+            except (OSError, ValueError) as e:
+                print(f"⚠️ 법률 용어 사전 로드 실패, 기존 사전 사용: {e}")
+                self._file_state = file_state
+                return False
+
+            self._matcher = matcher
+            self._file_state = file_state
+            self.version += 1
+            print(f"📚 법률 용어 사전 로드: 매핑 {len(term_mapping)}개, 지표어 {len(legal_indicators)}개")
+            return True
+
+    @property
+    def matcher(self) -> LegalTermMatcher:
+        """현재 매처 - 재로드 주기가 지났으면 파일 변경 확인"""
+        if self.reload_interval is not None and time.time() - self._checked_at >= self.reload_interval:
+            self.reload()
+        return self._matcher
+
+    @property
+    def term_mapping(self) -> dict:
+        return self._matcher.term_mapping
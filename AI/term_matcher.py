@@ -0,0 +1,67 @@
+"""
+법률 용어 단일 패스 매처 (트라이 컴파일 정규식)
+"""
+import re
+
+
+def _compile_trie(trie) -> str:
+    """트라이를 정규식으로 변환 - 공통 접두사를 묶어 후보 수와 무관하게 한 번에 매칭"""
+    terminal = "" in trie
+    branches = []
+    for char in sorted(key for key in trie if key):
+        branches.append(re.escape(char) + _compile_trie(trie[char]))
+
+    if not branches:
+        return ""
+    if len(branches) == 1 and not terminal:
+        return branches[0]
+
+    pattern = "(?:" + "|".join(branches) + ")"
+    # 탐욕적 선택 그룹이므로 같은 위치에서는 항상 가장 긴 용어가 먼저 매칭됨
+    return pattern + "?" if terminal else pattern
+
+
+def _compile_terms(terms):
+    """용어 목록 → 트라이 정규식 (용어가 없으면 None)"""
+    trie = {}
+    for term in terms:
+        if not term:
+            continue
+        node = trie
+        for char in term:
+            node = node.setdefault(char, {})
+        node[""] = True
+    return re.compile(_compile_trie(trie)) if trie else None
+
+
+class LegalTermMatcher:
+    """일상어→법률 용어 치환과 법률 지표어 탐지를 트라이 정규식으로 처리
+
+    매핑 용어는 하나의 트라이 정규식으로 컴파일해 leftmost-longest,
+    비중첩 방식으로 치환하므로 치환 결과가 다시 매칭되지 않고
+    매핑 순서에 영향을 받지 않습니다. 지표어는 매핑 용어와 겹쳐도
+    놓치지 않도록 (예: "이중계약서"의 "계약서") 별도 정규식으로 확인합니다.
+    """
+
+    def __init__(self, term_mapping, legal_indicators):
+        self.term_mapping = dict(term_mapping)
+        self.legal_indicators = frozenset(legal_indicators)
+        self._mapping_pattern = _compile_terms(self.term_mapping)
+        self._indicator_pattern = _compile_terms(self.legal_indicators)
+
+    def __len__(self):
+        return len(set(self.term_mapping) | self.legal_indicators)
+
+    def scan(self, query: str) -> tuple[str, bool]:
+        """(룰 기반 변환 결과, 법률 지표어 포함 여부) 반환"""
+        return self.convert(query), self.contains_indicator(query)
+
+    def convert(self, query: str) -> str:
+        """룰 기반 용어 변환"""
+        if self._mapping_pattern is None:
+            return query
+        return self._mapping_pattern.sub(lambda match: self.term_mapping[match.group()], query)
+
+    def contains_indicator(self, query: str) -> bool:
+        """법률 지표어 포함 여부 - 원문 부분 문자열 기준 (다른 용어와 겹쳐도 탐지)"""
+        return self._indicator_pattern is not None and self._indicator_pattern.search(query) is not None
@@ -0,0 +1,267 @@
+"""
+메모리 상주 NumPy 벡터 스토어 (Chroma 대체 백엔드)
+
+모든 임베딩을 정규화된 행렬 하나(float32 또는 int8 양자화)로 올려 두고
+행렬-벡터 곱 한 번과 argpartition으로 상위 k개를 찾는 완전 탐색 검색입니다.
+
+벤치마크 (같은 쿼리로 Chroma와 지연 시간 / recall@k 비교):
+    python vector_store.py --db legal --queries 200 --k 5
+"""
+import time
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+
+
+QUANTIZE_NONE = "float32"
+QUANTIZE_INT8 = "int8"
+
+
+def normalize_rows(vectors):
+    """행(마지막 축) 단위 L2 정규화 - 영벡터는 그대로"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _quantize_int8(vectors):
+    """행별 대칭 int8 양자화 - (int8 행렬, 행별 스케일)"""
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    return np.round(vectors / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+
+
+class ReadOnlyVectorStore(VectorStore):
+    """Chroma 대체용 읽기 전용 벡터 스토어 공통 부분 (NumPy 스토어, 스냅샷 스토어)
+
+    하위 클래스는 similarity_search_by_vector_with_relevance_scores(), get(), count()를 구현합니다.
+    거리는 Chroma와 같이 작을수록 가까운 코사인 거리(1 - 코사인 유사도)이며,
+    as_retriever()와 RAG 시스템의 벡터 검색 경로를 그대로 사용할 수 있습니다.
+    """
+
+    _embedding_function = None
+    # add_texts/from_texts 호출 시 안내 문구
+    _read_only_message = "읽기 전용 벡터 스토어입니다."
+
+    @property
+    def embeddings(self):
+        return self._embedding_function
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+    def _embed(self, query):
+        if hasattr(self._embedding_function, "embed_query"):
+            return self._embedding_function.embed_query(query)
+        return self._embedding_function.encode(query).tolist()
+
+    def similarity_search_by_vector_with_relevance_scores(self, embedding, k=4, **kwargs):
+        """(문서, 코사인 거리) 목록 - Chroma와 같이 거리가 작을수록 가까움"""
+        raise NotImplementedError
+
+    def similarity_search_by_vector(self, embedding, k=4, **kwargs):
+        return [doc for doc, _ in self.similarity_search_by_vector_with_relevance_scores(embedding, k)]
+
+    def similarity_search_with_score(self, query, k=4, **kwargs):
+        return self.similarity_search_by_vector_with_relevance_scores(self._embed(query), k)
+
+    def similarity_search(self, query, k=4, **kwargs):
+        return self.similarity_search_by_vector(self._embed(query), k)
+
+    def _select_relevance_score_fn(self):
+        return lambda distance: 1.0 - distance
+
+    @staticmethod
+    def _get_result(ids, documents, metadatas, include):
+        """Chroma get()과 같은 형태의 결과 dict"""
+        result = {"ids": list(ids)}
+        if "documents" in include:
+            result["documents"] = list(documents)
+        if "metadatas" in include:
+            result["metadatas"] = list(metadatas)
+        return result
+
+    def add_texts(self, texts, metadatas=None, **kwargs):
+        raise NotImplementedError(self._read_only_message)
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, **kwargs):
+        raise NotImplementedError(cls._read_only_message)
+
+
+class NumpyVectorStore(ReadOnlyVectorStore):
+    """정규화된 임베딩 행렬 위의 읽기 전용 완전 탐색 벡터 스토어"""
+
+    _read_only_message = "NumPy 벡터 스토어는 읽기 전용입니다. 원본 DB에 추가한 뒤 NumpyVectorStore.from_store()로 다시 적재하세요."
+
+    # int8 행렬은 이 행 수씩 float32로 풀어 곱함 (전체 복사본을 만들지 않음)
+    _INT8_CHUNK_ROWS = 16384
+
+    def __init__(self, ids, texts, metadatas, embeddings, embedding_function=None, quantize=QUANTIZE_NONE):
+        self.ids = list(ids)
+        self.texts = list(texts)
+        self.metadatas = [meta or {} for meta in metadatas]
+        self._embedding_function = embedding_function
+        self._id_to_row = {doc_id: row for row, doc_id in enumerate(self.ids)}
+
+        vectors = normalize_rows(embeddings) if len(self.ids) else np.empty((0, 0), np.float32)
+        self.quantize = quantize
+        if quantize == QUANTIZE_INT8:
+            self.matrix, self.scales = _quantize_int8(vectors)
+        else:
+            self.matrix, self.scales = vectors, None
+
+    @classmethod
+    def from_store(cls, db, embedding_function=None, quantize=QUANTIZE_NONE, batch_size=5000):
+        """Chroma(또는 스냅샷) 스토어의 전체 문서와 임베딩을 메모리로 적재"""
+        started = time.perf_counter()
+        ids, texts, metadatas, embeddings = [], [], [], []
+        snapshot_vectors = getattr(db, "vectors", None)
+        include = ["documents", "metadatas"] if snapshot_vectors is not None else ["embeddings", "documents", "metadatas"]
+        offset = 0
+        while True:
+            batch = db.get(limit=batch_size, offset=offset, include=include)
+            if not batch["ids"]:
+                break
+            ids.extend(batch["ids"])
+            texts.extend(batch["documents"])
+            metadatas.extend(batch["metadatas"])
+            if snapshot_vectors is None:
+                embeddings.append(np.asarray(batch["embeddings"], dtype=np.float32))
+            offset += len(batch["ids"])
+
+        if snapshot_vectors is not None:
+            # 스냅샷은 행 순서대로 조회되므로 벡터 파일과 그대로 대응
+            matrix = np.asarray(snapshot_vectors[:len(ids)], dtype=np.float32)
+        else:
+            matrix = np.concatenate(embeddings) if embeddings else np.empty((0, 0), np.float32)
+
+        store = cls(
+            ids, texts, metadatas, matrix,
+            embedding_function=embedding_function or getattr(db, "embeddings", None),
+            quantize=quantize,
+        )
+        print(f"✅ NumPy 벡터 스토어 적재: {len(ids)}개 문서, {store.matrix.nbytes / 1e6:.1f}MB "
+              f"({quantize}, {time.perf_counter() - started:.1f}s)")
+        return store
+
+    def count(self) -> int:
+        return len(self.ids)
+
+    def _scores(self, queries):
+        """정규화된 쿼리 행렬(q, d)에 대한 전체 코사인 유사도 (q, n)"""
+        if self.scales is None:
+            return queries @ self.matrix.T
+        scores = np.empty((len(queries), len(self.ids)), dtype=np.float32)
+        for start in range(0, len(self.ids), self._INT8_CHUNK_ROWS):
+            chunk = self.matrix[start:start + self._INT8_CHUNK_ROWS].astype(np.float32)
+            scores[:, start:start + len(chunk)] = queries @ chunk.T
+        return scores * self.scales
+
+    def search_many(self, embeddings, k=4):
+        """여러 쿼리 임베딩을 한 번에 검색 - 쿼리별 [(행 번호, 코사인 거리)]"""
+        if not self.ids or len(embeddings) == 0:
+            return [[] for _ in range(len(embeddings))]
+        scores = self._scores(normalize_rows(np.atleast_2d(embeddings)))
+        k = min(k, scores.shape[1])
+        if k < scores.shape[1]:
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            top = np.tile(np.arange(scores.shape[1]), (len(scores), 1))
+        results = []
+        for row_scores, candidates in zip(scores, top):
+            ordered = candidates[np.argsort(-row_scores[candidates])]
+            results.append([(int(row), 1.0 - float(row_scores[row])) for row in ordered])
+        return results
+
+    def _document(self, row):
+        return Document(page_content=self.texts[row] or "", metadata=self.metadatas[row], id=self.ids[row])
+
+    def similarity_search_by_vector_with_relevance_scores(self, embedding, k=4, **kwargs):
+        return [(self._document(row), distance) for row, distance in self.search_many([embedding], k)[0]]
+
+    def batch_similarity_search_by_vector(self, embeddings, k=4):
+        """쿼리 임베딩 여러 개를 행렬 곱 한 번으로 검색 - 쿼리별 [(문서, 코사인 거리)]"""
+        return [
+            [(self._document(row), distance) for row, distance in hits]
+            for hits in self.search_many(embeddings, k)
+        ]
+
+    def get(self, ids=None, limit=None, offset=0, include=("documents", "metadatas")):
+        """Chroma get()과 같은 형태의 조회 - ids 또는 limit/offset"""
+        if ids is not None:
+            rows = [self._id_to_row[doc_id] for doc_id in ids if doc_id in self._id_to_row]
+        else:
+            end = None if limit is None else (offset or 0) + limit
+            rows = range(len(self.ids))[offset or 0:end]
+        return self._get_result(
+            (self.ids[row] for row in rows),
+            (self.texts[row] for row in rows),
+            (self.metadatas[row] for row in rows),
+            include,
+        )
+
+
+def _percentile_ms(latencies, q):
+    return float(np.percentile(latencies, q) * 1000) if latencies else 0.0
+
+
+def benchmark(db, queries, k=5, quantize=QUANTIZE_NONE):
+    """같은 쿼리 임베딩으로 원본 스토어와 NumPy 스토어 비교
+
+    정답은 float32 완전 탐색 결과이며, 각 백엔드의 recall@k와 지연 시간(p50/p95)을 반환합니다.
+    """
+    exact = NumpyVectorStore.from_store(db)
+    candidate = exact if quantize == QUANTIZE_NONE else NumpyVectorStore.from_store(db, quantize=quantize)
+    query_vectors = [exact._embed(query) for query in queries]
+    truth = [{exact.ids[row] for row, _ in hits} for hits in exact.search_many(query_vectors, k)]
+
+    report = {}
+    for name, store in [("chroma", db), (f"numpy-{quantize}", candidate)]:
+        latencies, found = [], 0
+        for vector, expected in zip(query_vectors, truth):
+            started = time.perf_counter()
+            hits = store.similarity_search_by_vector_with_relevance_scores(vector, k=k)
+            latencies.append(time.perf_counter() - started)
+            found += len(expected & {doc.id for doc, _ in hits})
+        report[name] = {
+            f"recall@{k}": found / max(1, k * len(queries)),
+            "p50_ms": _percentile_ms(latencies, 50),
+            "p95_ms": _percentile_ms(latencies, 95),
+        }
+
+    started = time.perf_counter()
+    candidate.search_many(query_vectors, k)
+    report[f"numpy-{quantize}"]["batch_ms_per_query"] = (time.perf_counter() - started) * 1000 / max(1, len(queries))
+    return report
+
+
+def main(argv=None):
+    import argparse
+    import random
+    from langchain_chroma import Chroma
+    from sentence_transformers import SentenceTransformer
+    from config import LEGAL_DB_DIR, NEWS_DB_DIR, EMBEDDING_MODEL_NAME
+
+    parser = argparse.ArgumentParser(description="NumPy 벡터 스토어 vs Chroma 벤치마크")
+    parser.add_argument("--db", choices=["legal", "news"], default="legal")
+    parser.add_argument("--queries", type=int, default=200, help="DB 문서 앞부분을 샘플링해 쿼리로 사용")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--quantize", choices=[QUANTIZE_NONE, QUANTIZE_INT8], default=QUANTIZE_NONE)
+    args = parser.parse_args(argv)
+
+    db = Chroma(
+        persist_directory={"legal": LEGAL_DB_DIR, "news": NEWS_DB_DIR}[args.db],
+        embedding_function=SentenceTransformer(EMBEDDING_MODEL_NAME),
+    )
+    texts = [text for text in db.get(include=["documents"])["documents"] if text]
+    queries = [text[:100] for text in random.Random(0).sample(texts, min(args.queries, len(texts)))]
+
+    for name, metrics in benchmark(db, queries, k=args.k, quantize=args.quantize).items():
+        print(f"📊 {name}: " + ", ".join(f"{key}={value:.3f}" for key, value in metrics.items()))
+
+
+if __name__ == "__main__":
+    main()
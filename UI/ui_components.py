@@ -1,6 +1,7 @@
 """
 UI 컴포넌트 관리
 """
+import time
 import streamlit as st
 
 
@@ -129,6 +130,50 @@ def render_chat_messages(chat_history):
     st.markdown('</div>', unsafe_allow_html=True)
 
 
+def render_streaming_message(chunks):
+    """AI 답변 스트리밍 렌더링 - 토큰이 도착하는 대로 말풍선에 표시
+
+    Returns:
+        (전체 답변, {"ttft": 첫 토큰까지 초, "tokens": 청크 수, "tokens_per_sec": 초당 토큰})
+    """
+    placeholder = st.empty()
+    parts = []
+    started = time.perf_counter()
+    first_token_at = None
+
+    for chunk in chunks:
+        if not chunk:
+            continue
+        if first_token_at is None:
+            first_token_at = time.perf_counter()
+        parts.append(chunk)
+        placeholder.markdown(f"""
+        <div class="ai-message">
+            <div class="ai-bubble">
+                {"".join(parts)}▌
+            </div>
+        </div>
+        """, unsafe_allow_html=True)
+
+    finished = time.perf_counter()
+    response = "".join(parts)
+    placeholder.markdown(f"""
+    <div class="ai-message">
+        <div class="ai-bubble">
+            {response}
+        </div>
+    </div>
+    """, unsafe_allow_html=True)
+
+    generation_time = finished - first_token_at if first_token_at else 0.0
+    metrics = {
+        "ttft": (first_token_at - started) if first_token_at else None,
+        "tokens": len(parts),
+        "tokens_per_sec": len(parts) / generation_time if generation_time > 0 else 0.0,
+    }
+    return response, metrics
+
+
 def render_chat_input():
     """채팅 입력 인터페이스"""
     st.markdown("""
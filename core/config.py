@@ -10,6 +10,35 @@ DATABASE_URLS = {
     "ja_chroma_db": "https://huggingface.co/datasets/sujeonggg/chroma_db_law_real_final/resolve/main/ja_chroma_db.zip",
 }
 
+# 아카이브 SHA-256 매니페스트 - None이면 허깅페이스가 알려주는 LFS 해시로 검증
+DATABASE_SHA256 = {
+    "chroma_db_law_real_final": None,
+    "ja_chroma_db": None,
+}
+
+# 다운로드하면서 바로 압축 해제 (아카이브를 디스크에 저장하지 않음) - 연결이 끊기면 처음부터 다시 받아야 하므로
+# 기본값은 이어받기가 되는 임시 아카이브 방식, 연결이 안정적이고 디스크가 부족할 때만 True
+DATABASE_STREAMING_EXTRACT = False
+
+# 벡터 DB 경로
+LEGAL_DB_DIR = "chroma_db_law_real_final"
+NEWS_DB_DIR = "ja_chroma_db"
+
+# 읽기 전용 스냅샷 설정 (data/snapshot.py) - 스냅샷이 있으면 Chroma 대신 메모리 매핑해 사용
+SNAPSHOT_ENABLED = True
+SNAPSHOT_DIR = "snapshots"
+SNAPSHOT_DTYPE = "float16"
+SNAPSHOT_NPROBE = 32
+
+# 벡터 검색 백엔드 - "chroma"(또는 스냅샷) 그대로 사용 / "numpy"는 전체 임베딩을 메모리에 올려 완전 탐색
+VECTOR_BACKEND = "chroma"
+VECTOR_QUANTIZE = "float32"  # "int8"이면 메모리 1/4, 약간의 recall 손실
+
+# 오프라인 정규화 설정 (data/ingest.py)
+INGEST_VERSION = 1
+INGEST_SNIPPET_TOKENS = 400
+INGEST_CHECKPOINT_DIR = "cache/ingest"
+
 # 임베딩 모델 설정
 EMBEDDING_MODEL_NAME = "snunlp/KR-SBERT-V40K-klueNLI-augSTS"
 
@@ -17,8 +46,23 @@ EMBEDDING_MODEL_NAME = "snunlp/KR-SBERT-V40K-klueNLI-augSTS"
 OPENAI_MODEL = "gpt-4o"
 OPENAI_TEMPERATURE = 0.3
 MAX_TOKENS = 3000
+STREAMING_RESPONSE = True
+
+# LLM 게이트웨이 설정 (AI/llm_gateway.py) - 프로세스 공용 연결 풀, 동시 호출 제한, 재시도
+OPENAI_BASE_URL = None  # OpenAI 호환 서버(로컬 모의 서버 등) 주소, None이면 기본 API
+LLM_TIMEOUT = 60.0
+LLM_MAX_CONCURRENCY = 16
+LLM_MAX_RETRIES = 4
+LLM_BACKOFF_BASE = 0.5
+LLM_BACKOFF_MAX = 20.0
+LLM_POOL_CONNECTIONS = 32
+LLM_POOL_KEEPALIVE = 16
+
+# 법률 용어 사전 파일 (JSON/TSV) - 없으면 아래 기본 매핑 사용
+LEGAL_TERMS_PATH = "data/legal_terms.json"
+LEGAL_TERMS_RELOAD_INTERVAL = 10.0
 
-# 법률 용어 매핑
+# 법률 용어 매핑 (기본값)
 TERM_MAPPING = {
     "집주인": "임대인", "세입자": "임차인", "전세금": "임대차보증금",
     "보증금": "임대차보증금", "월세": "차임", "방세": "차임",
@@ -31,19 +75,92 @@ TERM_MAPPING = {
     "계약": "법률행위", "약속": "계약", "위반": "채무불이행", "어기다": "위반하다"
 }
 
-# 법률 지표어
+# 법률 지표어 (기본값)
 LEGAL_INDICATORS = [
     "임대인", "임차인", "임대차", "명도", "채무불이행", 
     "손해배상", "민사소송", "형사고발", "보증금반환",
     "법률", "판례", "법령", "소송", "계약서"
 ]
 
+# 임베딩 기반 쿼리 확장 설정 (AI/query_rewriter.py) - 룰에 없는 질문을 로컬에서 법률 용어로 확장
+QUERY_REWRITE_ENABLED = True
+QUERY_REWRITE_PHRASES_PATH = "data/legal_phrases.json"
+QUERY_REWRITE_THRESHOLD = 0.6
+QUERY_REWRITE_TOP_K = 3
+QUERY_REWRITE_CACHE_DIR = "cache/rewrite"
+QUERY_GPT_FALLBACK = False  # True면 확장 결과가 없을 때 GPT로 변환 (네트워크 왕복 추가)
+
+# 쿼리 변환 캐시 설정
+QUERY_CACHE_PATH = "cache/query_conversion.sqlite3"
+QUERY_CACHE_MAX_ENTRIES = 5000
+QUERY_CACHE_TTL_SECONDS = 30 * 24 * 3600
+
+# 시맨틱 답변 캐시 설정
+SEMANTIC_CACHE_ENABLED = True
+SEMANTIC_CACHE_THRESHOLD = 0.93
+SEMANTIC_CACHE_MAX_ENTRIES = 500
+SEMANTIC_CACHE_TTL_SECONDS = 24 * 3600
+
+# 대화 기록 저장소 설정 (AI/session_store.py) - "memory" / "sqlite" / "redis"
+SESSION_STORE_BACKEND = "sqlite"
+SESSION_STORE_PATH = "cache/sessions.sqlite3"
+SESSION_REDIS_URL = "redis://localhost:6379/0"
+# redis는 최대 세션 수를 적용하지 않음 - 서버의 maxmemory와 maxmemory-policy(volatile-lru 등)로 제한
+SESSION_MAX_SESSIONS = 10000
+SESSION_IDLE_TTL_SECONDS = 6 * 3600
+SESSION_MAX_MESSAGES = 20
+
+# 대화 메모리 설정 (AI/conversation_memory.py) - "summary"면 토큰 예산을 넘는 오래된 대화를 요약, "window"면 최근 N개만
+CHAT_MEMORY_MODE = "summary"
+CHAT_HISTORY_TOKEN_BUDGET = 1500
+CHAT_HISTORY_KEEP_TOKENS = 600
+CHAT_SUMMARY_MODEL = "gpt-4o-mini"
+CHAT_SUMMARY_MAX_TOKENS = 400
+
 # 검색 설정
 LEGAL_SEARCH_K = 5
 NEWS_SEARCH_K = 4
 MAX_LEGAL_DOCS = 8
 MAX_NEWS_DOCS = 3
 
+# 컨텍스트 토큰 예산 (참고자료 전체, OPENAI_MODEL 토크나이저 기준)
+CONTEXT_TOKEN_BUDGET = 3000
+CONTEXT_MIN_DOC_TOKENS = 80
+
+# 관련도 컷오프 설정 (쿼리-문서 코사인 유사도 기준 - 모든 벡터 백엔드 공통, 최고 점수 - MARGIN 미만 문서 제외)
+LEGAL_MIN_RELEVANCE = 0.25
+NEWS_MIN_RELEVANCE = 0.35
+NEWS_SKIP_BELOW = 0.4
+RELEVANCE_CUTOFF_MARGIN = 0.2
+
+# 하이브리드 검색 설정 (법률/뉴스 DB 벡터 + BM25, RRF 결합)
+HYBRID_RETRIEVAL = True
+HYBRID_CANDIDATE_K = 20
+RRF_K = 60
+
+# 어휘 역색인 설정 (DB별 하위 디렉터리에 세그먼트 저장)
+LEXICAL_INDEX_DIR = "cache/lexical"
+LEXICAL_SEGMENT_MAX_DOCS = 50000
+
+# 재정렬 설정 (한국어 크로스 인코더, CPU 배치 추론)
+RERANK_ENABLED = False
+RERANK_MODEL_NAME = "bongsoo/klue-cross-encoder-v1"
+RERANK_CANDIDATE_K = 20
+RERANK_LEGAL_TOP_N = 4
+RERANK_NEWS_TOP_N = 2
+RERANK_LATENCY_BUDGET = 1.5
+RERANK_BATCH_SIZE = 32
+RERANK_MAX_LENGTH = 512
+
+# 병렬 검색 설정 (DB별 타임아웃, 초)
+CONCURRENT_RETRIEVAL = True
+LEGAL_SEARCH_TIMEOUT = 5.0
+NEWS_SEARCH_TIMEOUT = 2.0
+
+# 일괄 처리 설정 (AI/batch_runner.py) - 배치당 질문 수, LLM 동시 호출 수
+BATCH_QUERY_SIZE = 64
+BATCH_LLM_CONCURRENCY = 8
+
 # 화면 설정
 PAGE_TITLE = "AI 스위치온 - 판례 검색 시스템"
 PAGE_ICON = "🏠"
@@ -11,15 +11,14 @@ import uuid
 import streamlit as st
 
 # 모듈 임포트
-from config import PAGE_TITLE, PAGE_ICON
+from config import PAGE_TITLE, PAGE_ICON, STREAMING_RESPONSE
 from database_utils import initialize_embeddings_and_databases
 from styles import load_custom_css
-from rag_system import OptimizedConditionalRAGSystem
-from chat_chain import create_chat_chain_with_memory
+from rag_factory import get_rag_system, get_chat_chain
 from ui_components import (
     render_header, render_sidebar, render_system_status,
     render_service_info, render_disclaimer, render_chat_messages,
-    render_chat_input, render_footer
+    render_chat_input, render_streaming_message, render_footer
 )
 from ads import display_ad_banner
 
@@ -59,8 +58,8 @@ def main():
     # RAG 시스템 및 채팅 체인 생성
     if system_ready and (legal_db or news_db):
         try:
-            rag_system = OptimizedConditionalRAGSystem(legal_db, news_db)
-            chain = create_chat_chain_with_memory(rag_system)
+            rag_system = get_rag_system(legal_db, news_db, embedding_model)
+            chain = get_chat_chain(legal_db, news_db, embedding_model)
         except Exception as e:
             st.error(f"❌ RAG 시스템 오류: {str(e)}")
             chain = None
@@ -96,4 +95,39 @@ def main():
     # 질문 처리
     if prompt:
         # 사용자 메시지 저장
-        st.session_state.chat_history.append({"role": "user", "content": prompt
+        st.session_state.chat_history.append({"role": "user", "content": prompt})
+
+        # 답변 생성
+        chain_config = {"configurable": {"session_id": st.session_state.session_id}}
+        try:
+            if chain and system_ready and STREAMING_RESPONSE:
+                # 토큰 단위 스트리밍 - 첫 토큰부터 바로 표시
+                render_chat_messages([{"role": "user", "content": prompt}])
+                response, metrics = render_streaming_message(
+                    chunk.get("answer", "") for chunk in chain.stream({"question": prompt}, config=chain_config)
+                )
+                st.session_state.last_stream_metrics = metrics
+                if metrics["ttft"] is not None:
+                    print(f"⚡ TTFT {metrics['ttft']:.2f}s | {metrics['tokens']} tokens | {metrics['tokens_per_sec']:.1f} tokens/s")
+                st.session_state.chat_history.append({"role": "assistant", "content": response})
+            elif chain and system_ready:
+                with st.spinner("🤖 AI가 판례를 검색하고 답변을 생성하고 있습니다..."):
+                    response = chain.invoke({"question": prompt}, config=chain_config)["answer"]
+                st.session_state.chat_history.append({"role": "assistant", "content": response})
+            else:
+                error_message = "죄송합니다. 현재 시스템 초기화 중입니다. 잠시 후 다시 시도해주세요."
+                st.session_state.chat_history.append({"role": "assistant", "content": error_message})
+                
+        except Exception as e:
+            error_message = f"죄송합니다. 답변 생성 중 오류가 발생했습니다: {str(e)}"
+            st.session_state.chat_history.append({"role": "assistant", "content": error_message})
+
+        # 답변 생성 후 페이지 새로고침
+        st.rerun()
+
+    # 푸터
+    render_footer()
+
+
+if __name__ == "__main__":
+    main()
@@ -2,58 +2,47 @@
 데이터베이스 다운로드 및 초기화 관련 유틸리티
 """
 import os
-import requests
-import zipfile
 import streamlit as st
 from sentence_transformers import SentenceTransformer
 from langchain_chroma import Chroma
-from config import DATABASE_URLS, EMBEDDING_MODEL_NAME
+from db_downloader import download_databases, ProgressPrinter
+from snapshot import find_latest_snapshot, open_snapshot
+from vector_store import NumpyVectorStore
+from config import (
+    DATABASE_URLS, DATABASE_SHA256, DATABASE_STREAMING_EXTRACT, EMBEDDING_MODEL_NAME,
+    LEGAL_DB_DIR, NEWS_DB_DIR, SNAPSHOT_ENABLED, VECTOR_BACKEND, VECTOR_QUANTIZE
+)
 
 
 @st.cache_resource
 def download_and_extract_databases(verbose=True):
-    """허깅페이스에서 벡터 DB 다운로드"""
-    
-    def download_and_unzip(url, extract_to):
-        os.makedirs(extract_to, exist_ok=True)
-        zip_path = os.path.join(extract_to, "temp.zip")
+    """허깅페이스에서 벡터 DB 병렬 다운로드 (스트리밍 해제 또는 이어받기 + SHA-256 검증 + 원자적 설치)
 
-        # 이미 존재하는지 확인
-        if os.path.exists(os.path.join(extract_to, "chroma.sqlite3")) or \
-           any(os.path.exists(os.path.join(extract_to, f)) for f in ["index", "chroma", "data"]):
-            if verbose:
-                print(f"✅ Already exists: {extract_to}")
-            return True
+    스냅샷이 준비된 DB는 Chroma 아카이브를 받지 않습니다.
+    """
+    sources = {
+        name: url for name, url in DATABASE_URLS.items()
+        if not (SNAPSHOT_ENABLED and find_latest_snapshot(name))
+    }
+    if not sources:
+        return True
+    return download_databases(
+        sources,
+        checksums=DATABASE_SHA256,
+        progress=ProgressPrinter() if verbose else None,
+        streaming=DATABASE_STREAMING_EXTRACT,
+    )
 
-        try:
-            if verbose:
-                print(f"📦 Downloading from {url}...")
-            r = requests.get(url, stream=True)
-            r.raise_for_status()
-            
-            with open(zip_path, "wb") as f:
-                for chunk in r.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
 
-            if verbose:
-                print(f"🧩 Unzipping to {extract_to}...")
-            with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-                zip_ref.extractall(extract_to)
-
-            os.remove(zip_path)
-            return True
-        except Exception as e:
-            if verbose:
-                print(f"❌ Failed to download {url}: {e}")
-            return False
-
-    success = True
-    for name, url in DATABASE_URLS.items():
-        if not download_and_unzip(url, name):
-            success = False
-
-    return success
+def _load_numpy_store(db, embedding_model):
+    """벡터 DB 전체를 NumPy 행렬로 적재 - 실패하면 원래 DB 사용"""
+    if db is None:
+        return None
+    try:
+        return NumpyVectorStore.from_store(db, embedding_function=embedding_model, quantize=VECTOR_QUANTIZE)
+    except Exception as e:
+        print(f"⚠️ NumPy 벡터 스토어 적재 실패 - 기존 DB 사용: {e}")
+        return db
 
 
 @st.cache_resource
@@ -71,30 +60,43 @@ def initialize_embeddings_and_databases():
         embedding_model = SentenceTransformer(EMBEDDING_MODEL_NAME)
         print("✅ 임베딩 모델 로딩 완료")
         
-        # 3. Chroma DB 연결
+        # 3. 벡터 DB 연결 - 스냅샷 우선, 없으면 Chroma
         legal_db = None
         news_db = None
         
-        if os.path.exists("chroma_db_law_real_final"):
+        if SNAPSHOT_ENABLED:
+            try:
+                legal_db = open_snapshot(LEGAL_DB_DIR, embedding_model)
+                news_db = open_snapshot(NEWS_DB_DIR, embedding_model)
+            except Exception as e:
+                print(f"⚠️ 스냅샷 열기 실패 - Chroma 사용: {e}")
+                legal_db = news_db = None
+        
+        if legal_db is None and os.path.exists(LEGAL_DB_DIR):
             try:
                 legal_db = Chroma(
-                    persist_directory="chroma_db_law_real_final",
+                    persist_directory=LEGAL_DB_DIR,
                     embedding_function=embedding_model
                 )
                 print("✅ 법률 DB 연결 완료")
             except Exception as e:
                 print(f"⚠️ 법률 DB 연결 실패: {e}")
         
-        if os.path.exists("ja_chroma_db"):
+        if news_db is None and os.path.exists(NEWS_DB_DIR):
             try:
                 news_db = Chroma(
-                    persist_directory="ja_chroma_db",
+                    persist_directory=NEWS_DB_DIR,
                     embedding_function=embedding_model
                 )
                 print("✅ 뉴스 DB 연결 완료")
             except Exception as e:
                 print(f"⚠️ 뉴스 DB 연결 실패: {e}")
         
+        # 4. 메모리 상주 NumPy 백엔드로 전환 (설정 시)
+        if VECTOR_BACKEND == "numpy":
+            legal_db = _load_numpy_store(legal_db, embedding_model)
+            news_db = _load_numpy_store(news_db, embedding_model)
+        
         return embedding_model, legal_db, news_db, True
         
     except Exception as e:
@@ -0,0 +1,393 @@
+"""
+벡터 DB 아카이브 다운로드 (병렬, 이어받기, SHA-256 검증, 원자적 압축 해제)
+"""
+import hashlib
+import json
+import os
+import re
+import shutil
+import struct
+import threading
+import time
+import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+import requests
+
+
+COMPLETE_MARKER = ".download_complete.json"
+CHUNK_SIZE = 1024 * 1024
+
+_SHA256_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+
+_LOCAL_HEADER = struct.Struct("<IHHHHHIIIHH")
+_LOCAL_HEADER_SIGNATURE = 0x04034B50
+_DATA_DESCRIPTOR_SIGNATURE = 0x08074B50
+
+
+class ChecksumMismatchError(Exception):
+    """다운로드한 아카이브의 SHA-256이 매니페스트와 다름"""
+
+
+class StreamingUnsupportedError(Exception):
+    """스트리밍으로 풀 수 없는 ZIP 항목 (임시 아카이브 방식으로 대체)"""
+
+
+def is_database_ready(directory) -> bool:
+    """압축 해제가 끝까지 완료된 DB 디렉터리인지 확인"""
+    return os.path.exists(os.path.join(directory, COMPLETE_MARKER))
+
+
+def _server_sha256(response):
+    """허깅페이스 LFS 응답의 X-Linked-ETag(= SHA-256) 추출"""
+    for r in list(response.history) + [response]:
+        etag = (r.headers.get("X-Linked-ETag") or r.headers.get("ETag") or "").strip('"').lower()
+        if etag.startswith("w/"):
+            etag = etag[2:].strip('"')
+        if _SHA256_PATTERN.match(etag):
+            return etag
+    return None
+
+
+class ProgressPrinter:
+    """DB별 진행률 출력 - 5% 단위로만 출력"""
+
+    def __init__(self, step=5):
+        self.step = step
+        self._last = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, name, done, total):
+        with self._lock:
+            if total:
+                percent = int(done * 100 / total) // self.step * self.step
+                if percent != self._last.get(name):
+                    self._last[name] = percent
+                    print(f"📥 {name}: {percent}% ({done / 1e6:.1f}/{total / 1e6:.1f}MB)")
+            elif done - self._last.get(name, 0) >= 50 * 1e6:
+                self._last[name] = done
+                print(f"📥 {name}: {done / 1e6:.1f}MB")
+
+
+def download_file(url, dest_path, name=None, expected_sha256=None, progress=None,
+                  session=None, chunk_size=CHUNK_SIZE, timeout=30):
+    """URL을 dest_path로 다운로드 - 중단된 .part 파일이 있으면 Range 요청으로 이어받기
+
+    SHA-256은 매니페스트 값, 없으면 서버가 알려준 값과 비교합니다. 반환값은 실제 SHA-256.
+    """
+    session = session or requests.Session()
+    name = name or os.path.basename(dest_path)
+    part_path = dest_path + ".part"
+    digest = hashlib.sha256()
+
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    headers = {"Range": f"bytes={offset}-"} if offset else {}
+    with session.get(url, headers=headers, stream=True, timeout=timeout) as response:
+        if response.status_code == 416:
+            # 이미 전부 받은 상태
+            response.close()
+            mode = "ab"
+        else:
+            response.raise_for_status()
+            if offset and response.status_code != 206:
+                # 서버가 Range를 지원하지 않으면 처음부터
+                offset = 0
+            mode = "ab" if offset else "wb"
+
+        expected_sha256 = (expected_sha256 or _server_sha256(response) or "").lower() or None
+        total = None
+        if response.status_code == 206:
+            content_range = response.headers.get("Content-Range", "")
+            if "/" in content_range and content_range.rsplit("/", 1)[1].isdigit():
+                total = int(content_range.rsplit("/", 1)[1])
+        elif response.status_code == 200 and response.headers.get("Content-Length", "").isdigit():
+            total = int(response.headers["Content-Length"])
+
+        # 이어받는 경우 기존 부분까지 해시에 반영
+        if offset:
+            with open(part_path, "rb") as f:
+                for chunk in iter(lambda: f.read(chunk_size), b""):
+                    digest.update(chunk)
+
+        done = offset
+        with open(part_path, mode) as f:
+            if response.status_code != 416:
+                for chunk in response.iter_content(chunk_size=chunk_size):
+                    if chunk:
+                        f.write(chunk)
+                        digest.update(chunk)
+                        done += len(chunk)
+                        if progress:
+                            progress(name, done, total)
+
+    actual = digest.hexdigest()
+    if expected_sha256 and actual != expected_sha256:
+        os.remove(part_path)
+        raise ChecksumMismatchError(f"{name}: SHA-256 불일치 (예상 {expected_sha256}, 실제 {actual})")
+    if not expected_sha256:
+        print(f"⚠️ {name}: 검증할 SHA-256이 없어 체크섬 검증 생략 (실제 {actual})")
+
+    os.replace(part_path, dest_path)
+    return actual
+
+
+def extract_atomically(zip_path, target_dir, metadata=None):
+    """임시 디렉터리에 압축 해제 후 이름 변경으로 교체 - 중간 상태의 DB가 보이지 않도록"""
+    parent = os.path.dirname(os.path.abspath(target_dir))
+    tmp_dir = os.path.join(parent, f".{os.path.basename(target_dir)}.extract-{os.getpid()}")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    with zipfile.ZipFile(zip_path) as archive:
+        archive.extractall(tmp_dir)
+    with open(os.path.join(tmp_dir, COMPLETE_MARKER), "w", encoding="utf-8") as f:
+        json.dump(dict(metadata or {}, completed_at=time.time()), f)
+
+    _swap_into_place(tmp_dir, target_dir)
+
+
+class _StreamReader:
+    """HTTP 청크를 정확한 길이 단위로 읽는 버퍼 - 읽은 바이트는 해시/진행률에 반영"""
+
+    def __init__(self, chunks, on_bytes):
+        self._chunks = iter(chunks)
+        self._buffer = bytearray()
+        self._on_bytes = on_bytes
+
+    def _fill(self, size):
+        while len(self._buffer) < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return False
+            if chunk:
+                self._on_bytes(chunk)
+                self._buffer += chunk
+        return True
+
+    def read(self, size) -> bytes:
+        if not self._fill(size):
+            raise EOFError("아카이브가 중간에 끊겼습니다")
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+    def read_some(self, max_size) -> bytes:
+        if not self._buffer and not self._fill(1):
+            raise EOFError("아카이브가 중간에 끊겼습니다")
+        data = bytes(self._buffer[:max_size])
+        del self._buffer[:len(data)]
+        return data
+
+    def unread(self, data):
+        self._buffer[:0] = data
+
+    def drain(self):
+        """중앙 디렉터리 등 나머지 바이트 소비 (해시 계산용)"""
+        self._buffer.clear()
+        for chunk in self._chunks:
+            if chunk:
+                self._on_bytes(chunk)
+
+
+def _safe_member_path(root, name):
+    """ZIP 항목 이름을 root 아래 경로로 변환 - 절대 경로/상위 디렉터리 탈출 차단"""
+    parts = [part for part in name.replace("\\", "/").split("/") if part not in ("", ".", "..")]
+    return os.path.join(root, *parts) if parts else None
+
+
+def _zip64_sizes(extra, compressed_size, file_size):
+    """로컬 헤더 ZIP64 확장 필드에서 실제 크기 추출 - (압축 크기, 원본 크기, ZIP64 여부)"""
+    position = 0
+    while position + 4 <= len(extra):
+        header_id, size = struct.unpack_from("<HH", extra, position)
+        if header_id == 0x0001:
+            values = list(struct.unpack_from(f"<{size // 8}Q", extra, position + 4))
+            if file_size == 0xFFFFFFFF and values:
+                file_size = values.pop(0)
+            if compressed_size == 0xFFFFFFFF and values:
+                compressed_size = values.pop(0)
+            return compressed_size, file_size, True
+        position += 4 + size
+    return compressed_size, file_size, False
+
+
+def _extract_member(reader, output, method, compressed_size, has_descriptor, chunk_size):
+    """항목 하나를 스트림에서 풀어 output에 기록 - CRC32 반환"""
+    crc = 0
+    if method == zipfile.ZIP_DEFLATED:
+        decompressor = zlib.decompressobj(-15)
+        remaining = None if has_descriptor else compressed_size
+        while not decompressor.eof:
+            if remaining == 0:
+                raise zipfile.BadZipFile("압축 데이터가 예상보다 짧습니다")
+            data = reader.read_some(chunk_size if remaining is None else min(chunk_size, remaining))
+            if remaining is not None:
+                remaining -= len(data)
+            block = decompressor.decompress(data)
+            crc = zlib.crc32(block, crc)
+            output.write(block)
+        if decompressor.unused_data:
+            reader.unread(decompressor.unused_data)
+    elif method == zipfile.ZIP_STORED and not has_descriptor:
+        remaining = compressed_size
+        while remaining:
+            block = reader.read_some(min(chunk_size, remaining))
+            remaining -= len(block)
+            crc = zlib.crc32(block, crc)
+            output.write(block)
+    else:
+        raise StreamingUnsupportedError(f"지원하지 않는 압축 방식: method={method}, descriptor={has_descriptor}")
+    return crc
+
+
+def stream_extract(chunks, tmp_dir, on_bytes, chunk_size=CHUNK_SIZE):
+    """다운로드 중인 ZIP을 받는 즉시 tmp_dir에 압축 해제 - 아카이브를 디스크에 저장하지 않음
+
+    로컬 파일 헤더를 순서대로 읽으며, 중앙 디렉터리에 도달하면 나머지 바이트는 해시만 계산합니다.
+    """
+    reader = _StreamReader(chunks, on_bytes)
+    while True:
+        signature = struct.unpack("<I", reader.read(4))[0]
+        if signature != _LOCAL_HEADER_SIGNATURE:
+            reader.drain()
+            return
+
+        (_, _, flags, method, _, _, crc, compressed_size, file_size,
+         name_length, extra_length) = _LOCAL_HEADER.unpack(struct.pack("<I", signature) + reader.read(26))
+        name = reader.read(name_length).decode("utf-8" if flags & 0x800 else "cp437")
+        compressed_size, file_size, zip64 = _zip64_sizes(reader.read(extra_length), compressed_size, file_size)
+        has_descriptor = bool(flags & 0x08)
+        if flags & 0x01:
+            raise StreamingUnsupportedError("암호화된 항목은 스트리밍 해제를 지원하지 않습니다")
+
+        path = _safe_member_path(tmp_dir, name)
+        if path is None or name.endswith("/"):
+            if path:
+                os.makedirs(path, exist_ok=True)
+            with open(os.devnull, "wb") as sink:
+                actual_crc = _extract_member(reader, sink, method, compressed_size, has_descriptor, chunk_size)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as output:
+                actual_crc = _extract_member(reader, output, method, compressed_size, has_descriptor, chunk_size)
+
+        if has_descriptor:
+            descriptor = reader.read(4)
+            if struct.unpack("<I", descriptor)[0] == _DATA_DESCRIPTOR_SIGNATURE:
+                descriptor = reader.read(4)
+            crc = struct.unpack("<I", descriptor)[0]
+            reader.read(16 if zip64 else 8)
+        if actual_crc != crc:
+            raise zipfile.BadZipFile(f"{name}: CRC 불일치")
+
+
+def download_and_stream_extract(url, target_dir, name=None, expected_sha256=None, progress=None,
+                                session=None, chunk_size=CHUNK_SIZE, timeout=30, metadata=None):
+    """다운로드와 압축 해제를 동시에 수행 - 디스크에는 풀린 파일만 기록
+
+    SHA-256 검증을 통과해야 target_dir로 교체하며, 실패하면 임시 디렉터리를 지웁니다.
+    """
+    session = session or requests.Session()
+    name = name or os.path.basename(target_dir)
+    parent = os.path.dirname(os.path.abspath(target_dir))
+    tmp_dir = os.path.join(parent, f".{os.path.basename(target_dir)}.extract-{os.getpid()}")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    digest = hashlib.sha256()
+    try:
+        with session.get(url, stream=True, timeout=timeout) as response:
+            response.raise_for_status()
+            expected_sha256 = (expected_sha256 or _server_sha256(response) or "").lower() or None
+            total = int(response.headers["Content-Length"]) if response.headers.get("Content-Length", "").isdigit() else None
+            done = 0
+
+            def on_bytes(chunk):
+                nonlocal done
+                digest.update(chunk)
+                done += len(chunk)
+                if progress:
+                    progress(name, done, total)
+
+            stream_extract(response.iter_content(chunk_size=chunk_size), tmp_dir, on_bytes, chunk_size)
+
+        actual = digest.hexdigest()
+        if expected_sha256 and actual != expected_sha256:
+            raise ChecksumMismatchError(f"{name}: SHA-256 불일치 (예상 {expected_sha256}, 실제 {actual})")
+        if not expected_sha256:
+            print(f"⚠️ {name}: 검증할 SHA-256이 없어 체크섬 검증 생략 (실제 {actual})")
+
+        with open(os.path.join(tmp_dir, COMPLETE_MARKER), "w", encoding="utf-8") as f:
+            json.dump(dict(metadata or {}, sha256=actual, completed_at=time.time()), f)
+        _swap_into_place(tmp_dir, target_dir)
+        return actual
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+
+def _swap_into_place(tmp_dir, target_dir):
+    """완성된 임시 디렉터리를 target_dir로 교체 (기존 불완전 디렉터리는 삭제)"""
+    if os.path.exists(target_dir):
+        stale_dir = f"{tmp_dir}.old"
+        os.rename(target_dir, stale_dir)
+        os.rename(tmp_dir, target_dir)
+        shutil.rmtree(stale_dir, ignore_errors=True)
+    else:
+        os.rename(tmp_dir, target_dir)
+
+
+def download_database(name, url, target_dir=None, expected_sha256=None, download_dir=None,
+                      progress=None, session=None, streaming=False):
+    """DB 아카이브 하나를 받아 검증 후 target_dir에 설치
+
+    streaming이면 아카이브를 저장하지 않고 받으면서 바로 풉니다. 스트리밍으로 풀 수 없는 ZIP이거나
+    받는 도중 연결이 끊기면 이어받기가 되는 임시 아카이브 방식으로 다시 받습니다.
+    """
+    target_dir = target_dir or name
+    if is_database_ready(target_dir):
+        print(f"✅ Already exists: {target_dir}")
+        return True
+
+    if streaming:
+        started = time.perf_counter()
+        try:
+            download_and_stream_extract(url, target_dir, name=name, expected_sha256=expected_sha256,
+                                        progress=progress, session=session, metadata={"url": url})
+            print(f"✅ {name} 설치 완료 - 스트리밍 해제 ({time.perf_counter() - started:.1f}s)")
+            return True
+        except StreamingUnsupportedError as e:
+            print(f"⚠️ {name}: 스트리밍 해제 불가, 임시 아카이브 방식 사용: {e}")
+        except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+            print(f"⚠️ {name}: 스트리밍 중 연결 끊김, 이어받기가 되는 임시 아카이브 방식으로 다시 받기: {e}")
+
+    download_dir = download_dir or os.path.dirname(os.path.abspath(target_dir))
+    os.makedirs(download_dir, exist_ok=True)
+    zip_path = os.path.join(download_dir, f".{name}.zip")
+
+    started = time.perf_counter()
+    sha256 = download_file(url, zip_path, name=name, expected_sha256=expected_sha256,
+                           progress=progress, session=session)
+    print(f"🧩 Unzipping {name}...")
+    extract_atomically(zip_path, target_dir, {"url": url, "sha256": sha256})
+    os.remove(zip_path)
+    print(f"✅ {name} 설치 완료 ({time.perf_counter() - started:.1f}s)")
+    return True
+
+
+def download_databases(sources, checksums=None, max_workers=None, progress=None, **kwargs):
+    """여러 DB를 병렬로 다운로드 - sources: {이름: URL}, 전부 성공해야 True"""
+    checksums = checksums or {}
+
+    def run(name, url):
+        try:
+            return download_database(
+                name, url, expected_sha256=checksums.get(name), progress=progress, **kwargs
+            )
+        except Exception as e:
+            print(f"❌ Failed to download {url}: {e}")
+            return False
+
+    with ThreadPoolExecutor(max_workers=max_workers or len(sources) or 1, thread_name_prefix="db-download") as pool:
+        futures = [pool.submit(run, name, url) for name, url in sources.items()]
+        return all(future.result() for future in futures)
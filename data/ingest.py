@@ -0,0 +1,193 @@
+"""
+벡터 DB 오프라인 정규화 (문서별 표시 필드 사전 계산)
+
+요청마다 format_docs_optimized에서 다시 계산하던 문서 유형, 인용 라벨,
+제목/출처, 본문 스니펫과 토큰 수를 메타데이터에 미리 저장합니다.
+임베딩은 건드리지 않고 메타데이터만 갱신하며, 중단 후 다시 실행하면
+체크포인트부터 이어서 처리합니다.
+
+사용법:
+    python ingest.py                # 법률/뉴스 DB 모두
+    python ingest.py --db legal     # 법률 DB만
+    python ingest.py --restart      # 체크포인트 무시하고 처음부터
+"""
+# SQLite 호환성 설정
+__import__('pysqlite3')
+import sys
+sys.modules['sqlite3'] = sys.modules.pop('pysqlite3')
+
+import argparse
+import json
+import os
+import time
+from itertools import islice
+from multiprocessing import Pool
+
+import chromadb
+from document_formatter import (
+    classify_document, count_tokens, truncate_to_tokens,
+    DOC_CLASS_NEWS, DOC_CLASS_PRECEDENT, DOC_CLASS_INTERPRETATION, DOC_CLASS_QA,
+)
+from config import LEGAL_DB_DIR, NEWS_DB_DIR, INGEST_VERSION, INGEST_SNIPPET_TOKENS, INGEST_CHECKPOINT_DIR
+
+
+DATABASES = {"legal": LEGAL_DB_DIR, "news": NEWS_DB_DIR}
+
+# 유형별 (인용 라벨 접두어, 식별자 메타데이터 키, 출처 표시)
+_CITATION_RULES = {
+    DOC_CLASS_PRECEDENT: ("판례", "case_id", "판례"),
+    DOC_CLASS_INTERPRETATION: ("법령해석례", "interpretation_id", "법령해석례"),
+    DOC_CLASS_QA: ("백문백답", "qa_id", "생활법령 Q&A"),
+}
+
+
+def normalize_metadata(text, meta):
+    """문서 하나의 표시용 메타데이터 계산"""
+    meta = dict(meta or {})
+    text = text or ""
+    doc_class = classify_document(meta)
+
+    citation = ""
+    if doc_class in _CITATION_RULES:
+        prefix, id_key, source_label = _CITATION_RULES[doc_class]
+        identifier = str(meta.get(id_key, "")).strip()
+        if identifier:
+            citation = f"{prefix}-{identifier}"
+    elif doc_class == DOC_CLASS_NEWS:
+        source_label = str(meta.get("source", "뉴스"))
+    else:
+        source_label = str(meta.get("doc_type", "법률자료"))
+
+    meta.update({
+        "doc_class": doc_class,
+        "citation": citation,
+        "source_label": source_label,
+        "display_title": str(meta.get("title", "제목없음"))[:80] if doc_class == DOC_CLASS_NEWS else "",
+        "snippet": truncate_to_tokens(text, INGEST_SNIPPET_TOKENS),
+        "token_length": count_tokens(text),
+        "ingest_version": INGEST_VERSION,
+    })
+    return meta
+
+
+def normalize_batch(batch):
+    """워커 프로세스용 - [(id, 본문, 메타데이터)] → (id 목록, 메타데이터 목록)"""
+    ids = []
+    metadatas = []
+    for doc_id, text, meta in batch:
+        ids.append(doc_id)
+        metadatas.append(normalize_metadata(text, meta))
+    return ids, metadatas
+
+
+def _checkpoint_path(name, collection_name):
+    return os.path.join(INGEST_CHECKPOINT_DIR, f"{name}-{collection_name}.json")
+
+
+def _load_checkpoint(path, force=False):
+    """이어서 처리할 오프셋 - force 실행은 중단된 force 실행의 체크포인트에서만 이어감"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            checkpoint = json.load(f)
+        if checkpoint.get("version") == INGEST_VERSION and (checkpoint.get("force", False) or not force):
+            return checkpoint.get("offset", 0)
+    except (OSError, ValueError):
+        pass
+    return 0
+
+
+def _save_checkpoint(path, offset, force=False):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"version": INGEST_VERSION, "offset": offset, "force": force, "updated_at": time.time()}, f)
+    os.replace(tmp_path, path)
+
+
+def _clear_checkpoint(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _read_batches(collection, offset, batch_size, force):
+    """컬렉션을 배치 단위로 읽기 - (다음 오프셋, 처리할 문서 목록)
+
+    이미 현재 버전으로 처리된 문서는 건너뜁니다.
+    """
+    while True:
+        batch = collection.get(limit=batch_size, offset=offset, include=["documents", "metadatas"])
+        ids = batch["ids"]
+        if not ids:
+            return
+        offset += len(ids)
+        pending = [
+            (doc_id, text, meta)
+            for doc_id, text, meta in zip(ids, batch["documents"], batch["metadatas"])
+            if force or (meta or {}).get("ingest_version") != INGEST_VERSION
+        ]
+        yield offset, pending
+
+
+def ingest_collection(name, collection, workers, batch_size, restart=False, force=False):
+    """컬렉션 하나의 메타데이터 정규화 - 배치마다 체크포인트 저장, 끝까지 처리하면 체크포인트 삭제"""
+    checkpoint_path = _checkpoint_path(name, collection.name)
+    offset = 0 if restart else _load_checkpoint(checkpoint_path, force)
+    total = collection.count()
+    print(f"📦 {name}/{collection.name}: {total}개 문서 ({offset}번째부터)")
+
+    started = time.perf_counter()
+    updated = 0
+    batches = _read_batches(collection, offset, batch_size, force)
+    with Pool(processes=workers) as pool:
+        # 워커 수의 두 배만큼만 읽어 두고 정규화 → 메인 프로세스가 순서대로 기록 (Chroma 쓰기는 단일 프로세스)
+        while True:
+            window = list(islice(batches, workers * 2))
+            if not window:
+                break
+            for next_offset, ids, metadatas in pool.imap(_normalize_with_offset, window):
+                if ids:
+                    collection.update(ids=ids, metadatas=metadatas)
+                    updated += len(ids)
+                _save_checkpoint(checkpoint_path, next_offset, force)
+            elapsed = time.perf_counter() - started
+            print(f"  ✅ {next_offset}/{total} (갱신 {updated}개, {elapsed:.1f}s)")
+
+    # 완료된 실행의 체크포인트를 남기면 다음 실행(--force 포함)이 끝에서 시작하므로 삭제
+    _clear_checkpoint(checkpoint_path)
+    return updated
+
+
+def _normalize_with_offset(item):
+    next_offset, batch = item
+    ids, metadatas = normalize_batch(batch)
+    return next_offset, ids, metadatas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="벡터 DB 메타데이터 정규화")
+    parser.add_argument("--db", choices=["legal", "news", "all"], default="all")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--restart", action="store_true", help="체크포인트 무시하고 처음부터")
+    parser.add_argument("--force", action="store_true", help="이미 처리된 문서도 다시 계산")
+    args = parser.parse_args(argv)
+
+    names = list(DATABASES) if args.db == "all" else [args.db]
+    for name in names:
+        directory = DATABASES[name]
+        if not os.path.exists(directory):
+            print(f"⚠️ {directory} 없음 - 건너뜀")
+            continue
+        client = chromadb.PersistentClient(path=directory)
+        for collection_info in client.list_collections():
+            collection = client.get_collection(getattr(collection_info, "name", collection_info))
+            updated = ingest_collection(
+                name, collection, args.workers, args.batch_size, restart=args.restart, force=args.force
+            )
+            print(f"🎉 {name}/{collection.name}: {updated}개 문서 갱신 완료")
+
+
+if __name__ == "__main__":
+    main()
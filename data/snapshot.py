@@ -0,0 +1,272 @@
+"""
+벡터 DB 읽기 전용 스냅샷 (메모리 매핑 기반 빠른 시작)
+
+Chroma 컬렉션을 버전별 디렉터리에 한 번 내보내 두고, 앱은 Chroma 대신
+이 스냅샷을 메모리 매핑해 엽니다. 여러 워커 프로세스가 같은 페이지 캐시를 공유합니다.
+
+스냅샷 파일 구성 ({SNAPSHOT_DIR}/{DB 이름}/{버전}/):
+    manifest.json     버전, 차원, 문서 수, dtype, 원본 정보
+    vectors.npy       정규화된 임베딩 (float16/float32, IVF 리스트 순서로 정렬)
+    centroids.npy     IVF 중심 벡터 (float32)
+    list_offsets.npy  IVF 리스트별 시작 행 (int64, 리스트 수 + 1개)
+    docs.sqlite3      행 번호 → (Chroma id, 본문, 메타데이터 JSON)
+
+사용법:
+    python snapshot.py                 # 법률/뉴스 DB 모두 스냅샷 생성
+    python snapshot.py --db legal
+"""
+# SQLite 호환성 설정
+__import__('pysqlite3')
+import sys
+sys.modules['sqlite3'] = sys.modules.pop('pysqlite3')
+
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+
+import numpy as np
+from langchain_core.documents import Document
+from vector_store import ReadOnlyVectorStore, normalize_rows
+from config import (
+    LEGAL_DB_DIR, NEWS_DB_DIR, EMBEDDING_MODEL_NAME,
+    SNAPSHOT_DIR, SNAPSHOT_DTYPE, SNAPSHOT_NPROBE
+)
+
+
+SNAPSHOT_FORMAT = 1
+MANIFEST_NAME = "manifest.json"
+
+
+def snapshot_root(db_dir):
+    return os.path.join(SNAPSHOT_DIR, os.path.basename(os.path.normpath(db_dir)))
+
+
+def find_latest_snapshot(db_dir):
+    """가장 최근에 완성된 스냅샷 디렉터리 (manifest.json이 있는 것만) 또는 None"""
+    root = snapshot_root(db_dir)
+    if not os.path.isdir(root):
+        return None
+    candidates = []
+    for name in os.listdir(root):
+        manifest_path = os.path.join(root, name, MANIFEST_NAME)
+        if name.startswith(".") or not os.path.exists(manifest_path):
+            continue
+        try:
+            with open(manifest_path, encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if manifest.get("format") == SNAPSHOT_FORMAT:
+            candidates.append((manifest.get("version", ""), os.path.join(root, name)))
+    return max(candidates)[1] if candidates else None
+
+
+def _train_ivf(vectors, nlist, iterations=10, sample_size=50000, seed=0):
+    """구면 k-means로 IVF 중심 학습 - (중심, 행별 리스트 번호)"""
+    rng = np.random.default_rng(seed)
+    sample = vectors[rng.choice(len(vectors), size=min(sample_size, len(vectors)), replace=False)]
+    centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = np.argmax(sample @ centroids.T, axis=1)
+        for list_id in range(nlist):
+            members = sample[assignment == list_id]
+            if len(members):
+                centroids[list_id] = members.sum(axis=0)
+        centroids = normalize_rows(centroids)
+
+    assignment = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), 8192):
+        assignment[start:start + 8192] = np.argmax(vectors[start:start + 8192] @ centroids.T, axis=1)
+    return centroids.astype(np.float32), assignment
+
+
+def build_snapshot(db_dir, dtype=SNAPSHOT_DTYPE, batch_size=2000):
+    """Chroma 컬렉션을 새 버전의 스냅샷으로 내보내기 - 스냅샷 디렉터리 반환"""
+    import chromadb
+
+    client = chromadb.PersistentClient(path=db_dir)
+    collection = client.get_collection(client.list_collections()[0].name)
+
+    ids, documents, metadatas, embeddings = [], [], [], []
+    offset = 0
+    while True:
+        batch = collection.get(limit=batch_size, offset=offset, include=["embeddings", "documents", "metadatas"])
+        if not batch["ids"]:
+            break
+        ids.extend(batch["ids"])
+        documents.extend(batch["documents"])
+        metadatas.extend(batch["metadatas"])
+        embeddings.append(np.asarray(batch["embeddings"], dtype=np.float32))
+        offset += len(batch["ids"])
+        print(f"  📤 {db_dir}: {offset}개 읽음")
+
+    vectors = normalize_rows(np.concatenate(embeddings)) if embeddings else np.empty((0, 0), np.float32)
+    nlist = max(1, int(np.sqrt(len(ids)))) if ids else 1
+    if ids:
+        centroids, assignment = _train_ivf(vectors, nlist)
+    else:
+        centroids, assignment = np.empty((0, 0), np.float32), np.empty(0, np.int64)
+    order = np.argsort(assignment, kind="stable")
+    list_offsets = np.searchsorted(assignment[order], np.arange(nlist + 1)).astype(np.int64)
+
+    version = time.strftime("%Y%m%d-%H%M%S")
+    root = snapshot_root(db_dir)
+    tmp_dir = os.path.join(root, f".{version}.building-{os.getpid()}")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    np.save(os.path.join(tmp_dir, "vectors.npy"), vectors[order].astype(dtype))
+    np.save(os.path.join(tmp_dir, "centroids.npy"), centroids)
+    np.save(os.path.join(tmp_dir, "list_offsets.npy"), list_offsets)
+
+    conn = sqlite3.connect(os.path.join(tmp_dir, "docs.sqlite3"))
+    conn.execute("CREATE TABLE docs (row INTEGER PRIMARY KEY, id TEXT NOT NULL, document TEXT, metadata TEXT)")
+    conn.executemany(
+        "INSERT INTO docs (row, id, document, metadata) VALUES (?, ?, ?, ?)",
+        (
+            (row, ids[i], documents[i], json.dumps(metadatas[i] or {}, ensure_ascii=False))
+            for row, i in enumerate(order.tolist())
+        ),
+    )
+    conn.execute("CREATE UNIQUE INDEX idx_docs_id ON docs (id)")
+    conn.commit()
+    conn.close()
+
+    with open(os.path.join(tmp_dir, MANIFEST_NAME), "w", encoding="utf-8") as f:
+        json.dump({
+            "format": SNAPSHOT_FORMAT,
+            "version": version,
+            "source": db_dir,
+            "embedding_model": EMBEDDING_MODEL_NAME,
+            "count": len(ids),
+            "dim": int(vectors.shape[1]) if len(ids) else 0,
+            "dtype": dtype,
+            "nlist": nlist,
+            "created_at": time.time(),
+        }, f, ensure_ascii=False, indent=2)
+
+    snapshot_dir = os.path.join(root, version)
+    os.rename(tmp_dir, snapshot_dir)
+    return snapshot_dir
+
+
+class SnapshotVectorStore(ReadOnlyVectorStore):
+    """메모리 매핑한 스냅샷 위의 읽기 전용 벡터 스토어 (Chroma 대체)
+
+    IVF로 상위 nprobe개 리스트만 탐색합니다.
+    """
+
+    _read_only_message = "스냅샷은 읽기 전용입니다. Chroma에 추가한 뒤 snapshot.py로 스냅샷을 다시 생성하세요."
+
+    def __init__(self, snapshot_dir, embedding_function=None, nprobe=SNAPSHOT_NPROBE):
+        self.snapshot_dir = snapshot_dir
+        self._embedding_function = embedding_function
+        self.nprobe = nprobe
+        with open(os.path.join(snapshot_dir, MANIFEST_NAME), encoding="utf-8") as f:
+            self.manifest = json.load(f)
+
+        self.vectors = np.load(os.path.join(snapshot_dir, "vectors.npy"), mmap_mode="r")
+        self.centroids = np.load(os.path.join(snapshot_dir, "centroids.npy"))
+        self.list_offsets = np.load(os.path.join(snapshot_dir, "list_offsets.npy"))
+
+        db_path = os.path.abspath(os.path.join(snapshot_dir, "docs.sqlite3"))
+        self._conn = sqlite3.connect(f"file:{db_path}?mode=ro&immutable=1", uri=True, check_same_thread=False)
+        self._lock = threading.Lock()
+
+    def count(self) -> int:
+        return self.manifest["count"]
+
+    def _candidate_rows(self, query_vector):
+        """쿼리와 가까운 IVF 리스트들의 행 범위"""
+        if len(self.centroids) <= self.nprobe:
+            return [(0, len(self.vectors))]
+        nearest = np.argpartition(-(self.centroids @ query_vector), self.nprobe)[:self.nprobe]
+        return [(int(self.list_offsets[i]), int(self.list_offsets[i + 1])) for i in nearest]
+
+    def search_rows(self, embedding, k):
+        """상위 k개 (행 번호, 코사인 거리)"""
+        if not self.count():
+            return []
+        query_vector = normalize_rows(embedding)
+
+        rows, scores = [], []
+        for start, end in self._candidate_rows(query_vector):
+            if end > start:
+                rows.append(np.arange(start, end))
+                scores.append(self.vectors[start:end].astype(np.float32) @ query_vector)
+        if not rows:
+            return []
+        rows = np.concatenate(rows)
+        scores = np.concatenate(scores)
+        top = np.argsort(-scores)[:k] if len(scores) <= k else np.argpartition(-scores, k)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(rows[i]), 1.0 - float(scores[i])) for i in top]
+
+    def _fetch_rows(self, rows):
+        if not rows:
+            return {}
+        placeholders = ",".join("?" * len(rows))
+        with self._lock:
+            fetched = self._conn.execute(
+                f"SELECT row, id, document, metadata FROM docs WHERE row IN ({placeholders})", rows
+            ).fetchall()
+        return {
+            row: Document(page_content=document or "", metadata=json.loads(metadata or "{}"), id=doc_id)
+            for row, doc_id, document, metadata in fetched
+        }
+
+    def similarity_search_by_vector_with_relevance_scores(self, embedding, k=4, **kwargs):
+        hits = self.search_rows(embedding, k)
+        docs = self._fetch_rows([row for row, _ in hits])
+        return [(docs[row], distance) for row, distance in hits if row in docs]
+
+    def get(self, ids=None, limit=None, offset=0, include=("documents", "metadatas")):
+        """Chroma get()과 같은 형태의 조회 - ids 또는 limit/offset"""
+        with self._lock:
+            if ids is not None:
+                placeholders = ",".join("?" * len(ids))
+                rows = self._conn.execute(
+                    f"SELECT id, document, metadata FROM docs WHERE id IN ({placeholders})", list(ids)
+                ).fetchall()
+            else:
+                rows = self._conn.execute(
+                    "SELECT id, document, metadata FROM docs ORDER BY row LIMIT ? OFFSET ?",
+                    (-1 if limit is None else limit, offset or 0),
+                ).fetchall()
+        return self._get_result(
+            (row[0] for row in rows),
+            (row[1] for row in rows),
+            (json.loads(row[2] or "{}") for row in rows) if "metadatas" in include else (),
+            include,
+        )
+
+
+def open_snapshot(db_dir, embedding_function=None):
+    """DB의 최신 스냅샷을 열기 - 없으면 None"""
+    snapshot_dir = find_latest_snapshot(db_dir)
+    if snapshot_dir is None:
+        return None
+    store = SnapshotVectorStore(snapshot_dir, embedding_function=embedding_function)
+    print(f"⚡ 스냅샷 사용: {snapshot_dir} ({store.count()}개 문서)")
+    return store
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="벡터 DB 스냅샷 생성")
+    parser.add_argument("--db", choices=["legal", "news", "all"], default="all")
+    parser.add_argument("--dtype", choices=["float16", "float32"], default=SNAPSHOT_DTYPE)
+    args = parser.parse_args(argv)
+
+    databases = {"legal": LEGAL_DB_DIR, "news": NEWS_DB_DIR}
+    for name in (list(databases) if args.db == "all" else [args.db]):
+        started = time.perf_counter()
+        snapshot_dir = build_snapshot(databases[name], dtype=args.dtype)
+        print(f"✅ {name} 스냅샷 생성: {snapshot_dir} ({time.perf_counter() - started:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -32,6 +32,9 @@ from langchain_openai import ChatOpenAI
 # 로그 레벨 감소
 logging.basicConfig(level=logging.WARNING)
 
+# 답변 토큰 단위 스트리밍 여부 (core/config.py와 같은 설정) - False면 답변 완성 후 한 번에 표시
+STREAMING_RESPONSE = True
+
 # ——— 🔧 벡터 DB 다운로드 함수 ———
 @st.cache_resource
 def download_and_extract_databases(verbose=True):
@@ -781,6 +784,23 @@ def create_chat_chain_with_memory(rag_system):
     )
     return chain_with_history
 
+# ——— RAG 시스템 / 채팅 체인 캐시 (프로세스 단위) ———
+@st.cache_resource
+def get_rag_system():
+    """RAG 시스템 1회 생성 후 재사용 - 리런마다 전처리기/캐시를 새로 만들지 않음"""
+    embedding_model, legal_db, news_db, system_ready = initialize_embeddings_and_databases()
+    if not system_ready or not (legal_db or news_db):
+        return None
+    return OptimizedConditionalRAGSystem(legal_db, news_db)
+
+@st.cache_resource
+def get_chat_chain():
+    """메모리 기능이 있는 채팅 체인 1회 생성 후 재사용"""
+    rag_system = get_rag_system()
+    if rag_system is None:
+        return None
+    return create_chat_chain_with_memory(rag_system)
+
 # ——— 광고 배너 함수 ———
 def display_ad_banner():
     st.markdown("---")
@@ -873,8 +893,8 @@ def main():
     # ——— RAG 시스템 및 채팅 체인 생성 ———
     if system_ready and (legal_db or news_db):
         try:
-            rag_system = OptimizedConditionalRAGSystem(legal_db, news_db)
-            chain = create_chat_chain_with_memory(rag_system)
+            rag_system = get_rag_system()
+            chain = get_chat_chain()
         except Exception as e:
             st.error(f"❌ RAG 시스템 오류: {str(e)}")
             chain = None
@@ -1005,21 +1025,57 @@ def main():
         st.session_state.chat_history.append({"role": "user", "content": prompt})
 
         # 답변 생성
-        with st.spinner("🤖 AI가 판례를 검색하고 답변을 생성하고 있습니다..."):
-            try:
-                if chain and system_ready:
-                    response = chain.invoke(
-                        {"question": prompt},
-                        config={"configurable": {"session_id": st.session_state.session_id}},
-                    )
-                    st.session_state.chat_history.append({"role": "assistant", "content": response})
-                else:
-                    error_message = "죄송합니다. 현재 시스템 초기화 중입니다. 잠시 후 다시 시도해주세요."
-                    st.session_state.chat_history.append({"role": "assistant", "content": error_message})
-                    
-            except Exception as e:
-                error_message = f"죄송합니다. 답변 생성 중 오류가 발생했습니다: {str(e)}"
+        chain_config = {"configurable": {"session_id": st.session_state.session_id}}
+        try:
+            if chain and system_ready and STREAMING_RESPONSE:
+                # 토큰 단위 스트리밍 - 스피너는 첫 토큰이 올 때까지(검색 포함)만 표시
+                parts = []
+                started = time.perf_counter()
+                stream = chain.stream({"question": prompt}, config=chain_config)
+                with st.spinner("🤖 AI가 판례를 검색하고 있습니다..."):
+                    for chunk in stream:
+                        if chunk:
+                            parts.append(chunk)
+                            break
+                first_token_at = time.perf_counter() if parts else None
+                placeholder = st.empty()
+
+                def draw_bubble():
+                    placeholder.markdown(f"""
+                    <div class="ai-message">
+                        <div class="ai-bubble">
+                            {"".join(parts)}▌
+                        </div>
+                    </div>
+                    """, unsafe_allow_html=True)
+
+                if parts:
+                    draw_bubble()
+                for chunk in stream:
+                    if chunk:
+                        parts.append(chunk)
+                        draw_bubble()
+                response = "".join(parts)
+                if first_token_at is not None:
+                    generation_time = time.perf_counter() - first_token_at
+                    st.session_state.last_stream_metrics = {
+                        "ttft": first_token_at - started,
+                        "tokens": len(parts),
+                        "tokens_per_sec": len(parts) / generation_time if generation_time > 0 else 0.0,
+                    }
+                    print(f"⚡ TTFT {first_token_at - started:.2f}s | {len(parts)} tokens")
+                st.session_state.chat_history.append({"role": "assistant", "content": response})
+            elif chain and system_ready:
+                with st.spinner("🤖 AI가 판례를 검색하고 답변을 생성하고 있습니다..."):
+                    response = chain.invoke({"question": prompt}, config=chain_config)
+                st.session_state.chat_history.append({"role": "assistant", "content": response})
+            else:
+                error_message = "죄송합니다. 현재 시스템 초기화 중입니다. 잠시 후 다시 시도해주세요."
                 st.session_state.chat_history.append({"role": "assistant", "content": error_message})
+                
+        except Exception as e:
+            error_message = f"죄송합니다. 답변 생성 중 오류가 발생했습니다: {str(e)}"
+            st.session_state.chat_history.append({"role": "assistant", "content": error_message})
 
         # 답변 생성 후 페이지 새로고침
         st.rerun()